@@ -0,0 +1,579 @@
+#!/usr/bin/env python3
+"""Fake Slurm command shim used by the benchmark suite.
+
+A single script that behaves like `squeue`, `sinfo`, `sbatch`, `salloc`,
+`srun`, `sacct`, `sstat`, `sshare`, `sreport`, `scontrol` and `scancel`
+depending on the name it is invoked as (run_bench.py symlinks it into a
+temporary bin/ directory and puts that directory first on PATH).
+
+The synthetic cluster is fully determined by environment variables:
+
+    FAKE_SLURM_NODES   number of nodes (default 1000)
+    FAKE_SLURM_JOBS    number of queued jobs (default 10000)
+    FAKE_SLURM_SEED    random seed (default 42)
+    FAKE_SLURM_CACHE   directory used to cache generated output (optional)
+
+Generated output is cached per (command, arguments, cluster shape) so that
+benchmarks measure the backend's parsing rather than this generator.
+"""
+import hashlib
+import os
+import random
+import sys
+import time
+
+PARTITIONS = [
+    # name, share of nodes, cpus per node, memory per node (MB), gres
+    ("compute", 0.70, 64, 256000, "(null)"),
+    ("bigmem", 0.20, 64, 1024000, "(null)"),
+    ("gpu", 0.10, 32, 512000, "gpu:a100:4"),
+]
+NODE_STATES = ["alloc"] * 5 + ["mix"] * 3 + ["idle"] * 2 + ["drain", "down"]
+PENDING_REASONS = ["(Priority)", "(Resources)", "(Dependency)", "(QOSMaxJobsPerUserLimit)"]
+JOB_NAMES = ["train", "sim", "preprocess", "analysis", "bash", "sweep", "mpi_run"]
+BASE_TIME = 1760000000  # fixed epoch so output is reproducible
+
+
+def _env_int(name, default):
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def _fmt_elapsed(seconds):
+    days, rem = divmod(int(seconds), 86400)
+    hours, rem = divmod(rem, 3600)
+    minutes, secs = divmod(rem, 60)
+    if days:
+        return f"{days}-{hours:02d}:{minutes:02d}:{secs:02d}"
+    if hours:
+        return f"{hours}:{minutes:02d}:{secs:02d}"
+    return f"{minutes}:{secs:02d}"
+
+
+def _fmt_ts(epoch):
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(epoch))
+
+
+def build_nodes(count, seed):
+    rng = random.Random(seed)
+    nodes = []
+    index = 0
+    for name, share, cpus, mem, gres in PARTITIONS:
+        n = max(1, int(round(count * share)))
+        for _ in range(n):
+            if index >= count:
+                break
+            index += 1
+            state = rng.choice(NODE_STATES)
+            if state == "alloc":
+                alloc = cpus
+            elif state == "mix":
+                alloc = rng.randint(1, cpus - 1)
+            else:
+                alloc = 0
+            other = cpus if state in ("drain", "down") else 0
+            idle = cpus - alloc - other
+            if state in ("down",):
+                free_mem = "N/A"
+            else:
+                free_mem = str(max(0, mem - int(mem * alloc / cpus) - rng.randint(0, 4096)))
+            nodes.append({
+                "name": f"node{index:05d}",
+                "state": state,
+                "partition": name,
+                "cpus": cpus,
+                "alloc": alloc,
+                "idle": idle,
+                "other": other,
+                "memory": mem,
+                "free_mem": free_mem,
+                "gres": gres,
+            })
+    return nodes
+
+
+def build_jobs(count, node_count, seed):
+    rng = random.Random(seed + 1)
+    jobs = []
+    job_id = 100000
+    while len(jobs) < count:
+        job_id += 1
+        user = f"user{rng.randint(0, 199):03d}"
+        name = rng.choice(JOB_NAMES)
+        partition = rng.choice(PARTITIONS)[0]
+        submit = BASE_TIME - rng.randint(0, 7 * 86400)
+        time_limit = rng.choice([3600, 4 * 3600, 86400, 2 * 86400])
+        cpus = rng.choice([1, 4, 16, 64])
+        mem = rng.choice(["4G", "16G", "64G", "250G"])
+        if rng.random() < 0.05:
+            # Array job: a block of running tasks plus a collapsed pending range
+            size = rng.randint(10, 2000)
+            running = rng.randint(0, min(size, 50))
+            for task in range(1, running + 1):
+                if len(jobs) >= count:
+                    break
+                jobs.append(_job(rng, f"{job_id}_{task}", user, name, "R", partition,
+                                 submit, time_limit, cpus, mem, node_count))
+            if running < size and len(jobs) < count:
+                pending = f"{job_id}_[{running + 1}-{size}]"
+                jobs.append(_job(rng, pending, user, name, "PD", partition,
+                                 submit, time_limit, cpus, mem, node_count))
+            continue
+        state = rng.choice(["R"] * 6 + ["PD"] * 3 + ["CG"])
+        jobs.append(_job(rng, str(job_id), user, name, state, partition,
+                         submit, time_limit, cpus, mem, node_count))
+    return jobs
+
+
+def _job(rng, job_id, user, name, state, partition, submit, time_limit, cpus, mem, node_count):
+    nodes = rng.choice([1, 1, 1, 2, 4, 8])
+    if state == "PD":
+        elapsed = 0
+        reason = rng.choice(PENDING_REASONS)
+        start = submit + rng.randint(60, 86400)
+    else:
+        elapsed = rng.randint(1, time_limit)
+        first = rng.randint(1, max(1, node_count - nodes))
+        if nodes == 1:
+            reason = f"node{first:05d}"
+        else:
+            reason = f"node[{first:05d}-{first + nodes - 1:05d}]"
+        start = BASE_TIME - elapsed
+    return {
+        "job_id": job_id,
+        "user": user,
+        "name": name,
+        "state": state,
+        "partition": partition,
+        "elapsed": elapsed,
+        "nodes": nodes,
+        "reason": reason,
+        "submit": submit,
+        "start": start,
+        "time_limit": time_limit,
+        "cpus": cpus * nodes,
+        "mem": mem,
+    }
+
+
+# -- output formatting -------------------------------------------------------
+
+SQUEUE_FIELDS = {
+    "i": lambda j: j["job_id"],
+    "A": lambda j: j["job_id"].split("_")[0],
+    "u": lambda j: j["user"],
+    "j": lambda j: j["name"],
+    "t": lambda j: j["state"],
+    "T": lambda j: {"R": "RUNNING", "PD": "PENDING", "CG": "COMPLETING"}[j["state"]],
+    "M": lambda j: _fmt_elapsed(j["elapsed"]),
+    "D": lambda j: str(j["nodes"]),
+    "R": lambda j: j["reason"],
+    "N": lambda j: "" if j["state"] == "PD" else j["reason"],
+    "P": lambda j: j["partition"],
+    "V": lambda j: _fmt_ts(j["submit"]),
+    "S": lambda j: _fmt_ts(j["start"]),
+    "C": lambda j: str(j["cpus"]),
+    "m": lambda j: j["mem"],
+    "l": lambda j: _fmt_elapsed(j["time_limit"]),
+    "b": lambda j: "gres/gpu:1" if j["partition"] == "gpu" else "N/A",
+}
+SQUEUE_HEADERS = {
+    "i": "JOBID", "A": "ARRAY_JOB_ID", "u": "USER", "j": "NAME", "t": "ST", "T": "STATE",
+    "M": "TIME", "D": "NODES", "R": "NODELIST(REASON)", "N": "NODELIST", "P": "PARTITION",
+    "V": "SUBMIT_TIME", "S": "START_TIME", "C": "CPUS", "m": "MIN_MEMORY",
+    "l": "TIME_LIMIT", "b": "TRES_PER_NODE",
+}
+
+SINFO_FIELDS = {
+    "N": lambda n: n["name"],
+    "n": lambda n: n["name"],
+    "t": lambda n: n["state"],
+    "C": lambda n: f"{n['alloc']}/{n['idle']}/{n['other']}/{n['cpus']}",
+    "c": lambda n: str(n["cpus"]),
+    "m": lambda n: str(n["memory"]),
+    "e": lambda n: n["free_mem"],
+    "P": lambda n: n["partition"],
+    "G": lambda n: n["gres"],
+}
+
+
+def _render(fmt, fields, record):
+    """Expand a %-style format string against a record."""
+    out = []
+    i = 0
+    while i < len(fmt):
+        ch = fmt[i]
+        if ch == "%" and i + 1 < len(fmt):
+            j = i + 1
+            while j < len(fmt) and (fmt[j].isdigit() or fmt[j] in ".-"):
+                j += 1
+            if j < len(fmt):
+                key = fmt[j]
+                getter = fields.get(key)
+                out.append(getter(record) if getter else "")
+                i = j + 1
+                continue
+        out.append(ch)
+        i += 1
+    return "".join(out)
+
+
+def _parse_args(argv, value_flags):
+    """Return (flags, values) for a minimal getopt-like argument list."""
+    flags = set()
+    values = {}
+    rest = []
+    i = 0
+    while i < len(argv):
+        arg = argv[i]
+        if arg.startswith("--") and "=" in arg:
+            key, val = arg.split("=", 1)
+            values[key] = val
+        elif arg in value_flags and i + 1 < len(argv):
+            values[arg] = argv[i + 1]
+            i += 1
+        elif arg.startswith("-"):
+            flags.add(arg)
+        else:
+            rest.append(arg)
+        i += 1
+    return flags, values, rest
+
+
+def cmd_squeue(argv, nodes_n, jobs_n, seed):
+    flags, values, _ = _parse_args(argv, {"-o", "-u", "-j", "-t", "--format"})
+    fmt = values.get("-o") or values.get("--format") or "%i|%u|%j|%t|%M|%D|%R"
+    jobs = build_jobs(jobs_n, nodes_n, seed)
+    user = values.get("-u") or values.get("--user")
+    if user:
+        wanted = set(user.split(","))
+        jobs = [j for j in jobs if j["user"] in wanted]
+    job_ids = values.get("-j") or values.get("--jobs")
+    if job_ids:
+        wanted = set(job_ids.split(","))
+        jobs = [j for j in jobs if j["job_id"] in wanted or j["job_id"].split("_")[0] in wanted]
+    states = values.get("-t") or values.get("--states")
+    if "--start" in flags:
+        states = "PD"  # only pending jobs have an expected start
+    if states:
+        wanted = set(states.split(","))
+        jobs = [j for j in jobs if j["state"] in wanted]
+    lines = []
+    if not ({"-h", "--noheader"} & flags):
+        headers = {k: (lambda _j, v=v: v) for k, v in SQUEUE_HEADERS.items()}
+        lines.append(_render(fmt, headers, {}))
+    for job in jobs:
+        lines.append(_render(fmt, SQUEUE_FIELDS, job))
+    return "\n".join(lines) + "\n", 0
+
+
+def cmd_sinfo(argv, nodes_n, jobs_n, seed):
+    if "--version" in argv or "-V" in argv:
+        return "slurm 23.02.0-fake\n", 0
+    flags, values, _ = _parse_args(argv, {"-o", "-p", "-n", "--format"})
+    fmt = values.get("-o") or values.get("--format") or "%P|%t|%D|%N"
+    nodes = build_nodes(nodes_n, seed)
+    partition = values.get("-p") or values.get("--partition")
+    if partition:
+        nodes = [n for n in nodes if n["partition"] == partition]
+    lines = []
+    if "-N" in flags or "--Node" in flags:
+        for node in nodes:
+            lines.append(_render(fmt, SINFO_FIELDS, node))
+    else:
+        # Summarised view: one line for the whole cluster
+        total = {
+            "name": "all", "state": "mix", "partition": "all",
+            "alloc": sum(n["alloc"] for n in nodes),
+            "idle": sum(n["idle"] for n in nodes),
+            "other": sum(n["other"] for n in nodes),
+            "cpus": sum(n["cpus"] for n in nodes),
+            "memory": sum(n["memory"] for n in nodes),
+            "free_mem": "N/A", "gres": "(null)",
+        }
+        lines.append(_render(fmt, SINFO_FIELDS, total))
+    return "\n".join(lines) + "\n", 0
+
+
+SACCT_FIELDS = {
+    "jobid": lambda j: j["job_id"],
+    "jobidraw": lambda j: j["job_id"],
+    "jobname": lambda j: j["name"],
+    "user": lambda j: j["user"],
+    "account": lambda j: "acct" + j["user"][-1],
+    "partition": lambda j: j["partition"],
+    "state": lambda j: j["final_state"],
+    "submit": lambda j: _fmt_ts(j["submit"]),
+    "start": lambda j: _fmt_ts(j["start"]),
+    "end": lambda j: _fmt_ts(j["start"] + j["elapsed"]),
+    "elapsed": lambda j: _fmt_elapsed(j["elapsed"]),
+    "elapsedraw": lambda j: str(j["elapsed"]),
+    "timelimit": lambda j: _fmt_elapsed(j["time_limit"]),
+    "alloccpus": lambda j: str(j["cpus"]),
+    "ncpus": lambda j: str(j["cpus"]),
+    "reqcpus": lambda j: str(j["cpus"]),
+    "nnodes": lambda j: str(j["nodes"]),
+    "reqmem": lambda j: j["mem"],
+    "totalcpu": lambda j: _fmt_elapsed(int(j["elapsed"] * j["cpus"] * j["cpu_eff"])),
+    "maxrss": lambda j: f"{int(j['mem_used_kb'] / max(j['cpus'], 1))}K",
+    "ntasks": lambda j: str(j["cpus"]),
+    "tresusageintot": lambda j: f"cpu={_fmt_elapsed(int(j['elapsed'] * j['cpus'] * j['cpu_eff']))},"
+                                f"mem={int(j['mem_used_kb'])}K",
+    "exitcode": lambda j: "0:0" if j["final_state"] == "COMPLETED" else "1:0",
+}
+
+
+def cmd_sacct(argv, nodes_n, jobs_n, seed):
+    flags, values, _ = _parse_args(argv, {"-o", "-j", "-S", "-E", "-u", "--format"})
+    fmt = values.get("-o") or values.get("--format") or "JobID,JobName,Partition,State,Elapsed"
+    fields = [f.split("%")[0].strip().lower() for f in fmt.split(",") if f.strip()]
+    rng = random.Random(seed + 2)
+    jobs = [j for j in build_jobs(jobs_n, nodes_n, seed) if j["state"] != "PD"]
+    job_ids = values.get("-j") or values.get("--jobs")
+    if job_ids:
+        wanted = set(job_ids.split(","))
+        jobs = [j for j in jobs if j["job_id"] in wanted or j["job_id"].split("_")[0] in wanted]
+    sep = "|" if ("-P" in flags or "--parsable2" in flags) else " "
+    lines = []
+    if not ({"-n", "--noheader"} & flags):
+        lines.append(sep.join(f.capitalize() for f in fields))
+    for job in jobs:
+        job = dict(job)
+        job["final_state"] = rng.choice(["COMPLETED"] * 8 + ["FAILED", "TIMEOUT"])
+        job["cpu_eff"] = rng.random()
+        mem_kb = int(job["mem"][:-1]) * 1024 * 1024
+        job["mem_used_kb"] = mem_kb * rng.random()
+        lines.append(sep.join(SACCT_FIELDS.get(f, lambda _j: "")(job) for f in fields))
+        if "-X" not in flags and "--allocations" not in flags:
+            step = dict(job, job_id=job["job_id"] + ".batch", name="batch")
+            lines.append(sep.join(SACCT_FIELDS.get(f, lambda _j: "")(step) for f in fields))
+    return "\n".join(lines) + "\n", 0
+
+
+SSTAT_FIELDS = {
+    "jobid": lambda s: s["job_id"],
+    "avecpu": lambda s: _fmt_elapsed(int(s["elapsed"] * s["cpu_eff"])),
+    "ntasks": lambda s: str(s["cpus"]),
+    "maxrss": lambda s: f"{int(s['mem_used_kb'] / max(s['cpus'], 1))}K",
+    "tresusageintot": lambda s: f"mem={int(s['mem_used_kb'])}K",
+    "averss": lambda s: f"{int(s['mem_used_kb'] * 0.8)}K",
+}
+
+
+def cmd_sstat(argv, nodes_n, jobs_n, seed):
+    flags, values, _ = _parse_args(argv, {"-o", "-j", "--format", "--jobs"})
+    fmt = values.get("-o") or values.get("--format") or "JobID,AveCPU,MaxRSS"
+    fields = [f.split("%")[0].strip().lower() for f in fmt.split(",") if f.strip()]
+    wanted = set((values.get("-j") or values.get("--jobs") or "").split(","))
+    rng = random.Random(seed + 3)
+    sep = "|" if ("-P" in flags or "--parsable2" in flags) else " "
+    lines = []
+    if not ({"-n", "--noheader"} & flags):
+        lines.append(sep.join(f.capitalize() for f in fields))
+    for job in build_jobs(jobs_n, nodes_n, seed):
+        if job["state"] != "R" or job["job_id"] not in wanted:
+            continue
+        step = dict(job, job_id=job["job_id"] + ".batch", cpu_eff=rng.random(),
+                    mem_used_kb=int(job["mem"][:-1]) * 1024 * 1024 * rng.random())
+        lines.append(sep.join(SSTAT_FIELDS.get(f, lambda _s: "")(step) for f in fields))
+    return "\n".join(lines) + "\n", 0
+
+
+def _associations(jobs_n, nodes_n, seed):
+    """Two-level account tree (root -> acct0..9) with each job owner as a user."""
+    users = sorted({j["user"] for j in build_jobs(jobs_n, nodes_n, seed)})
+    tree = {}
+    for user in users:
+        tree.setdefault("acct" + user[-1], []).append(user)
+    return tree
+
+
+def cmd_sshare(argv, nodes_n, jobs_n, seed):
+    flags, values, _ = _parse_args(argv, {"-o", "--format", "-A", "-u"})
+    rng = random.Random(seed + 4)
+    sep = "|" if ("-P" in flags or "--parsable2" in flags) else " "
+    lines = []
+    if not ({"-n", "--noheader"} & flags):
+        lines.append(sep.join(["Account", "User", "RawShares", "NormShares", "RawUsage",
+                               "EffectvUsage", "FairShare", "LevelFS"]))
+    tree = _associations(jobs_n, nodes_n, seed)
+    lines.append(sep.join(["root", "", "", "0.000000", str(10 ** 9), "1.000000", "", ""]))
+    for account in sorted(tree):
+        usage = rng.random()
+        lines.append(sep.join([" " + account, "", "1", "0.100000", str(int(usage * 10 ** 8)),
+                               f"{usage / 5:.6f}", "", f"{0.5 / max(usage, 0.01):.6f}"]))
+        for user in tree[account]:
+            u = rng.random()
+            lines.append(sep.join(["  " + account, user, "1", f"{1 / len(tree[account]):.6f}",
+                                   str(int(u * 10 ** 6)), f"{u / 50:.6f}", f"{rng.random():.6f}",
+                                   f"{0.5 / max(u, 0.01):.6f}" if u else "inf"]))
+    return "\n".join(lines) + "\n", 0
+
+
+def cmd_sreport(argv, nodes_n, jobs_n, seed):
+    rng = random.Random(seed + 5)
+    lines = []
+    for account, users in sorted(_associations(jobs_n, nodes_n, seed).items()):
+        hours = [rng.randint(0, 50000) for _ in users]
+        lines.append(f"{account}||{sum(hours)}")
+        lines.extend(f"{account}|{user}|{h}" for user, h in zip(users, hours))
+    return "\n".join(lines) + "\n", 0
+
+
+def _unknown_jobs(specs, nodes_n, jobs_n, seed):
+    """Job specs whose job (or array parent) id is not in the queue."""
+    known = {j["job_id"].split("_")[0] for j in build_jobs(jobs_n, nodes_n, seed)}
+    return [s for s in specs if s.split("_")[0] not in known]
+
+
+def cmd_scancel(argv, nodes_n, jobs_n, seed):
+    _, _, rest = _parse_args(argv, {"-u", "--user", "-n", "--name", "-t", "--state"})
+    unknown = _unknown_jobs(rest, nodes_n, jobs_n, seed)
+    for spec in unknown:
+        sys.stderr.write(f"scancel: error: Kill job error on job id {spec}: Invalid job id specified\n")
+    return "", 1 if unknown else 0
+
+
+def cmd_scontrol(argv, nodes_n, jobs_n, seed):
+    flags, values, rest = _parse_args(argv, set())
+    if rest[:1] and rest[0] in ("hold", "release", "requeue"):
+        specs = [s for arg in rest[1:] for s in arg.split(",") if s]
+        unknown = _unknown_jobs(specs, nodes_n, jobs_n, seed)
+        for spec in unknown:
+            sys.stderr.write(f"Job {spec}: Invalid job id specified\n")
+        return "", 1 if unknown else 0
+    if rest[:2] == ["show", "node"]:
+        wanted = set(rest[2].split(",")) if len(rest) > 2 else None
+        rng = random.Random(seed + 6)
+        lines = []
+        for node in build_nodes(nodes_n, seed):
+            load = rng.uniform(0, node["alloc"] * 1.1)
+            if wanted is not None and node["name"] not in wanted:
+                continue
+            gpus = int(node["gres"].split(":")[-1]) if node["gres"] != "(null)" else 0
+            gpus_used = min(gpus, node["alloc"] // 8)
+            alloc_mem = int(node["memory"] * node["alloc"] / node["cpus"])
+            free_mem = node["free_mem"]
+            cfg = f"cpu={node['cpus']},mem={node['memory']}M" + (f",gres/gpu={gpus}" if gpus else "")
+            alloc = f"cpu={node['alloc']},mem={alloc_mem}M" + (f",gres/gpu={gpus_used}" if gpus_used else "")
+            fields = [
+                f"NodeName={node['name']}", "Arch=x86_64", f"CPUAlloc={node['alloc']}",
+                f"CPUTot={node['cpus']}", f"CPULoad={load:.2f}" if free_mem != "N/A" else "CPULoad=N/A",
+                "AvailableFeatures=(null)", f"Gres={node['gres']}",
+                f"GresUsed=gpu:{gpus_used}" if gpus else "GresUsed=(null)",
+                "OS=Linux 5.14.0-fake #1 SMP", f"RealMemory={node['memory']}",
+                f"AllocMem={alloc_mem}", f"FreeMem={free_mem}",
+                f"State={node['state'].upper()}", f"Partitions={node['partition']}",
+                f"BootTime={_fmt_ts(BASE_TIME - 86400 * 30)}",
+                f"CfgTRES={cfg}", f"AllocTRES={alloc if node['alloc'] else ''}",
+            ]
+            if node["state"] in ("drain", "down"):
+                fields.append("Reason=Not responding [root@2025-10-01T00:00:00]")
+            lines.append(" ".join(fields))
+        if wanted is not None and not lines:
+            return "", 1
+        return "\n".join(lines) + "\n", 0
+    return "", 0
+
+
+def cmd_sbatch(argv, nodes_n, jobs_n, seed):
+    job_id = 900000 + int(time.time() * 1000) % 99999
+    if "--test-only" in argv:
+        sys.stderr.write(f"sbatch: Job {job_id} to start at {_fmt_ts(time.time())} "
+                         f"using 1 processors on nodes node00001 in partition compute\n")
+        return "", 0
+    return f"Submitted batch job {job_id}\n", 0
+
+
+def cmd_salloc(argv, nodes_n, jobs_n, seed):
+    """Grant an allocation immediately and exec the trailing command."""
+    job_id = 800000 + os.getpid() % 99999
+    sys.stderr.write(f"salloc: Granted job allocation {job_id}\n")
+    sys.stderr.flush()
+    # Drop option values (e.g. "--nodes 1") so only the command remains
+    cleaned = []
+    skip = False
+    for arg in argv:
+        if skip:
+            skip = False
+            continue
+        if arg.startswith("--") and "=" not in arg:
+            skip = True
+            continue
+        if arg.startswith("-"):
+            continue
+        cleaned.append(arg)
+    command = cleaned or ["/bin/sh"]
+    os.environ["SLURM_JOB_ID"] = str(job_id)
+    os.execvp(command[0], command)
+
+
+def cmd_srun(argv, nodes_n, jobs_n, seed):
+    """Run the trailing command as a step of --jobid (no checks)."""
+    _, values, rest = _parse_args(argv, {"--jobid", "-N", "--nodes", "-n", "--ntasks", "--mem", "-t", "--time"})
+    command = rest or ["/bin/sh"]
+    if values.get("--jobid"):
+        os.environ["SLURM_JOB_ID"] = values["--jobid"]
+    os.execvp(command[0], command)
+
+
+COMMANDS = {
+    "squeue": cmd_squeue,
+    "sinfo": cmd_sinfo,
+    "sacct": cmd_sacct,
+    "sstat": cmd_sstat,
+    "sshare": cmd_sshare,
+    "sreport": cmd_sreport,
+    "scontrol": cmd_scontrol,
+    "sbatch": cmd_sbatch,
+    "salloc": cmd_salloc,
+    "srun": cmd_srun,
+    "scancel": cmd_scancel,
+}
+# Commands whose output is a pure function of (argv, cluster shape)
+CACHEABLE = {"squeue", "sinfo", "sacct", "sstat", "sshare", "sreport"}
+
+
+def main():
+    name = os.path.basename(sys.argv[0])
+    if name.endswith(".py") and len(sys.argv) > 1:
+        # Allow `python fake_slurm.py squeue ...` for manual testing
+        name, argv = sys.argv[1], sys.argv[2:]
+    else:
+        argv = sys.argv[1:]
+    handler = COMMANDS.get(name)
+    if handler is None:
+        sys.stderr.write(f"fake_slurm: unknown command {name}\n")
+        return 1
+
+    nodes_n = _env_int("FAKE_SLURM_NODES", 1000)
+    jobs_n = _env_int("FAKE_SLURM_JOBS", 10000)
+    seed = _env_int("FAKE_SLURM_SEED", 42)
+    cache_dir = os.environ.get("FAKE_SLURM_CACHE")
+
+    cache_path = None
+    if cache_dir and name in CACHEABLE:
+        key = "\0".join([name, str(nodes_n), str(jobs_n), str(seed)] + argv)
+        cache_path = os.path.join(cache_dir, hashlib.sha1(key.encode()).hexdigest() + ".out")
+        try:
+            with open(cache_path, "rb") as f:
+                sys.stdout.buffer.write(f.read())
+            return 0
+        except FileNotFoundError:
+            pass
+
+    output, code = handler(argv, nodes_n, jobs_n, seed)
+    if cache_path and code == 0:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            f.write(output)
+        os.replace(tmp, cache_path)
+    sys.stdout.write(output)
+    return code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""Compare the streaming squeue/sinfo parsers against the buffered approach.
+
+The "buffered" implementation is the parser get_queue/get_resources used
+before slurm_parse existed: capture the whole stdout string, split("\\n"),
+then split("|") and strip() every field. Both read real command output from
+the fake Slurm shim; peak memory is measured with tracemalloc and wall time
+with perf_counter (best of --repeat runs, measured without tracemalloc).
+
+Usage:
+    python bench/parse_bench.py --jobs 100000 --nodes 50000
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+import run_bench  # noqa: E402
+import slurm_parse  # noqa: E402
+
+QUEUE_CMD = ["squeue", "-o", slurm_parse.QUEUE_FORMAT]
+NODE_CMD = ["sinfo", "-N", "-h", "-o", slurm_parse.NODE_FORMAT]
+
+
+def buffered_queue():
+    output = subprocess.run(QUEUE_CMD, stdout=subprocess.PIPE, universal_newlines=True).stdout
+    jobs = []
+    lines = output.strip().split("\n")
+    if len(lines) > 0 and "JOBID" in lines[0].upper():
+        lines = lines[1:]
+    fields = slurm_parse.QUEUE_FIELDS
+    for line in lines:
+        parts = line.split("|", len(fields) - 1)
+        if len(parts) < len(fields):
+            continue
+        jobs.append(dict(zip(fields, (p.strip() for p in parts))))
+    return jobs
+
+
+def buffered_nodes():
+    output = subprocess.run(NODE_CMD, stdout=subprocess.PIPE, universal_newlines=True).stdout
+    nodes = []
+    for line in [ln for ln in output.strip().split("\n") if ln.strip()]:
+        parts = line.split("|")
+        if len(parts) < 6:
+            continue
+        name, state, cpu_field, total_mem_str, free_mem_str, partition = [p.strip() for p in parts[:6]]
+        cpu_parts = cpu_field.split("/")
+        if len(cpu_parts) == 4:
+            cpus_allocated, cpus_idle, cpus_total = int(cpu_parts[0]), int(cpu_parts[1]), int(cpu_parts[3])
+        else:
+            cpus_allocated = cpus_idle = cpus_total = 0
+        total_mem_mb = slurm_parse.parse_memory_mb(total_mem_str)
+        free_mem_mb = slurm_parse.parse_memory_mb(free_mem_str)
+        used_mem_mb = 0
+        if total_mem_mb > 0 and not any(s in state for s in ("down", "drain", "fail")):
+            used_mem_mb = total_mem_mb - free_mem_mb
+        nodes.append({
+            "name": name, "state": state, "partition": partition,
+            "cpus_allocated": cpus_allocated, "cpus_idle": cpus_idle, "cpus_total": cpus_total,
+            "memory_total_mb": total_mem_mb, "memory_free_mb": free_mem_mb,
+            "memory_used_mb": max(0, min(used_mem_mb, total_mem_mb)),
+        })
+    return nodes
+
+
+def streaming_queue():
+    return list(slurm_parse.iter_jobs(slurm_parse.iter_command_lines(QUEUE_CMD)))
+
+
+def streaming_nodes():
+    return list(slurm_parse.iter_nodes(slurm_parse.iter_command_lines(NODE_CMD)))
+
+
+def measure(fn, repeat):
+    """Return (best wall seconds, peak traced bytes, retained bytes, rows)."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = len(fn())
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    tracemalloc.start()
+    result = fn()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return best, peak, retained, rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=100000)
+    parser.add_argument("--nodes", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--results", default=run_bench.DEFAULT_RESULTS)
+    args = parser.parse_args(argv)
+
+    run_bench.install_shims()
+    run_bench.set_cluster(args.nodes, args.jobs)
+    # Generate and cache the shim output once so only parsing is compared
+    subprocess.run(QUEUE_CMD, stdout=subprocess.DEVNULL)
+    subprocess.run(NODE_CMD, stdout=subprocess.DEVNULL)
+
+    results = []
+    for kind, variants in (
+        ("squeue", (("buffered", buffered_queue), ("streaming", streaming_queue))),
+        ("sinfo", (("buffered", buffered_nodes), ("streaming", streaming_nodes))),
+    ):
+        for variant, fn in variants:
+            wall, peak, retained, rows = measure(fn, args.repeat)
+            results.append({
+                "suite": "parser",
+                "endpoint": f"{kind}:{variant}",
+                "nodes": args.nodes,
+                "jobs": args.jobs,
+                "rows": rows,
+                "wall_ms": round(wall * 1000, 3),
+                "peak_kib": peak // 1024,
+                "retained_kib": retained // 1024,
+            })
+            print(f"{kind:7s} {variant:10s} rows={rows:7d} wall={wall * 1000:9.1f} ms "
+                  f"peak={peak / 1024 / 1024:8.1f} MiB retained={retained / 1024 / 1024:8.1f} MiB")
+    run_bench.record(results, args.results)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""Benchmark and load-test suite for the SLURM-GUI backend.
+
+Runs the backend against the fake Slurm shim in fake_slurm.py, so no real
+cluster is needed. Measures:
+
+  * parse   - throughput of get_queue / get_resources on synthetic clusters
+              (command output is pre-generated, so only parsing and JSON
+              encoding are timed)
+  * load    - end-to-end endpoint latency under N concurrent HTTP clients
+  * echo    - terminal echo round-trip latency over Socket.IO
+
+Every run appends one JSON line per measurement to the results file
+(default: bench/results.jsonl) and prints the change against the previous
+run with the same parameters, so regressions are visible.
+
+Usage:
+    python bench/run_bench.py                      # all suites, default sizes
+    python bench/run_bench.py --suite parse --nodes 1000 10000 50000 --jobs 100000
+    python bench/run_bench.py --suite load --clients 32 --requests 500
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+SHIM = os.path.join(BENCH_DIR, "fake_slurm.py")
+SHIM_COMMANDS = ["squeue", "sinfo", "sbatch", "salloc", "srun", "sacct", "sstat", "sshare", "sreport", "scontrol", "scancel"]
+DEFAULT_RESULTS = os.path.join(BENCH_DIR, "results.jsonl")
+REGRESSION_THRESHOLD = 0.10  # flag anything >10% worse than the previous run
+# the suite measures the backend itself, not its protection against overload:
+# no rate limits, and admission budgets above any --clients value
+BENCH_ENV = {
+    "SLURM_GUI_RATE_LIMITS": "off",
+    "SLURM_GUI_WORK_SLOTS": 1024,
+    "SLURM_GUI_WORK_LIMITS": "interactive=1024/1024,control=1024/1024,refresh=1024/1024",
+    "SLURM_GUI_POLL_DEADLINE": 60,
+}
+
+
+def install_shims(env_overrides=None):
+    """Symlink the shim under each Slurm command name and put it first on PATH.
+
+    Returns the temporary directory holding the shims (and the output cache).
+    """
+    root = tempfile.mkdtemp(prefix="fake-slurm-")
+    bin_dir = os.path.join(root, "bin")
+    os.makedirs(bin_dir)
+    os.chmod(SHIM, 0o755)
+    for name in SHIM_COMMANDS:
+        os.symlink(SHIM, os.path.join(bin_dir, name))
+    os.environ["PATH"] = bin_dir + os.pathsep + os.environ.get("PATH", "")
+    os.environ["FAKE_SLURM_CACHE"] = os.path.join(root, "cache")
+    for key, value in (env_overrides or {}).items():
+        os.environ[key] = str(value)
+    return root
+
+
+def set_cluster(nodes, jobs):
+    os.environ["FAKE_SLURM_NODES"] = str(nodes)
+    os.environ["FAKE_SLURM_JOBS"] = str(jobs)
+
+
+def load_server():
+    """Import backend/server.py as a module (requires the backend requirements)."""
+    if BACKEND_DIR not in sys.path:
+        sys.path.insert(0, BACKEND_DIR)
+    import server
+    return server
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    if not samples:
+        return {}
+
+    def pick(q):
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    return {
+        "p50_ms": round(pick(0.50) * 1000, 3),
+        "p95_ms": round(pick(0.95) * 1000, 3),
+        "p99_ms": round(pick(0.99) * 1000, 3),
+        "mean_ms": round(statistics.mean(samples) * 1000, 3),
+        "max_ms": round(samples[-1] * 1000, 3),
+    }
+
+
+# -- parse throughput --------------------------------------------------------
+
+def bench_parse(server, nodes_list, jobs, repeat):
+    """Time get_queue/get_resources with Slurm output already generated.
+
+    Each command is run once through the shim to warm its cache, then the
+    endpoint is called `repeat` times through the Flask test client, with
+    the endpoint's snapshot invalidated before each call so every request
+    re-parses and re-encodes instead of hitting the snapshot cache. The
+    subprocess cost of `cat`-ing cached output is measured separately and
+    reported so parse time can be read as total minus command time.
+    """
+    client = server.app.test_client()
+    results = []
+    for nodes in nodes_list:
+        set_cluster(nodes, jobs)
+        for endpoint, snapshot, rows, cmd in (
+            # the exact commands collect_queue / collect_resources run
+            ("/api/queue", "queue", jobs, ["squeue", "-o", server.slurm_parse.QUEUE_FORMAT]),
+            ("/api/resources", "resources", nodes, ["sinfo", "-N", "-h", "-o", server.slurm_parse.NODE_FORMAT]),
+        ):
+            client.get(endpoint)  # warm shim cache and any backend caches
+            cmd_times = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                subprocess.run(cmd, stdout=subprocess.DEVNULL, check=False)
+                cmd_times.append(time.perf_counter() - start)
+            times = []
+            for _ in range(repeat):
+                server.snapshots.invalidate(snapshot)
+                start = time.perf_counter()
+                resp = client.get(endpoint)
+                resp.get_data()
+                times.append(time.perf_counter() - start)
+                if resp.status_code >= 500:
+                    raise RuntimeError(f"{endpoint} failed: {resp.status_code}")
+            best = min(times)
+            parse = max(best - min(cmd_times), 1e-9)
+            results.append({
+                "suite": "parse",
+                "endpoint": endpoint,
+                "nodes": nodes,
+                "jobs": jobs,
+                "best_ms": round(best * 1000, 3),
+                "command_ms": round(min(cmd_times) * 1000, 3),
+                "parse_ms": round(parse * 1000, 3),
+                "rows_per_s": int(rows / parse),
+            })
+    return results
+
+
+# -- concurrent endpoint latency ---------------------------------------------
+
+def _serve(server):
+    """Run the Flask app on an ephemeral port in a background thread."""
+    from werkzeug.serving import make_server
+    httpd = make_server("127.0.0.1", 0, server.app, threaded=True)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    return httpd
+
+
+def bench_load(server, nodes, jobs, clients, requests_per_client):
+    """Hammer the polling endpoints with `clients` concurrent HTTP clients."""
+    from urllib.request import urlopen
+
+    set_cluster(nodes, jobs)
+    httpd = _serve(server)
+    base = f"http://127.0.0.1:{httpd.server_port}"
+    results = []
+    try:
+        for endpoint in ("/api/queue", "/api/resources"):
+            urlopen(base + endpoint).read()  # warm
+
+            first_error = []
+
+            def worker(_):
+                latencies = []
+                errors = 0
+                for _ in range(requests_per_client):
+                    start = time.perf_counter()
+                    try:
+                        with urlopen(base + endpoint, timeout=60) as resp:
+                            resp.read()
+                    except Exception as e:
+                        errors += 1
+                        if not first_error:
+                            first_error.append(str(e))
+                    latencies.append(time.perf_counter() - start)
+                return latencies, errors
+
+            wall = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=clients) as pool:
+                outcomes = list(pool.map(worker, range(clients)))
+            wall = time.perf_counter() - wall
+            latencies = [lat for lats, _ in outcomes for lat in lats]
+            entry = {
+                "suite": "load",
+                "endpoint": endpoint,
+                "nodes": nodes,
+                "jobs": jobs,
+                "clients": clients,
+                "requests": len(latencies),
+                "errors": sum(err for _, err in outcomes),
+                "req_per_s": round(len(latencies) / wall, 1),
+            }
+            if first_error:
+                entry["first_error"] = first_error[0]
+                print(f"{endpoint}: {entry['errors']} failed requests, first: {first_error[0]}")
+            entry.update(percentiles(latencies))
+            results.append(entry)
+    finally:
+        httpd.shutdown()
+    return results
+
+
+# -- terminal echo round trip -------------------------------------------------
+
+def bench_echo(server, rounds):
+    """Measure keystroke -> terminal_output latency through a PTY session.
+
+    The fake salloc execs the trailing command, so the session is a real
+    /bin/bash behind a PTY; each round sends a unique marker and waits for
+    it to come back on `terminal_output`.
+    """
+    http = server.app.test_client()
+    resp = http.post("/api/submit/salloc", json={"nodes": 1, "time": 1})
+    session_id = resp.get_json().get("session_id")
+    if not session_id:
+        raise RuntimeError(f"salloc session failed: {resp.get_json()}")
+
+    sio = server.socketio.test_client(server.app)
+    sio.emit("terminal_connect", {"session_id": session_id})
+    time.sleep(0.5)
+    sio.get_received()
+
+    latencies = []
+    timeouts = 0
+    for i in range(rounds):
+        marker = f"m{i:05d}"
+        start = time.perf_counter()
+        sio.emit("terminal_input", {"session_id": session_id, "input": marker})
+        seen = ""
+        deadline = start + 5
+        while marker not in seen and time.perf_counter() < deadline:
+            for packet in sio.get_received():
+                if packet["name"] == "terminal_output":
+                    seen += packet["args"][0].get("output", "")
+            if marker not in seen:
+                time.sleep(0.0005)
+        if marker in seen:
+            latencies.append(time.perf_counter() - start)
+        else:
+            timeouts += 1
+        # erase the marker from the shell's line buffer
+        sio.emit("terminal_input", {"session_id": session_id, "input": "\x15"})
+    sio.emit("terminal_input", {"session_id": session_id, "input": "exit\n"})
+    sio.disconnect()
+
+    entry = {"suite": "echo", "rounds": rounds, "timeouts": timeouts}
+    entry.update(percentiles(latencies))
+    return [entry]
+
+
+# -- result recording --------------------------------------------------------
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, universal_newlines=True,
+        ).stdout.strip()
+    except Exception:
+        return ""
+
+
+def _key(entry):
+    """Fields identifying comparable measurements across runs."""
+    return tuple((k, entry.get(k)) for k in ("suite", "endpoint", "nodes", "jobs", "clients", "rounds"))
+
+
+# metric -> True when bigger is better
+TRACKED_METRICS = {
+    "parse_ms": False,
+    "rows_per_s": True,
+    "p50_ms": False,
+    "p95_ms": False,
+    "p99_ms": False,
+    "req_per_s": True,
+    "wall_ms": False,
+    "peak_kib": False,
+}
+
+
+def load_previous(path):
+    previous = {}
+    if not os.path.exists(path):
+        return previous
+    with open(path) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            previous[_key(entry)] = entry
+    return previous
+
+
+def compare(entry, previous):
+    """Return human-readable regression notes for one measurement."""
+    old = previous.get(_key(entry))
+    if not old:
+        return []
+    notes = []
+    for metric, higher_is_better in TRACKED_METRICS.items():
+        if metric not in entry or not old.get(metric):
+            continue
+        change = (entry[metric] - old[metric]) / old[metric]
+        worse = -change if higher_is_better else change
+        marker = "REGRESSION" if worse > REGRESSION_THRESHOLD else "ok"
+        notes.append(f"{metric} {old[metric]} -> {entry[metric]} ({change:+.1%}) {marker}")
+    return notes
+
+
+def record(results, path):
+    previous = load_previous(path)
+    revision = _git_revision()
+    stamp = time.strftime("%Y-%m-%dT%H:%M:%S")
+    regressions = 0
+    with open(path, "a") as f:
+        for entry in results:
+            notes = compare(entry, previous)
+            regressions += sum(1 for n in notes if n.endswith("REGRESSION"))
+            entry = dict(entry, revision=revision, recorded_at=stamp)
+            f.write(json.dumps(entry) + "\n")
+            label = " ".join(f"{k}={v}" for k, v in _key(entry) if v is not None)
+            print(f"{label}: " + json.dumps({k: v for k, v in entry.items() if k in TRACKED_METRICS}))
+            for note in notes:
+                print(f"    {note}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--suite", choices=["parse", "load", "echo", "all"], default="all")
+    parser.add_argument("--nodes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--jobs", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=50, help="requests per client")
+    parser.add_argument("--rounds", type=int, default=200, help="terminal echo rounds")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--results", default=DEFAULT_RESULTS)
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args(argv)
+
+    install_shims(dict(BENCH_ENV, FAKE_SLURM_SEED=args.seed))
+    server = load_server()
+
+    results = []
+    if args.suite in ("parse", "all"):
+        results += bench_parse(server, args.nodes, args.jobs, args.repeat)
+    if args.suite in ("load", "all"):
+        results += bench_load(server, args.nodes[0], args.jobs, args.clients, args.requests)
+    if args.suite in ("echo", "all"):
+        results += bench_echo(server, args.rounds)
+
+    regressions = record(results, args.results)
+    if regressions:
+        print(f"{regressions} metric(s) regressed by more than {REGRESSION_THRESHOLD:.0%}")
+        if args.fail_on_regression:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,184 @@
+"""Bulk job control: cancel, hold, release or requeue many jobs at once.
+
+Targets come from explicit job ids ("123", array tasks "123_4", array ranges
+"123_[1-50]"), whole arrays by parent id, and/or a filter (user, name, state,
+partition) matched against the queue snapshot. They are folded into as few
+job specs as possible -- every task of one array becomes a single
+"123_[1-5,9]" expression, and tasks of an array that is targeted as a whole
+are dropped -- then sent BATCH_SIZE specs per `scancel` / `scontrol <action>`
+call. Cancelling a 500-task sweep is one fork instead of 500.
+
+scontrol splits its job list on commas, so it gets array tasks spelled out
+("123_1,123_2,...") instead of bracketed ranges; scancel takes them as is.
+"""
+import re
+
+import job_arrays
+import slurm_parse
+import watch
+
+# action -> (command prefix, accepts "123_[1-5]" array expressions)
+ACTIONS = {
+    "cancel": (["scancel"], True),
+    "hold": (["scontrol", "hold"], False),
+    "release": (["scontrol", "release"], False),
+    "requeue": (["scontrol", "requeue"], False),
+}
+FILTER_FIELDS = ("user", "name", "state", "partition")
+BATCH_SIZE = 500     # job specs per command
+MAX_TASKS = 100000   # array tasks spelled out for scontrol per request
+
+JOB_SPEC_RE = re.compile(r"^\d+(?:_(?:\d+|\[[\d,:%-]+\]))?$")
+# job ids mentioned in Slurm's error messages ("... job id 123_4: Invalid ...")
+ERROR_JOB_RE = re.compile(r"\b(\d+)(?:_(\d+|\[[^\]]*\]))?")
+
+
+STATE_CODES = {name: code for code, name in watch.STATE_NAMES.items()}
+
+
+def _state_code(state):
+    """squeue's short state code for "PENDING" or "PD" (any case)."""
+    state = state.upper()
+    if state in watch.STATE_NAMES:
+        return state
+    if state in STATE_CODES:
+        return STATE_CODES[state]
+    raise ValueError(f"Unknown job state '{state}'")
+
+
+def _normalize(filters):
+    """{field: set of wanted values}, with states as squeue codes."""
+    out = {}
+    for field, wanted in filters.items():
+        if isinstance(wanted, str):
+            wanted = wanted.split(",")
+        wanted = {str(w).strip() for w in wanted if str(w).strip()}
+        if field == "state":
+            wanted = {_state_code(w) for w in wanted}
+        out[field] = wanted
+    return out
+
+
+def _matches(job, filters):
+    for field, wanted in filters.items():
+        value = str(job.get(field, ""))
+        if field == "state":
+            value = value.upper()
+        if value not in wanted:
+            return False
+    return True
+
+
+def resolve(job_ids=(), arrays=(), filters=None, jobs=None):
+    """Collect target job specs from ids, array parents and a queue filter.
+
+    `jobs` is the queue (squeue rows) the filter is matched against. Raises
+    ValueError for malformed ids or filters.
+    """
+    specs = []
+    for job_id in list(job_ids) + list(arrays):
+        job_id = str(job_id).strip()
+        if not JOB_SPEC_RE.match(job_id):
+            raise ValueError(f"Invalid job id '{job_id}'")
+        specs.append(job_id)
+    if filters:
+        unknown = set(filters) - set(FILTER_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown filter fields: {', '.join(sorted(unknown))}")
+        filters = {k: v for k, v in filters.items() if v not in (None, "", [])}
+        if not filters:
+            raise ValueError("Filter matches every job; name at least one field")
+        filters = _normalize(filters)
+        specs.extend(job["job_id"] for job in jobs or () if _matches(job, filters))
+    return specs
+
+
+def fold(specs, ranges_ok=True):
+    """Merge job specs into the fewest arguments, in first-seen order.
+
+    With `ranges_ok` array tasks of one parent become "parent_[ranges]";
+    otherwise they are spelled out one task per spec.
+    """
+    whole = set()
+    tasks = {}   # parent -> [(lo, hi), ...]
+    order = []
+    for spec in specs:
+        parent, ranges, _ = job_arrays.parse_job_id(spec)
+        key = parent or spec
+        if key not in whole and key not in tasks:
+            order.append(key)
+        if parent is None:
+            whole.add(spec)
+        else:
+            tasks.setdefault(parent, []).extend(ranges)
+
+    out = []
+    spelled = 0
+    for key in order:
+        if key in whole:
+            out.append(key)
+            continue
+        ranges = job_arrays.merge_ranges(tasks[key])
+        if ranges_ok:
+            if len(ranges) == 1 and ranges[0][0] == ranges[0][1]:
+                out.append(f"{key}_{ranges[0][0]}")
+            else:
+                out.append(f"{key}_[{job_arrays.format_ranges(ranges)}]")
+            continue
+        spelled += job_arrays.count_ranges(ranges)
+        if spelled > MAX_TASKS:
+            raise ValueError(f"More than {MAX_TASKS} array tasks; target the arrays as a whole")
+        out.extend(f"{key}_{task}" for lo, hi in ranges for task in range(lo, hi + 1))
+    return out
+
+
+def plan(action, specs):
+    """[(argv, batch_specs), ...] for `action` on the folded `specs`."""
+    prefix, ranges_ok = ACTIONS[action]
+    specs = fold(specs, ranges_ok)
+    batches = [specs[i:i + BATCH_SIZE] for i in range(0, len(specs), BATCH_SIZE)]
+    if ranges_ok:
+        return [(prefix + batch, batch) for batch in batches]
+    return [(prefix + [",".join(batch)], batch) for batch in batches]
+
+
+def _attribute(message, batch):
+    """Map the job ids named in an error message onto the specs of `batch`.
+
+    Returns {spec: error line}; a task id counts against the range or whole
+    array spec that contains it.
+    """
+    owners = {}
+    for spec in batch:
+        parent, ranges, _ = job_arrays.parse_job_id(spec)
+        owners.setdefault(parent or spec, []).append((spec, ranges))
+    failed = {}
+    for line in message.splitlines():
+        for job, task in ERROR_JOB_RE.findall(line):
+            for spec, ranges in owners.get(job, ()):
+                if not ranges or not task.isdigit() or any(lo <= int(task) <= hi for lo, hi in ranges):
+                    failed.setdefault(spec, line.strip())
+    return failed
+
+
+def execute(action, specs, timeout=60):
+    """Run `action` on `specs`; returns (results, commands_run).
+
+    results is a list of {"job_id", "ok", "error"} with one entry per folded
+    spec. When a batch fails, the specs its error output names are marked
+    failed and the rest succeeded; if it names none, the whole batch failed.
+    """
+    results = []
+    commands = 0
+    for argv, batch in plan(action, specs):
+        commands += 1
+        try:
+            for _ in slurm_parse.iter_command_lines(argv, timeout=timeout):
+                pass
+            failed = {}
+        except slurm_parse.SlurmCommandError as e:
+            message = str(e).replace("command failed: ", "", 1)
+            failed = _attribute(message, batch) or {spec: message for spec in batch}
+        results.extend({"job_id": spec, "ok": spec not in failed, "error": failed.get(spec)}
+                       for spec in batch)
+    return results, commands
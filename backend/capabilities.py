@@ -0,0 +1,150 @@
+"""Which Slurm tools exist, where, and which Slurm version they belong to.
+
+Looking this up used to cost a `which` fork per request and three serial
+forks before the server started listening. Tool paths now come from
+shutil.which (no fork) and the version from one `sinfo --version`, probed
+in the background after startup and cached in CACHE_PATH. The cache is
+reused across restarts while PATH, the mtimes of the PATH directories and
+the mtimes of the tool binaries are unchanged, so an upgrade or a changed
+environment triggers a fresh probe.
+"""
+import json
+import os
+import shutil
+import subprocess
+import threading
+import time
+
+import scheduler
+
+TOOLS = ("squeue", "sinfo", "sbatch", "salloc", "srun", "scancel", "scontrol",
+         "sacct", "sstat", "sshare", "sreport")
+CACHE_PATH = os.environ.get(
+    "SLURM_GUI_CAPABILITIES_CACHE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".capabilities.json"),
+)
+RECHECK_INTERVAL = float(os.environ.get("SLURM_GUI_CAPABILITIES_INTERVAL", "300"))
+VERSION_TIMEOUT = 10
+
+_caps = None  # {"fingerprint", "tools": {name: path|None}, "version", "probed_at"}
+_override = None  # fixed capabilities, e.g. while replaying a capture
+_lock = threading.Lock()
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def fingerprint(tools=None):
+    """PATH plus the mtimes of its directories and of the found tools."""
+    path = os.environ.get("PATH", "")
+    dirs = [d for d in path.split(os.pathsep) if d]
+    return {
+        "path": path,
+        "dirs": {d: _mtime(d) for d in dirs},
+        "tools": {name: _mtime(p) for name, p in (tools or {}).items() if p},
+    }
+
+
+def _fresh(caps):
+    return caps is not None and caps.get("fingerprint") == fingerprint(caps.get("tools"))
+
+
+def _load_cache():
+    try:
+        with open(CACHE_PATH) as f:
+            caps = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return caps if _fresh(caps) else None
+
+
+def _save_cache(caps):
+    tmp = f"{CACHE_PATH}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "w") as f:
+            json.dump(caps, f)
+        os.replace(tmp, CACHE_PATH)
+    except OSError as e:
+        print(f"Could not write capabilities cache: {e}")
+
+
+def _which_all():
+    return {name: shutil.which(name) for name in TOOLS}
+
+
+def _version(tools):
+    """"slurm 23.02.6" from `sinfo --version` (any tool would do)."""
+    for name in ("sinfo", "squeue", "sbatch"):
+        if tools.get(name):
+            try:
+                result = scheduler.blocking(
+                    subprocess.run, [tools[name], "--version"], stdout=subprocess.PIPE,
+                    stderr=subprocess.DEVNULL, universal_newlines=True, timeout=VERSION_TIMEOUT)
+            except (OSError, subprocess.SubprocessError) as e:
+                print(f"{name} --version failed: {e}")
+                continue
+            return result.stdout.strip() or None
+    return None
+
+
+def probe():
+    """Re-discover tool paths and the Slurm version, and update the cache."""
+    global _caps
+    tools = _which_all()
+    caps = {"tools": tools, "version": _version(tools), "probed_at": time.time(),
+            "fingerprint": fingerprint(tools)}
+    with _lock:
+        _caps = caps
+    _save_cache(caps)
+    return caps
+
+
+def override(caps):
+    """Report `caps` instead of probing (None to go back to probing)."""
+    global _override
+    _override = caps
+
+
+def get():
+    """Current capabilities without forking.
+
+    Uses the in-memory result or a still-valid disk cache; before the first
+    background probe finishes it falls back to shutil.which with the version
+    unknown (None).
+    """
+    global _caps
+    if _override is not None:
+        return _override
+    with _lock:
+        if _caps is None:
+            _caps = _load_cache() or {"tools": _which_all(), "version": None, "probed_at": None}
+        return _caps
+
+
+def tool_path(name):
+    caps = get()
+    return caps["tools"].get(name) or (None if caps is _override else shutil.which(name))
+
+
+def available(name):
+    return tool_path(name) is not None
+
+
+def run_loop(socketio):
+    """Background task: probe once unless the cache is fresh, then re-check
+    the fingerprint every RECHECK_INTERVAL seconds."""
+    while True:
+        try:
+            caps = get()
+            if _override is None and (caps.get("probed_at") is None or not _fresh(caps)):
+                caps = probe()
+                found = sorted(n for n, p in caps["tools"].items() if p)
+                print(f"Slurm capabilities: {caps['version'] or 'version unknown'}; "
+                      f"tools: {', '.join(found) or 'none'}")
+        except Exception as e:
+            print(f"capabilities probe error: {e}")
+        socketio.sleep(RECHECK_INTERVAL)
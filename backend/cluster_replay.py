@@ -0,0 +1,272 @@
+"""Capture Slurm command output to a file and serve the API from it offline.
+
+Capture: with SLURM_GUI_CAPTURE=<file> every Slurm command the backend runs
+(through slurm_parse.iter_command_lines or server.run_command) is appended
+to <file> as gzip-compressed JSON lines {"t", "argv", "rc", "stdout",
+"stderr"}. An output identical to the previous one for the same command is
+stored as {"t", "argv", "same": true}, so polling a quiet cluster costs a
+few bytes per call. The same file can be made without the server:
+
+    python cluster_replay.py capture prod.jsonl.gz --interval 10 --duration 3600
+
+Replay: with SLURM_GUI_REPLAY=<file> no command is run. Each one is answered
+with the captured output that was current at the replay clock, which starts
+at the beginning of the capture and runs SLURM_GUI_REPLAY_SPEED times real
+time (0 freezes it at the start; SLURM_GUI_REPLAY_LOOP=1 wraps around at
+the end). Commands are matched on their exact arguments, falling back to
+the arguments with timestamps masked (sacct windows differ per run).
+Commands never captured fail as if Slurm were not installed.
+
+    python cluster_replay.py info prod.jsonl.gz
+"""
+import argparse
+import bisect
+import json
+import os
+import re
+import socket
+import sys
+import threading
+import time
+import zlib
+
+import capabilities
+import slurm_parse
+
+CAPTURE_PATH = os.environ.get("SLURM_GUI_CAPTURE")
+REPLAY_PATH = os.environ.get("SLURM_GUI_REPLAY")
+REPLAY_SPEED = float(os.environ.get("SLURM_GUI_REPLAY_SPEED", "1"))
+REPLAY_LOOP = os.environ.get("SLURM_GUI_REPLAY_LOOP", "0") == "1"
+
+TIMESTAMP_RE = re.compile(r"\d{4}-\d{2}-\d{2}(?:T\d{2}:\d{2}(?::\d{2})?)?")
+FORMAT_VERSION = 1
+
+
+def command_key(argv, masked=False):
+    name = os.path.basename(argv[0]) if argv else ""
+    args = [TIMESTAMP_RE.sub("<ts>", a) for a in argv[1:]] if masked else list(argv[1:])
+    return json.dumps([name] + args)
+
+
+# -- capture -----------------------------------------------------------------
+
+class Capture:
+    """Append-only gzip JSONL writer; each record is sync-flushed to disk.
+
+    The header's slurm_version comes from the capabilities cache. The server
+    must not probe while importing (that would delay listening), so when the
+    version is not known yet it is written as a later header record, once
+    the background probe has found it. `probe=True` probes up front instead.
+    """
+
+    def __init__(self, path, probe=False):
+        self.path = path
+        self._lock = threading.Lock()
+        self._compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        self._last = {}  # key -> (rc, stdout, stderr)
+        self._t0 = time.time()
+        self._version = capabilities.get()["version"]
+        if self._version is None and probe:
+            self._version = capabilities.probe()["version"]
+        self._write({"version": FORMAT_VERSION, "captured_at": self._t0,
+                     "host": socket.gethostname(), "slurm_version": self._version})
+
+    def _write(self, record):
+        data = (json.dumps(record, ensure_ascii=False) + "\n").encode()
+        with open(self.path, "ab") as f:
+            f.write(self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH))
+
+    def record(self, argv, returncode, stdout, stderr):
+        key = command_key(argv)
+        result = (returncode, stdout, stderr)
+        record = {"t": round(time.time() - self._t0, 3), "argv": list(argv)}
+        with self._lock:
+            if self._version is None:
+                self._version = capabilities.get()["version"]
+                if self._version is not None:
+                    self._write({"slurm_version": self._version})
+            if self._last.get(key) == result:
+                record["same"] = True
+            else:
+                self._last[key] = result
+                record.update(rc=returncode, stdout=stdout, stderr=stderr)
+            self._write(record)
+
+
+# -- replay ------------------------------------------------------------------
+
+def iter_file(path):
+    """Records of a capture file; tolerates a capture still being written."""
+    decompressor = zlib.decompressobj(31)
+    tail = b""
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(1 << 20)
+            if not chunk:
+                break
+            while chunk:
+                data = decompressor.decompress(chunk)
+                chunk = b""
+                if decompressor.eof:
+                    chunk = decompressor.unused_data
+                    decompressor = zlib.decompressobj(31)
+                lines = (tail + data).split(b"\n")
+                tail = lines.pop()
+                for line in lines:
+                    if line:
+                        yield json.loads(line)
+
+
+class Replay:
+    """Captured results per command, answered against a scaled clock."""
+
+    def __init__(self, path, speed=1.0, loop=False):
+        self.header = {}
+        self.speed = speed
+        self.loop = loop
+        self._times = {}    # key -> [t, ...]
+        self._results = {}  # key -> [(rc, stdout, stderr), ...]
+        last = {}
+        for record in iter_file(path):
+            if "argv" not in record:
+                self.header.update(record)  # the header, or a late slurm_version
+                continue
+            key = command_key(record["argv"])
+            if record.get("same"):
+                result = last.get(key)
+                if result is None:
+                    continue
+            else:
+                result = (record["rc"], record["stdout"], record["stderr"])
+                last[key] = result
+            for k in {key, command_key(record["argv"], masked=True)}:
+                self._times.setdefault(k, []).append(record["t"])
+                self._results.setdefault(k, []).append(result)
+        self.duration = max((times[-1] for times in self._times.values()), default=0.0)
+        self._started = time.monotonic()
+
+    def clock(self):
+        """Seconds into the capture that the replay has reached."""
+        t = (time.monotonic() - self._started) * self.speed
+        if self.loop and self.duration > 0:
+            return t % self.duration
+        return t
+
+    def run(self, argv):
+        """(returncode, stdout, stderr) for `argv` at the current replay time."""
+        for key in (command_key(argv), command_key(argv, masked=True)):
+            times = self._times.get(key)
+            if times:
+                i = max(bisect.bisect_right(times, self.clock()) - 1, 0)
+                return self._results[key][i]
+        name = argv[0] if argv else ""
+        return 127, "", f"command not found: {name} (not in capture)"
+
+    def commands(self):
+        """{command line: number of captured results} (exact keys only)."""
+        return {" ".join(json.loads(k)): len(v) for k, v in self._times.items() if "<ts>" not in k}
+
+
+_capture = None
+_replay = None
+
+
+def install():
+    """Hook capture or replay into command execution according to the env."""
+    global _capture, _replay
+    if REPLAY_PATH:
+        _replay = Replay(REPLAY_PATH, REPLAY_SPEED, REPLAY_LOOP)
+        slurm_parse.set_command_hooks(replayer=_replay.run)
+        capabilities.override({
+            "tools": {name: f"(replay) {name}" for name in capabilities.TOOLS},
+            "version": _replay.header.get("slurm_version"),
+            "probed_at": _replay.header.get("captured_at"),
+        })
+        print(f"Replaying Slurm output from {REPLAY_PATH} "
+              f"({_replay.duration:.0f}s captured, speed {REPLAY_SPEED}x)")
+    elif CAPTURE_PATH:
+        _capture = Capture(CAPTURE_PATH)
+        slurm_parse.set_command_hooks(recorder=_capture.record)
+        print(f"Capturing Slurm output to {CAPTURE_PATH}")
+
+
+def replayed_output(command):
+    """run_command()-style result string when replaying, else None."""
+    if _replay is None:
+        return None
+    returncode, stdout, stderr = _replay.run(command)
+    return stdout.strip() if returncode == 0 else f"error: {stderr}"
+
+
+def captured(command, returncode, stdout, stderr):
+    if _capture is not None:
+        _capture.record(command, returncode, stdout, stderr)
+
+
+# -- command line ------------------------------------------------------------
+
+def _capture_loop(path, interval, duration, slow_every):
+    """Run the backend's own collectors every `interval` seconds into `path`."""
+    # the ingest collectors write the history database; keep that out of the way
+    os.environ.setdefault("SLURM_GUI_HISTORY_DB", path + ".history.db")
+    import efficiency
+    import fairshare
+    import wait_predict
+
+    capture = Capture(path, probe=True)
+    slurm_parse.set_command_hooks(recorder=capture.record)
+    collectors = [
+        ("queue", lambda: list(slurm_parse.iter_command_lines(["squeue", "-o", slurm_parse.QUEUE_FORMAT]))),
+        ("nodes", lambda: list(slurm_parse.iter_command_lines(["sinfo", "-N", "-h", "-o", slurm_parse.NODE_FORMAT]))),
+        ("gres", lambda: list(slurm_parse.iter_command_lines(["sinfo", "-N", "-h", "-o", slurm_parse.GRES_FORMAT]))),
+        ("start estimates", lambda: list(slurm_parse.iter_command_lines(
+            ["squeue", "--start", "-h", "-t", "PD", "-o", slurm_parse.START_FORMAT]))),
+    ]
+    slow = [
+        ("fairshare", fairshare.collect),
+        ("job waits", wait_predict.ingest),
+        ("job efficiency", efficiency.ingest),
+    ]
+    started = time.time()
+    tick = 0
+    while duration is None or time.time() - started < duration:
+        began = time.time()
+        for name, fn in collectors + (slow if tick % slow_every == 0 else []):
+            try:
+                fn()
+            except Exception as e:
+                print(f"{name}: {e}", file=sys.stderr)
+        tick += 1
+        print(f"capture {tick}: {time.time() - began:.2f}s, {os.path.getsize(path)} bytes", file=sys.stderr)
+        time.sleep(max(0.0, interval - (time.time() - began)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    cap = sub.add_parser("capture", help="capture the cluster's Slurm output periodically")
+    cap.add_argument("path")
+    cap.add_argument("--interval", type=float, default=10.0, help="seconds between captures")
+    cap.add_argument("--duration", type=float, default=None, help="stop after this many seconds")
+    cap.add_argument("--slow-every", type=int, default=30,
+                     help="run sshare/sreport/sacct every N captures")
+    info = sub.add_parser("info", help="summarize a capture file")
+    info.add_argument("path")
+    args = parser.parse_args(argv)
+
+    if args.cmd == "capture":
+        try:
+            _capture_loop(args.path, args.interval, args.duration, max(1, args.slow_every))
+        except KeyboardInterrupt:
+            pass
+        return 0
+    replay = Replay(args.path)
+    print(json.dumps(replay.header))
+    print(f"duration: {replay.duration:.0f}s, file size: {os.path.getsize(args.path)} bytes")
+    for command, count in sorted(replay.commands().items()):
+        print(f"{count:6d}  {command[:120]}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
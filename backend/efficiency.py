@@ -0,0 +1,315 @@
+"""CPU and memory efficiency of jobs, collected in batches.
+
+Finished jobs are pulled from sacct a window at a time (one call for every
+job that ended since the last ingest) and stored in the history database
+together with per user/account/day rollups, so usage reports never have to
+go back to sacct. Running jobs are measured on demand with sstat, SSTAT_BATCH
+job ids per call, and cached for LIVE_TTL seconds.
+
+Efficiency is what was used over what was allocated: CPU time over
+elapsed x allocated CPUs, and memory used over requested memory. Memory
+used is a step's TRESUsageInTot mem, the peak RSS of each of its tasks
+summed over all tasks and nodes, so it compares with the job's total
+request; where that is missing it is estimated as MaxRSS (the largest
+single task) x NTasks. The largest step counts for the job. Rollups keep
+the underlying sums (CPU-seconds, MB-seconds) so any period can be
+aggregated with correctly weighted ratios.
+"""
+import itertools
+import os
+import threading
+import time
+
+import history
+import scheduler
+import slurm_parse
+
+BACKFILL_DAYS = float(os.environ.get("SLURM_GUI_EFFICIENCY_BACKFILL_DAYS", "7"))
+SSTAT_BATCH = 200  # job ids per sstat call
+STORE_BATCH = 1000  # sacct rows written per history transaction
+LIVE_TTL = 30      # seconds a running job's measurement is reused
+
+SACCT_FIELDS = ("JobID,JobName,User,Account,Partition,State,End,ElapsedRaw,"
+                "AllocCPUS,TotalCPU,ReqMem,NNodes,MaxRSS,NTasks,TRESUsageInTot")
+SSTAT_FIELDS = "JobID,AveCPU,NTasks,MaxRSS,TRESUsageInTot"
+ENDED_STATES = "CD,F,TO,CA,OOM,NF,PR,DL"
+
+SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS job_efficiency (
+        job_id TEXT PRIMARY KEY,
+        name TEXT,
+        user TEXT,
+        account TEXT,
+        partition TEXT,
+        state TEXT,
+        end_ts REAL,
+        elapsed_s REAL,
+        alloc_cpus INTEGER,
+        cpu_used_s REAL,
+        req_mem_mb REAL,
+        max_rss_mb REAL,
+        cpu_eff REAL,
+        mem_eff REAL
+    )""",
+    "CREATE INDEX IF NOT EXISTS job_efficiency_user ON job_efficiency (user, end_ts)",
+    "CREATE INDEX IF NOT EXISTS job_efficiency_end ON job_efficiency (end_ts)",
+    """CREATE TABLE IF NOT EXISTS efficiency_rollup (
+        user TEXT,
+        account TEXT,
+        day TEXT,
+        jobs INTEGER,
+        cpu_alloc_s REAL,
+        cpu_used_s REAL,
+        mem_req_mb_s REAL,
+        mem_used_mb_s REAL,
+        PRIMARY KEY (user, account, day)
+    )""",
+)
+JOB_COLUMNS = ("job_id", "name", "user", "account", "partition", "state", "end_ts", "elapsed_s",
+               "alloc_cpus", "cpu_used_s", "req_mem_mb", "max_rss_mb", "cpu_eff", "mem_eff")
+
+_schema_ready = False
+_live = {}  # job_id -> (measured_at, record)
+_live_lock = threading.Lock()
+
+
+def _ensure_schema():
+    global _schema_ready
+    if not _schema_ready:
+        history.ensure_schema(SCHEMA)
+        _schema_ready = True
+
+
+def _ratio(used, available):
+    return round(used / available, 4) if used is not None and available else None
+
+
+def _step_mem_mb(max_rss, ntasks, tres_usage_tot):
+    """Memory used by one step over all its tasks, in MB."""
+    total = slurm_parse.parse_tres(tres_usage_tot).get("mem")
+    if total:
+        return slurm_parse.parse_size_mb(total)
+    return slurm_parse.parse_size_mb(max_rss) * max(_int(ntasks), 1)
+
+
+def _finish(record):
+    """Fill in cpu_eff/mem_eff from the raw usage figures."""
+    record["cpu_eff"] = _ratio(record["cpu_used_s"], record["elapsed_s"] * record["alloc_cpus"])
+    record["mem_eff"] = _ratio(record["max_rss_mb"], record["req_mem_mb"])
+    return record
+
+
+def _int(value):
+    try:
+        return int(value)
+    except ValueError:
+        return 0
+
+
+def iter_sacct_efficiency(lines):
+    """Parse `sacct -P -o SACCT_FIELDS` lines (jobs and their steps) into records.
+
+    Job rows carry the allocation and total CPU time; max_rss_mb is the
+    memory used by the job's largest step, summed over its tasks.
+    """
+    jobs = {}
+    peak_rss = {}
+    for line in lines:
+        parts = line.split("|")
+        if len(parts) != 15:
+            continue
+        (job_id, name, user, account, partition, state, end, elapsed,
+         alloc_cpus, total_cpu, req_mem, nnodes, max_rss, ntasks, tres_usage_tot) = parts
+        parent, dot, _ = job_id.partition(".")
+        if dot:
+            rss = _step_mem_mb(max_rss, ntasks, tres_usage_tot)
+            peak_rss[parent] = max(peak_rss.get(parent, 0.0), rss)
+            continue
+        alloc_cpus, nnodes = _int(alloc_cpus), _int(nnodes)
+        jobs[job_id] = {
+            "job_id": job_id,
+            "name": name,
+            "user": user,
+            "account": account,
+            "partition": partition,
+            "state": state.split()[0] if state else state,  # "CANCELLED by 123"
+            "end_ts": slurm_parse.parse_timestamp(end),
+            "elapsed_s": float(_int(elapsed)),
+            "alloc_cpus": alloc_cpus,
+            "cpu_used_s": slurm_parse.parse_duration_s(total_cpu),
+            "req_mem_mb": slurm_parse.parse_req_mem_mb(req_mem, alloc_cpus, nnodes),
+            "max_rss_mb": _step_mem_mb(max_rss, ntasks, tres_usage_tot),
+        }
+    for job_id, record in jobs.items():
+        record["max_rss_mb"] = max(record["max_rss_mb"], peak_rss.get(job_id, 0.0))
+        yield _finish(record)
+
+
+def _store(records):
+    """Insert finished-job records and fold the new ones into the daily rollups."""
+    _ensure_schema()
+    sql = "INSERT OR IGNORE INTO job_efficiency (%s) VALUES (%s)" % (
+        ", ".join(JOB_COLUMNS), ", ".join("?" * len(JOB_COLUMNS)))
+    new = 0
+    records = iter(records)
+    # reading sacct yields to other green threads, so rows are written in
+    # batches instead of holding the history connection across the stream
+    while True:
+        batch = list(itertools.islice(records, STORE_BATCH))
+        if not batch:
+            return new
+        with history.connect() as conn:
+            new += _store_batch(conn, sql, batch)
+
+
+def _store_batch(conn, sql, batch):
+    new = 0
+    for r in batch:
+        if not conn.execute(sql, [r[c] for c in JOB_COLUMNS]).rowcount:
+            continue
+        new += 1
+        day = time.strftime("%Y-%m-%d", time.localtime(r["end_ts"] or time.time()))
+        # INSERT OR IGNORE + UPDATE rather than an upsert, which needs SQLite 3.24
+        key = (r["user"], r["account"], day)
+        conn.execute(
+            """INSERT OR IGNORE INTO efficiency_rollup
+               (user, account, day, jobs, cpu_alloc_s, cpu_used_s, mem_req_mb_s, mem_used_mb_s)
+               VALUES (?, ?, ?, 0, 0, 0, 0, 0)""", key)
+        conn.execute(
+            """UPDATE efficiency_rollup SET
+                 jobs = jobs + 1,
+                 cpu_alloc_s = cpu_alloc_s + ?,
+                 cpu_used_s = cpu_used_s + ?,
+                 mem_req_mb_s = mem_req_mb_s + ?,
+                 mem_used_mb_s = mem_used_mb_s + ?
+               WHERE user = ? AND account = ? AND day = ?""",
+            (r["elapsed_s"] * r["alloc_cpus"], r["cpu_used_s"],
+             r["elapsed_s"] * r["req_mem_mb"], r["elapsed_s"] * r["max_rss_mb"]) + key)
+    return new
+
+
+def ingest(now=None):
+    """Store every job that ended since the last ingest (one sacct call); returns the count."""
+    _ensure_schema()
+    now = time.time() if now is None else now
+    since = float(history.get_meta("efficiency_ingested_until", now - BACKFILL_DAYS * 86400)) - 3600
+    cmd = ["sacct", "-a", "-n", "-P", "-s", ENDED_STATES, "-o", SACCT_FIELDS,
+           "-S", time.strftime(slurm_parse.TIMESTAMP_FORMAT, time.localtime(since)),
+           "-E", time.strftime(slurm_parse.TIMESTAMP_FORMAT, time.localtime(now))]
+    new = _store(iter_sacct_efficiency(slurm_parse.iter_command_lines(cmd, timeout=300)))
+    history.set_meta("efficiency_ingested_until", now)
+    return new
+
+
+def prune(now=None):
+    """Drop per-job records older than the history retention (rollups are kept)."""
+    _ensure_schema()
+    cutoff = (time.time() if now is None else now) - history.RETENTION_DAYS * 86400
+    with history.connect() as conn:
+        conn.execute("DELETE FROM job_efficiency WHERE end_ts < ?", (cutoff,))
+
+
+def _measure(jobs):
+    """sstat the given running queue jobs, SSTAT_BATCH per call; returns {job_id: record}."""
+    usage = {}
+    ids = [j["job_id"] for j in jobs]
+    for start in range(0, len(ids), SSTAT_BATCH):
+        batch = ids[start:start + SSTAT_BATCH]
+        cmd = ["sstat", "-a", "-n", "-P", "-o", SSTAT_FIELDS, "-j", ",".join(batch)]
+        try:
+            for line in slurm_parse.iter_command_lines(cmd):
+                parts = line.split("|")
+                if len(parts) != 5:
+                    continue
+                step_id, ave_cpu, ntasks, max_rss, tres_usage_tot = parts
+                cpu, rss = usage.get(step_id.partition(".")[0], (0.0, 0.0))
+                usage[step_id.partition(".")[0]] = (
+                    cpu + slurm_parse.parse_duration_s(ave_cpu) * max(_int(ntasks), 1),
+                    max(rss, _step_mem_mb(max_rss, ntasks, tres_usage_tot)))
+        except slurm_parse.SlurmCommandError as e:
+            print(f"sstat error for {len(batch)} jobs: {e}")
+
+    records = {}
+    for job in jobs:
+        nodes = _int(job.get("nodes", "1"))
+        cpu_used, rss = usage.get(job["job_id"], (None, None))
+        records[job["job_id"]] = _finish({
+            "job_id": job["job_id"],
+            "name": job["name"],
+            "user": job["user"],
+            "partition": job.get("partition"),
+            "state": "RUNNING",
+            "elapsed_s": slurm_parse.parse_duration_s(job["time"]),
+            "alloc_cpus": _int(job.get("cpus", "0")),
+            "cpu_used_s": cpu_used,
+            "req_mem_mb": slurm_parse.parse_size_mb(job.get("min_memory", "")) * max(nodes, 1),
+            "max_rss_mb": rss,
+        })
+    return records
+
+
+def live(jobs):
+    """Current efficiency of running queue jobs, measuring only uncached ones."""
+    now = time.time()
+    running = [j for j in jobs if j["state"] == "R"]
+    with scheduler.locked(_live_lock):
+        stale = [j for j in running
+                 if j["job_id"] not in _live or now - _live[j["job_id"]][0] > LIVE_TTL]
+        if stale:
+            for job_id, record in _measure(stale).items():
+                _live[job_id] = (now, record)
+        for job_id in [k for k, (at, _) in _live.items() if now - at > LIVE_TTL * 10]:
+            del _live[job_id]
+        return [_live[j["job_id"]][1] for j in running if j["job_id"] in _live]
+
+
+def finished_jobs(user=None, account=None, since=None, limit=100):
+    """Stored finished jobs, most recent first."""
+    _ensure_schema()
+    where, args = ["end_ts >= ?"], [since or 0]
+    if user:
+        where.append("user = ?")
+        args.append(user)
+    if account:
+        where.append("account = ?")
+        args.append(account)
+    with history.connect() as conn:
+        rows = conn.execute(
+            "SELECT %s FROM job_efficiency WHERE %s ORDER BY end_ts DESC LIMIT ?"
+            % (", ".join(JOB_COLUMNS), " AND ".join(where)), args + [limit]).fetchall()
+    return [dict(zip(JOB_COLUMNS, row)) for row in rows]
+
+
+ROLLUP_GROUPS = {"user": ("user",), "account": ("account",), "user_account": ("user", "account")}
+
+
+def rollups(group="user", since=None, until=None, user=None, account=None):
+    """Aggregate daily rollups over [since, until] (YYYY-MM-DD) by user and/or account."""
+    _ensure_schema()
+    keys = ROLLUP_GROUPS[group]
+    where, args = ["1 = 1"], []
+    for column, value in (("day >= ?", since), ("day <= ?", until),
+                          ("user = ?", user), ("account = ?", account)):
+        if value:
+            where.append(column)
+            args.append(value)
+    with history.connect() as conn:
+        rows = conn.execute(
+            "SELECT %s, SUM(jobs), SUM(cpu_alloc_s), SUM(cpu_used_s), SUM(mem_req_mb_s), "
+            "SUM(mem_used_mb_s) FROM efficiency_rollup WHERE %s GROUP BY %s ORDER BY SUM(cpu_alloc_s) DESC"
+            % (", ".join(keys), " AND ".join(where), ", ".join(keys)), args).fetchall()
+    out = []
+    for row in rows:
+        jobs, cpu_alloc, cpu_used, mem_req, mem_used = row[len(keys):]
+        entry = dict(zip(keys, row[:len(keys)]))
+        entry.update({
+            "jobs": jobs,
+            "cpu_hours_allocated": round(cpu_alloc / 3600, 2),
+            "cpu_hours_used": round(cpu_used / 3600, 2),
+            "cpu_eff": _ratio(cpu_used, cpu_alloc),
+            "mem_gb_hours_requested": round(mem_req / 1024 / 3600, 2),
+            "mem_gb_hours_used": round(mem_used / 1024 / 3600, 2),
+            "mem_eff": _ratio(mem_used, mem_req),
+        })
+        out.append(entry)
+    return out
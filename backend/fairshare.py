@@ -0,0 +1,142 @@
+"""Fairshare and accounting usage per user and account.
+
+`sshare` and `sreport` are accounting queries that go to slurmdbd and get
+slow on large associations trees, so they are never run per request. The
+background loop refreshes them every FAIRSHARE_INTERVAL seconds into the
+"fairshare" snapshot, which holds the account tree already flattened with
+each node's path, children and users, plus a per-user index of the
+associations that determine that user's fairshare factor.
+"""
+import hashlib
+import os
+import time
+
+import slurm_parse
+
+FAIRSHARE_INTERVAL = float(os.environ.get("SLURM_GUI_FAIRSHARE_INTERVAL", "300"))
+USAGE_DAYS = int(os.environ.get("SLURM_GUI_USAGE_DAYS", "30"))
+
+SSHARE_FIELDS = "Account,User,RawShares,NormShares,RawUsage,EffectvUsage,FairShare,LevelFS"
+NUMERIC_FIELDS = ("norm_shares", "raw_usage", "effective_usage", "fairshare", "level_fs")
+
+
+def _number(value):
+    """sshare number -> float; empty and "inf" (no usage yet) -> None."""
+    try:
+        number = float(value)
+    except ValueError:
+        return None
+    return None if number in (float("inf"), float("-inf")) else number
+
+
+def iter_sshare(lines):
+    """Parse `sshare -a -P -n -o SSHARE_FIELDS` lines into association dicts.
+
+    sshare indents account names by their depth in the tree; the depth is
+    kept so the tree can be rebuilt.
+    """
+    for line in lines:
+        parts = line.split("|")
+        if len(parts) != 8:
+            continue
+        account, user, raw_shares = parts[:3]
+        row = {
+            "account": account.strip(),
+            "user": user.strip() or None,
+            "depth": len(account) - len(account.lstrip(" ")),
+            "raw_shares": raw_shares.strip(),  # a number or "parent"
+        }
+        row.update(zip(NUMERIC_FIELDS, map(_number, parts[3:])))
+        yield row
+
+
+def iter_sreport_usage(lines):
+    """Parse `sreport ... AccountUtilizationByUser format=Account,Login,Used` lines
+    into (account, user_or_None, hours)."""
+    for line in lines:
+        parts = line.split("|")
+        if len(parts) != 3:
+            continue
+        account, login, used = (p.strip() for p in parts)
+        try:
+            yield account, login or None, float(used)
+        except ValueError:
+            continue
+
+
+def build(rows, usage=None):
+    """Flatten sshare rows into (accounts, users).
+
+    accounts: list in tree order of {account, parent, path, depth, children,
+    users, <shares/usage fields>, usage_hours}; users: {user: [association
+    with the path of its account]}.
+    """
+    usage = usage or {}
+    accounts = []
+    by_name = {}
+    users = {}
+    stack = []  # open accounts, shallowest first
+    for row in rows:
+        while stack and stack[-1]["depth"] >= row["depth"]:
+            stack.pop()
+        if row["user"] is None:
+            parent = stack[-1] if stack else None
+            node = dict(row, parent=parent["account"] if parent else None,
+                        path=(parent["path"] if parent else []) + [row["account"]],
+                        children=[], users=[],
+                        usage_hours=usage.get((row["account"], None)))
+            del node["user"]
+            if parent:
+                parent["children"].append(node["account"])
+            accounts.append(node)
+            by_name[node["account"]] = node
+            stack.append(node)
+        else:
+            owner = by_name.get(row["account"])
+            if owner is not None:
+                owner["users"].append(row["user"])
+            entry = dict(row, path=(owner["path"] if owner else [row["account"]]),
+                         usage_hours=usage.get((row["account"], row["user"])))
+            del entry["depth"]
+            users.setdefault(row["user"], []).append(entry)
+    return accounts, users
+
+
+def collect(now=None):
+    """Run sshare (and sreport for the last USAGE_DAYS) into snapshot data.
+
+    Returns (data, digest). sreport is optional: without it usage_hours is
+    None.
+    """
+    now = time.time() if now is None else now
+    digest = hashlib.sha1()
+    lines = []
+    for line in slurm_parse.iter_command_lines(
+            ["sshare", "-a", "-P", "-n", "-o", SSHARE_FIELDS], timeout=120):
+        digest.update(line.encode() + b"\n")
+        lines.append(line)
+
+    start = time.strftime("%Y-%m-%d", time.localtime(now - USAGE_DAYS * 86400))
+    end = time.strftime("%Y-%m-%d", time.localtime(now))
+    usage = {}
+    try:
+        cmd = ["sreport", "-n", "-P", "cluster", "AccountUtilizationByUser",
+               f"start={start}", f"end={end}", "-t", "Hours", "format=Account,Login,Used"]
+        for account, user, hours in iter_sreport_usage(slurm_parse.iter_command_lines(cmd, timeout=120)):
+            usage[(account, user)] = usage.get((account, user), 0.0) + hours
+            digest.update(f"{account}|{user}|{hours}\n".encode())
+    except slurm_parse.SlurmCommandError as e:
+        print(f"sreport unavailable: {e}")
+
+    accounts, users = build(iter_sshare(lines), usage)
+    return {
+        "updated_at": now,
+        "period": {"start": start, "end": end, "days": USAGE_DAYS},
+        "accounts": accounts,
+        "users": users,
+    }, digest.hexdigest()
+
+
+def subtree(accounts, account):
+    """Accounts at or below `account`, in tree order."""
+    return [a for a in accounts if account in a["path"]]
@@ -0,0 +1,149 @@
+"""Which partitions and nodes can run a request right now.
+
+The resources snapshot is turned once per version into a per-partition
+index of schedulable nodes sorted by free CPUs, so a query finds the nodes
+with enough CPUs by bisection and only checks memory/GPUs on those. Node
+sets are chosen best-fit (the smallest nodes that suffice), leaving large
+nodes for large requests, the way a packing scheduler would.
+
+Free memory is sinfo's free memory and GPUs are only counted as free on
+idle nodes (sinfo's node view does not report GRES in use), so results are
+a close estimate of what Slurm would grant, not a reservation.
+"""
+import bisect
+import math
+import re
+
+import sbatch_validate
+
+# Nodes in these states cannot take new work
+UNAVAILABLE_STATES = ("down", "drain", "drng", "fail", "maint", "resv", "reserved",
+                      "alloc", "comp", "boot", "unk", "powered_down", "power_down")
+GRES_COUNT_RE = re.compile(r"(\d+)")
+
+
+def gpu_count(gres):
+    """GPUs in a GRES string ("gpu:a100:4(S:0-1),shard:8" -> 4)."""
+    total = 0
+    for item in gres.split(","):
+        parts = item.split("(")[0].split(":")
+        if parts[0] == "gpu" and len(parts) > 1:
+            m = GRES_COUNT_RE.match(parts[-1])
+            total += int(m.group(1)) if m else 0
+    return total
+
+
+def build_index(cluster):
+    """{partition: (free_cpus_sorted, [(free_cpus, free_mem_mb, free_gpus, name)])}."""
+    gpu_nodes = cluster.get("gpu_nodes", {})
+    by_partition = {}
+    for node in cluster.get("nodes", []):
+        state = node["state"].rstrip("*~#!%$@^-+")
+        if state.startswith(UNAVAILABLE_STATES) or node["cpus_idle"] <= 0:
+            continue
+        gpus = gpu_count(gpu_nodes.get(node["name"], "")) if state == "idle" else 0
+        entry = (node["cpus_idle"], node["memory_free_mb"], gpus, node["name"])
+        by_partition.setdefault(node["partition"].rstrip("*"), []).append(entry)
+    index = {}
+    for partition, entries in by_partition.items():
+        entries.sort()
+        index[partition] = ([e[0] for e in entries], entries)
+    return index
+
+
+def gpus_per_node(directives, nodes):
+    """GPUs per node requested via --gres=gpu:N, --gpus-per-node or --gpus."""
+    if "--gres" in directives:
+        return gpu_count(str(directives["--gres"]))
+    if "--gpus-per-node" in directives:
+        return gpu_count("gpu:" + str(directives["--gpus-per-node"]))
+    if "--gpus" in directives:
+        return math.ceil(gpu_count("gpu:" + str(directives["--gpus"])) / max(nodes, 1))
+    return 0
+
+
+def _fit_partition(free_cpus, entries, nodes, cpus, mem_mb, gpus):
+    """Best-fit `nodes` nodes with at least (cpus, mem_mb, gpus) free each."""
+    start = bisect.bisect_left(free_cpus, cpus)
+    chosen = []
+    eligible = 0
+    for entry in entries[start:]:
+        if entry[1] >= mem_mb and entry[2] >= gpus:
+            eligible += 1
+            if len(chosen) < nodes:
+                chosen.append(entry)
+    return chosen, eligible
+
+
+def _pack_partition(entries, cpus, mem_per_cpu, gpus):
+    """Fewest nodes covering `cpus` CPUs when the node count is free (largest first)."""
+    chosen = []
+    remaining = cpus
+    for entry in reversed(entries):
+        if entry[2] < gpus:
+            continue
+        usable = entry[0] if not mem_per_cpu else min(entry[0], entry[1] // mem_per_cpu)
+        if usable <= 0:
+            continue
+        chosen.append((min(usable, remaining),) + entry[1:])
+        remaining -= usable
+        if remaining <= 0:
+            return chosen
+    return None
+
+
+def _largest_shape(entries, nodes, mem_mb, gpus):
+    """Most CPUs per node available now on `nodes` nodes meeting mem/GPUs (or None)."""
+    cpus = sorted((e[0] for e in entries if e[1] >= mem_mb and e[2] >= gpus), reverse=True)
+    return cpus[nodes - 1] if len(cpus) >= nodes else None
+
+
+def fit(index, directives, partition=None):
+    """Evaluate a request (sbatch-style directives) against every partition.
+
+    Returns one result per candidate partition, fitting ones first:
+    {partition, fits_now, node_set, eligible_nodes, suggestion}. Without an
+    explicit --nodes the CPUs are packed onto as few nodes as possible.
+    """
+    def number(option, default):
+        m = sbatch_validate.NODES_RE.match(str(directives.get(option, default)))
+        return int(m.group(1)) if m else default
+
+    fixed_nodes = "--nodes" in directives
+    nodes = number("--nodes", 1)
+    cpus_per_task = number("--cpus-per-task", 1)
+    ntasks = number("--ntasks", nodes)
+    mem_per_cpu = 0
+    if "--mem-per-cpu" in directives:
+        mem_per_cpu = sbatch_validate.parse_mem_mb(directives["--mem-per-cpu"]) or 0
+    gpus = gpus_per_node(directives, nodes)
+
+    partitions = [partition] if partition else sorted(index)
+    results = []
+    for name in partitions:
+        free_cpus, entries = index.get(name, ([], []))
+        result = {"partition": name, "fits_now": False, "node_set": [], "eligible_nodes": 0}
+        if fixed_nodes or "--mem" in directives:
+            cpus = math.ceil(ntasks / nodes) * cpus_per_task
+            mem_mb = sbatch_validate.parse_mem_mb(directives.get("--mem", "0")) or mem_per_cpu * cpus
+            chosen, eligible = _fit_partition(free_cpus, entries, nodes, cpus, mem_mb, gpus)
+            result["eligible_nodes"] = eligible
+            if len(chosen) == nodes:
+                result.update(fits_now=True, node_set=[e[3] for e in chosen])
+            else:
+                # what would start now: the same shape on fewer nodes, or fewer CPUs per node
+                largest = _largest_shape(entries, nodes, mem_mb, gpus)
+                result["suggestion"] = {
+                    "max_nodes": eligible,
+                    "max_cpus_per_node": largest,
+                }
+        else:
+            chosen = _pack_partition(entries, ntasks * cpus_per_task, mem_per_cpu, gpus)
+            result["eligible_nodes"] = len(entries)
+            if chosen:
+                result.update(fits_now=True, node_set=[e[3] for e in chosen])
+            else:
+                result["suggestion"] = {"max_cpus": sum(e[0] for e in entries if e[2] >= gpus)}
+        results.append(result)
+    results.sort(key=lambda r: (not r["fits_now"], len(r["node_set"]) or math.inf, r["partition"]))
+    return results
@@ -0,0 +1,164 @@
+"""Persistent job history (SQLite).
+
+Stores what the live endpoints cannot see: finished jobs' actual queue
+waits and periodic samples of the pending-queue depth per partition. The
+database lives at SLURM_GUI_HISTORY_DB (default backend/history.db) and is
+opened once and shared, with writes serialized by a lock. Modules keeping
+their own tables register them with ensure_schema(); their periodic
+collectors run from one background loop (run_loop).
+"""
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+DB_PATH = os.environ.get(
+    "SLURM_GUI_HISTORY_DB",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "history.db"))
+RETENTION_DAYS = float(os.environ.get("SLURM_GUI_HISTORY_RETENTION_DAYS", "90"))
+
+SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS meta (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    )""",
+    """CREATE TABLE IF NOT EXISTS job_waits (
+        job_id TEXT PRIMARY KEY,
+        partition TEXT,
+        cpus INTEGER,
+        mem_mb INTEGER,
+        nodes INTEGER,
+        time_limit_min INTEGER,
+        submit_ts REAL,
+        start_ts REAL,
+        wait_s REAL,
+        queue_depth INTEGER
+    )""",
+    "CREATE INDEX IF NOT EXISTS job_waits_start ON job_waits (start_ts)",
+    """CREATE TABLE IF NOT EXISTS queue_depth (
+        partition TEXT,
+        ts REAL,
+        pending INTEGER,
+        PRIMARY KEY (partition, ts)
+    )""",
+)
+
+_conn = None
+_lock = threading.RLock()
+
+
+def _connect():
+    global _conn
+    if _conn is None:
+        os.makedirs(os.path.dirname(DB_PATH) or ".", exist_ok=True)
+        conn = sqlite3.connect(DB_PATH, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        for statement in SCHEMA:
+            conn.execute(statement)
+        conn.commit()
+        _conn = conn
+    return _conn
+
+
+@contextmanager
+def connect():
+    """Yield the shared connection inside a transaction (committed on success)."""
+    with _lock:
+        conn = _connect()
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+
+
+def ensure_schema(statements):
+    with connect() as conn:
+        for statement in statements:
+            conn.execute(statement)
+
+
+def get_meta(key, default=None):
+    with connect() as conn:
+        row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else default
+
+
+def set_meta(key, value):
+    with connect() as conn:
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+
+def record_queue_depth(depths, ts=None):
+    """Store one {partition: pending_tasks} sample."""
+    ts = time.time() if ts is None else ts
+    with connect() as conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO queue_depth (partition, ts, pending) VALUES (?, ?, ?)",
+            [(partition, ts, pending) for partition, pending in depths.items()])
+
+
+def queue_depth_at(partition, ts, max_age=3600):
+    """Pending tasks in `partition` as of the last sample before `ts` (None if unknown)."""
+    with connect() as conn:
+        row = conn.execute(
+            "SELECT pending FROM queue_depth WHERE partition = ? AND ts <= ? AND ts >= ? "
+            "ORDER BY ts DESC LIMIT 1",
+            (partition, ts, ts - max_age)).fetchone()
+    return row[0] if row else None
+
+
+WAIT_COLUMNS = ("job_id", "partition", "cpus", "mem_mb", "nodes", "time_limit_min",
+                "submit_ts", "start_ts", "wait_s", "queue_depth")
+
+
+def insert_waits(rows):
+    """Insert job wait rows (dicts with WAIT_COLUMNS); returns the ones that were new."""
+    sql = "INSERT OR IGNORE INTO job_waits (%s) VALUES (%s)" % (
+        ", ".join(WAIT_COLUMNS), ", ".join("?" * len(WAIT_COLUMNS)))
+    new = []
+    with connect() as conn:
+        for row in rows:
+            cur = conn.execute(sql, [row[c] for c in WAIT_COLUMNS])
+            if cur.rowcount:
+                new.append(row)
+    return new
+
+
+def iter_waits(since=0):
+    """Yield stored wait rows in start order (used to rebuild models)."""
+    with connect() as conn:
+        rows = conn.execute(
+            "SELECT %s FROM job_waits WHERE start_ts >= ? ORDER BY start_ts" % ", ".join(WAIT_COLUMNS),
+            (since,)).fetchall()
+    for row in rows:
+        yield dict(zip(WAIT_COLUMNS, row))
+
+
+def prune(now=None):
+    """Drop rows older than RETENTION_DAYS."""
+    cutoff = (time.time() if now is None else now) - RETENTION_DAYS * 86400
+    with connect() as conn:
+        conn.execute("DELETE FROM queue_depth WHERE ts < ?", (cutoff,))
+        conn.execute("DELETE FROM job_waits WHERE start_ts < ?", (cutoff,))
+
+
+def run_loop(socketio, tasks):
+    """Background task: run each (interval, name, fn) whenever `interval` seconds have passed."""
+    last_run = {}
+    tick = min(interval for interval, _, _ in tasks)
+    while True:
+        for interval, name, fn in tasks:
+            if time.time() - last_run.get(name, 0) < interval:
+                continue
+            last_run[name] = time.time()
+            try:
+                result = fn()
+                if result:
+                    print(f"history {name}: {result}")
+            except Exception as e:
+                print(f"history {name} error: {e}")
+        socketio.sleep(tick)
@@ -0,0 +1,143 @@
+"""Live interactive allocations and the terminals attached to them.
+
+A terminal opened through /api/submit/salloc owns a Slurm allocation, run
+under the job name "gui-shell-<user>". Further terminals for the same user
+can run as `srun --jobid <id> --overlap --pty` steps inside that allocation
+instead of queueing for a new one, so they open instantly and use no extra
+resources. The index is fed from salloc's "Granted job allocation" line on
+the terminal and reconciled against the queue snapshot, which also picks up
+allocations made before a backend restart. Only jobs owned by the Slurm
+account the backend runs salloc as are considered, so another user's job,
+or a batch job that happens to carry the name, is never offered.
+
+Closing the salloc terminal releases the allocation and ends every step
+attached to it.
+"""
+import getpass
+import os
+import re
+import threading
+import time
+
+JOB_NAME_PREFIX = "gui-shell-"
+GRANTED_RE = re.compile(r"Granted job allocation (\d+)")
+JOB_ID_RE = re.compile(r"^\d+$")
+USER_RE = re.compile(r"^[\w.-]{1,64}$")
+GRACE_PERIOD = 60  # seconds a new allocation may be missing from the queue snapshot
+OVERLAP_SINCE = (20, 11)  # srun --overlap; earlier releases share CPUs between steps by default
+
+# job_id -> {"job_id", "user", "owner", "sessions", "granted_at", "node_list", "time_limit"}
+_allocations = {}
+_lock = threading.Lock()
+
+
+def _backend_account():
+    try:
+        return getpass.getuser()
+    except Exception:
+        return os.environ.get("USER")
+
+
+# the account salloc runs as, i.e. the owner of every gui-shell allocation
+ACCOUNT = _backend_account()
+
+
+def valid_user(user):
+    return isinstance(user, str) and bool(USER_RE.match(user))
+
+
+def job_name(user):
+    """Job name marking `user`'s allocations; raises ValueError for names that
+    could not be told apart from another user's."""
+    if not valid_user(user):
+        raise ValueError(f"Invalid username: {user!r}")
+    return JOB_NAME_PREFIX + user
+
+
+def granted_job(text):
+    """Job id from salloc's "Granted job allocation N" line, if `text` has it."""
+    m = GRANTED_RE.search(text)
+    return m.group(1) if m else None
+
+
+def register(job_id, user, session_id, owner=False):
+    """Record that terminal `session_id` runs in allocation `job_id`.
+
+    `owner` marks the salloc terminal that holds the allocation.
+    """
+    with _lock:
+        alloc = _allocations.setdefault(job_id, {
+            "job_id": job_id, "user": user, "owner": None, "sessions": set(),
+            "granted_at": time.time(), "node_list": None, "time_limit": None,
+        })
+        alloc["sessions"].add(session_id)
+        if owner:
+            alloc["owner"] = session_id
+
+
+def session_closed(session_id):
+    """Forget a terminal; closing the owner releases its whole allocation."""
+    with _lock:
+        for job_id, alloc in list(_allocations.items()):
+            if session_id in alloc["sessions"]:
+                alloc["sessions"].discard(session_id)
+                if alloc["owner"] == session_id:
+                    del _allocations[job_id]
+
+
+def reconcile(jobs, now=None, account=None):
+    """Sync the index with the queue: add running gui-shell jobs, drop ended ones.
+
+    Only jobs owned by `account` (default ACCOUNT) count.
+    """
+    now = time.time() if now is None else now
+    account = ACCOUNT if account is None else account
+    running = {}
+    for job in jobs:
+        if (job.get("state") == "R" and job.get("user") == account
+                and job.get("name", "").startswith(JOB_NAME_PREFIX)
+                and valid_user(job["name"][len(JOB_NAME_PREFIX):])):
+            running[job["job_id"]] = job
+    with _lock:
+        for job_id, alloc in list(_allocations.items()):
+            if job_id not in running and now - alloc["granted_at"] > GRACE_PERIOD:
+                del _allocations[job_id]
+        for job_id, job in running.items():
+            alloc = _allocations.setdefault(job_id, {
+                "job_id": job_id, "user": job["name"][len(JOB_NAME_PREFIX):], "owner": None,
+                "sessions": set(), "granted_at": now, "node_list": None, "time_limit": None,
+            })
+            alloc["node_list"] = job.get("reason")  # %R is the node list for running jobs
+            alloc["time_limit"] = job.get("time_limit")
+
+
+def for_user(user, jobs=None):
+    """The user's live allocations, reconciled against `jobs` when given."""
+    if jobs is not None:
+        reconcile(jobs)
+    with _lock:
+        return [
+            {"job_id": a["job_id"], "node_list": a["node_list"], "time_limit": a["time_limit"],
+             "terminals": len(a["sessions"])}
+            for a in sorted(_allocations.values(), key=lambda a: a["granted_at"])
+            if a["user"] == user
+        ]
+
+
+def find(user, job_id, jobs=None):
+    return next((a for a in for_user(user, jobs) if a["job_id"] == job_id), None)
+
+
+def _slurm_version(version):
+    """"slurm 23.02.6" -> (23, 2); None when unknown."""
+    m = re.search(r"(\d+)\.(\d+)", version or "")
+    return (int(m.group(1)), int(m.group(2))) if m else None
+
+
+def attach_command(job_id, version=None, shell="/bin/bash"):
+    """srun command that opens a shell as a new step in allocation `job_id`."""
+    cmd = ["srun", "--jobid", str(job_id)]
+    parsed = _slurm_version(version)
+    if parsed is None or parsed >= OVERLAP_SINCE:
+        cmd.append("--overlap")
+    return cmd + ["--pty", shell]
@@ -0,0 +1,147 @@
+"""Job-array aware views of the queue.
+
+squeue reports array jobs as a mix of single tasks ("123_7") and collapsed
+pending ranges ("123_[8-9999%50]"). The collapsed view folds every row of an
+array into one parent entry carrying compact per-state task ranges, so a
+10,000-task array costs one JSON object instead of thousands. The expanded
+view goes the other way and lists every task individually.
+"""
+import re
+
+ARRAY_ID_RE = re.compile(r"^(?P<parent>\d+)_(?:(?P<task>\d+)|\[(?P<spec>[^\]]*)\])$")
+
+
+def parse_job_id(job_id):
+    """Split an squeue job id into (parent, [(lo, hi), ...], throttle).
+
+    Plain jobs return (None, [], None); "123_4" returns ("123", [(4, 4)], None);
+    "123_[1-5,9%2]" returns ("123", [(1, 5), (9, 9)], 2).
+    """
+    m = ARRAY_ID_RE.match(job_id)
+    if not m:
+        return None, [], None
+    parent = m.group("parent")
+    if m.group("task") is not None:
+        task = int(m.group("task"))
+        return parent, [(task, task)], None
+    spec, _, throttle = m.group("spec").partition("%")
+    ranges = []
+    for part in spec.split(","):
+        lo, _, hi = part.partition("-")
+        lo, _, step = lo.partition(":")
+        hi, _, step = hi.partition(":") if hi else (lo, "", step)
+        try:
+            lo, hi, step = int(lo), int(hi), int(step or 1)
+        except ValueError:
+            continue
+        if step == 1:
+            ranges.append((lo, hi))
+        else:
+            ranges.extend((t, t) for t in range(lo, hi + 1, step))
+    return parent, ranges, int(throttle) if throttle.isdigit() else None
+
+
+def merge_ranges(ranges):
+    """Merge overlapping/adjacent (lo, hi) ranges."""
+    merged = []
+    for lo, hi in sorted(ranges):
+        if merged and lo <= merged[-1][1] + 1:
+            if hi > merged[-1][1]:
+                merged[-1][1] = hi
+        else:
+            merged.append([lo, hi])
+    return [(lo, hi) for lo, hi in merged]
+
+
+def intersect_ranges(a, b):
+    """Tasks in both merged range lists."""
+    out = []
+    i = j = 0
+    while i < len(a) and j < len(b):
+        lo, hi = max(a[i][0], b[j][0]), min(a[i][1], b[j][1])
+        if lo <= hi:
+            out.append((lo, hi))
+        if a[i][1] < b[j][1]:
+            i += 1
+        else:
+            j += 1
+    return out
+
+
+def subtract_ranges(a, b):
+    """Tasks of merged range list `a` that are not in `b`."""
+    out = []
+    j = 0
+    for lo, hi in a:
+        while j < len(b) and b[j][1] < lo:
+            j += 1
+        k = j
+        while lo <= hi and k < len(b) and b[k][0] <= hi:
+            if b[k][0] > lo:
+                out.append((lo, b[k][0] - 1))
+            lo = max(lo, b[k][1] + 1)
+            k += 1
+        if lo <= hi:
+            out.append((lo, hi))
+    return out
+
+
+def format_ranges(ranges):
+    """[(1, 5), (7, 7)] -> "1-5,7"."""
+    return ",".join(str(lo) if lo == hi else f"{lo}-{hi}" for lo, hi in ranges)
+
+
+def count_ranges(ranges):
+    return sum(hi - lo + 1 for lo, hi in ranges)
+
+
+def collapse(jobs):
+    """Fold array tasks into one entry per parent, keeping queue order.
+
+    Each parent entry has `array: true`, `tasks` ({state: "1-5,7"}),
+    `task_counts` ({state: n}) and `total_tasks`. Its `state` is the state
+    of the most tasks, ties going to whichever appeared first.
+    """
+    out = []
+    parents = {}
+    for job in jobs:
+        parent, ranges, throttle = parse_job_id(job["job_id"])
+        if parent is None:
+            out.append(job)
+            continue
+        entry = parents.get(parent)
+        if entry is None:
+            entry = dict(job, job_id=parent, array=True, _ranges={})
+            parents[parent] = entry
+            out.append(entry)
+        if ranges:  # "123_[]" names no tasks
+            entry["_ranges"].setdefault(job["state"], []).extend(ranges)
+        if throttle is not None:
+            entry["throttle"] = throttle
+
+    for entry in parents.values():
+        ranges = {state: merge_ranges(r) for state, r in entry.pop("_ranges").items()}
+        counts = {state: count_ranges(r) for state, r in ranges.items()}
+        entry["tasks"] = {state: format_ranges(r) for state, r in ranges.items()}
+        entry["task_counts"] = counts
+        entry["total_tasks"] = sum(counts.values())
+        if counts:
+            entry["state"] = max(counts, key=lambda s: counts[s])
+    return out
+
+
+def expand(jobs):
+    """List every array task individually ("123_[1-3]" -> 123_1, 123_2, 123_3)."""
+    out = []
+    for job in jobs:
+        parent, ranges, _ = parse_job_id(job["job_id"])
+        if parent is None or (len(ranges) == 1 and ranges[0][0] == ranges[0][1]
+                              and job["job_id"] == f"{parent}_{ranges[0][0]}"):
+            out.append(job)
+            continue
+        for lo, hi in ranges:
+            for task in range(lo, hi + 1):
+                task_job = dict(job)
+                task_job["job_id"] = f"{parent}_{task}"
+                out.append(task_job)
+    return out
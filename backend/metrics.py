@@ -0,0 +1,48 @@
+"""In-process counters exposed at /api/metrics.
+
+Counters are keyed by name plus a small set of labels (e.g. the rate-limit
+rule that rejected a request). They live in this process only and reset on
+restart; the endpoint serves JSON, or the Prometheus text format for
+scrapers.
+"""
+import threading
+import time
+
+_counters = {}  # (name, ((label, value), ...)) -> number
+_lock = threading.Lock()
+STARTED_AT = time.time()
+
+
+def incr(name, value=1, **labels):
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def get(name, **labels):
+    return _counters.get((name, tuple(sorted(labels.items()))), 0)
+
+
+def snapshot():
+    """{name: [{"labels": {...}, "value": n}, ...]} sorted by name."""
+    with _lock:
+        items = sorted(_counters.items())
+    out = {}
+    for (name, labels), value in items:
+        out.setdefault(name, []).append({"labels": dict(labels), "value": value})
+    return out
+
+
+def prometheus():
+    """Counters in the Prometheus text exposition format."""
+    lines = []
+    for name, series in snapshot().items():
+        metric = "slurm_gui_" + name
+        lines.append(f"# TYPE {metric} counter")
+        for s in series:
+            labels = ",".join('%s="%s"' % (k, str(v).replace("\\", "\\\\").replace('"', '\\"'))
+                              for k, v in sorted(s["labels"].items()))
+            lines.append(f"{metric}{{{labels}}} {s['value']}" if labels else f"{metric} {s['value']}")
+    lines.append("# TYPE slurm_gui_uptime_seconds gauge")
+    lines.append(f"slurm_gui_uptime_seconds {time.time() - STARTED_AT:.0f}")
+    return "\n".join(lines) + "\n"
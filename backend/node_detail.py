@@ -0,0 +1,173 @@
+"""Per-node telemetry from `scontrol show node`.
+
+sinfo only reports allocated/idle CPUs and OS free memory. The node detail
+view needs CPU load, allocated vs real memory and GRES in use, which only
+`scontrol show node` has. All requested nodes are fetched with one call
+(`scontrol show node a,b,c -o`, at most BATCH_SIZE names per call) and each
+node is cached for DETAIL_TTL seconds, so overlapping requests and
+subscribers share the same data. Subscribed clients get pushed the nodes
+that changed from a single background loop.
+"""
+import os
+import re
+import threading
+import time
+
+import scheduler
+import slurm_parse
+
+DETAIL_TTL = float(os.environ.get("SLURM_GUI_NODE_DETAIL_TTL", "10"))
+STREAM_INTERVAL = float(os.environ.get("SLURM_GUI_NODE_DETAIL_INTERVAL", "5"))
+BATCH_SIZE = 500   # node names per scontrol call
+MAX_NODES = 1000   # per request / subscription
+
+NODE_NAME_RE = re.compile(r"^[A-Za-z0-9._-]+$")
+# "Key=value" pairs; values may contain spaces (Reason=..., OS=...)
+FIELD_RE = re.compile(r"(\w+)=(.*?)(?=\s+[\w/]+=|$)")
+
+_cache = {}  # name -> (fetched_at, detail)
+_cache_lock = threading.Lock()
+
+# sid -> set(node names)
+_subs = {}
+_subs_lock = threading.Lock()
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None  # "N/A" while the node is down
+
+
+def _gpus(tres):
+    return _int(tres.get("gres/gpu")) or 0
+
+
+def parse_node(line):
+    """One `scontrol show node -o` line -> detail dict."""
+    fields = dict(FIELD_RE.findall(line))
+    cfg, alloc = slurm_parse.parse_tres(fields.get("CfgTRES")), slurm_parse.parse_tres(fields.get("AllocTRES"))
+    real_mem = _int(fields.get("RealMemory"))
+    alloc_mem = _int(fields.get("AllocMem")) or 0
+    cpus_total = _int(fields.get("CPUTot"))
+    cpu_load = _float(fields.get("CPULoad"))
+    return {
+        "name": fields.get("NodeName"),
+        "state": fields.get("State"),
+        "partitions": [p for p in fields.get("Partitions", "").split(",") if p],
+        "cpus_total": cpus_total,
+        "cpus_allocated": _int(fields.get("CPUAlloc")),
+        "cpu_load": cpu_load,
+        "load_per_cpu": round(cpu_load / cpus_total, 3) if cpu_load is not None and cpus_total else None,
+        "memory_real_mb": real_mem,
+        "memory_allocated_mb": alloc_mem,
+        "memory_free_mb": _int(fields.get("FreeMem")),
+        "gres": fields.get("Gres"),
+        "gres_used": fields.get("GresUsed"),
+        "gpus_total": _gpus(cfg),
+        "gpus_allocated": _gpus(alloc),
+        "features": fields.get("AvailableFeatures"),
+        "reason": fields.get("Reason"),
+        "boot_time": fields.get("BootTime"),
+    }
+
+
+def fetch(names):
+    """Query scontrol for `names` in BATCH_SIZE chunks; returns {name: detail}."""
+    out = {}
+    for start in range(0, len(names), BATCH_SIZE):
+        batch = names[start:start + BATCH_SIZE]
+        cmd = ["scontrol", "show", "node", ",".join(batch), "-o"]
+        found = 0
+        try:
+            for line in slurm_parse.iter_command_lines(cmd):
+                if line.startswith("NodeName="):
+                    detail = parse_node(line)
+                    out[detail["name"]] = detail
+                    found += 1
+        except slurm_parse.SlurmCommandError as e:
+            # scontrol exits non-zero if any name is unknown but still
+            # prints the nodes it found
+            if not found and "not found" not in str(e).lower():
+                raise
+    return out
+
+
+def get(names, ttl=None):
+    """Details for `names`, refreshing only the entries older than `ttl`.
+
+    Unknown nodes are absent from the result (and remembered as unknown
+    for the same `ttl`).
+    """
+    ttl = DETAIL_TTL if ttl is None else ttl
+    now = time.time()
+    with scheduler.locked(_cache_lock):
+        stale = [n for n in names if n not in _cache or now - _cache[n][0] > ttl]
+        if stale:
+            fetched = fetch(stale)
+            for name in stale:
+                _cache[name] = (now, fetched.get(name))
+        for name in [n for n, (at, _) in _cache.items() if now - at > ttl * 30]:
+            del _cache[name]
+        return {n: _cache[n][1] for n in names if _cache.get(n, (0, None))[1] is not None}
+
+
+def valid_names(names):
+    return all(NODE_NAME_RE.match(n) for n in names)
+
+
+# -- subscriptions -----------------------------------------------------------
+
+def subscribe(sid, names):
+    with _subs_lock:
+        subs = _subs.get(sid, set()) | set(names)
+        if len(subs) > MAX_NODES:
+            raise ValueError(f"at most {MAX_NODES} nodes per client")
+        _subs[sid] = subs
+        return sorted(subs)
+
+
+def unsubscribe(sid, names=()):
+    """Remove `names` (all of them if empty) from `sid`'s subscription."""
+    with _subs_lock:
+        if not names:
+            _subs.pop(sid, None)
+            return []
+        subs = _subs.get(sid, set())
+        subs.difference_update(names)
+        if not subs:
+            _subs.pop(sid, None)
+        return sorted(subs)
+
+
+def run_loop(socketio):
+    """Background task: refresh every subscribed node in one batched call and
+    push each client the nodes that changed since it was last sent them."""
+    sent = {}  # sid -> {name: detail}
+    while True:
+        with _subs_lock:
+            subs = {sid: set(names) for sid, names in _subs.items()}
+        for sid in list(sent):
+            if sid not in subs:
+                del sent[sid]
+        if subs:
+            try:
+                details = get(sorted(set().union(*subs.values())), ttl=STREAM_INTERVAL)
+                for sid, names in subs.items():
+                    last = sent.setdefault(sid, {})
+                    changed = [details[n] for n in names if n in details and last.get(n) != details[n]]
+                    if changed:
+                        for detail in changed:
+                            last[detail["name"]] = detail
+                        socketio.emit("node_detail", {"nodes": changed}, to=sid)
+            except Exception as e:
+                print(f"node detail loop error: {e}")
+        socketio.sleep(STREAM_INTERVAL)
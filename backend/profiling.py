@@ -0,0 +1,213 @@
+"""Runtime profiling: stack sampling and per-request phase timings.
+
+Sampling: start() runs a sampler OS thread for a time window that records
+the stack of every thread (sys._current_frames) each `interval` seconds.
+Under eventlet all green threads share the main OS thread, so its stack is
+whichever green thread is running at that moment; with greenlets=True the
+stacks of suspended greenlets are sampled too (rooted at "greenlet"), which
+shows where idle work waits. Stacks are counted in the collapsed format
+("root;file:func;file:func count") that flamegraph.pl and speedscope read.
+
+Timings: with timing enabled, phase("subprocess") etc. adds the time spent
+inside the block, exclusive of nested phases, to the current request's
+breakdown and to the profile_phase_seconds_total counter. The server sends the
+breakdown as a Server-Timing header; work outside a request, such as
+terminal output emits, only feeds the counter.
+"""
+import collections
+import gc
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+import metrics
+
+try:
+    import greenlet
+except ImportError:  # plain threading mode
+    greenlet = None
+
+MAX_SECONDS = 300
+MIN_INTERVAL = 0.001
+GREENLET_SCAN_INTERVAL = 1.0  # gc scans for greenlets are expensive; reuse the list this long
+
+_timing = os.environ.get("SLURM_GUI_SERVER_TIMING", "0") == "1"
+_requests = {}  # greenlet or thread -> _Breakdown
+
+_lock = threading.Lock()
+_stacks = collections.Counter()
+_session = {"running": False, "started_at": None, "stopped_at": None, "seconds": 0,
+            "interval": 0, "greenlets": False, "samples": 0}
+_stop = threading.Event()
+_thread = None
+
+
+# -- phase timings -----------------------------------------------------------
+
+class _Breakdown:
+    """Exclusive time per phase for one request (or one phase outside a request)."""
+
+    def __init__(self, request=True):
+        self.request = request
+        self.started = time.perf_counter()
+        self.totals = collections.OrderedDict()
+        self.stack = []  # [name, mark, exclusive seconds so far]
+
+    def enter(self, name):
+        now = time.perf_counter()
+        if self.stack:
+            self._charge(now)
+        self.stack.append([name, now, 0.0])
+
+    def exit(self):
+        """Close the innermost phase; returns its exclusive time."""
+        now = time.perf_counter()
+        self._charge(now)
+        own = self.stack.pop()[2]
+        if self.stack:
+            self.stack[-1][1] = now
+        return own
+
+    def _charge(self, now):
+        entry = self.stack[-1]
+        elapsed = now - entry[1]
+        self.totals[entry[0]] = self.totals.get(entry[0], 0.0) + elapsed
+        entry[1] = now
+        entry[2] += elapsed
+
+
+def _current():
+    return greenlet.getcurrent() if greenlet is not None else threading.get_ident()
+
+
+def timing_enabled():
+    return _timing
+
+
+def set_timing(enabled):
+    global _timing
+    _timing = bool(enabled)
+    if not _timing:
+        _requests.clear()
+
+
+def begin_request():
+    if _timing:
+        _requests[_current()] = _Breakdown()
+
+
+def end_request():
+    """Pop the current request's breakdown; returns a Server-Timing value or None."""
+    breakdown = _requests.pop(_current(), None)
+    if breakdown is None or not breakdown.request:
+        return None
+    parts = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in breakdown.totals.items()]
+    parts.append(f"total;dur={(time.perf_counter() - breakdown.started) * 1000:.2f}")
+    return ", ".join(parts)
+
+
+@contextmanager
+def phase(name):
+    """Attribute the time spent in the block to phase `name` (no-op when timing is off)."""
+    if not _timing:
+        yield
+        return
+    key = _current()
+    breakdown = _requests.get(key)
+    if breakdown is None:
+        # outside a request (terminal reader, background loop): track nesting only
+        breakdown = _requests[key] = _Breakdown(request=False)
+    breakdown.enter(name)
+    try:
+        yield
+    finally:
+        metrics.incr("profile_phase_seconds_total", round(breakdown.exit(), 6), phase=name)
+        if not breakdown.request and not breakdown.stack:
+            _requests.pop(key, None)
+
+
+# -- stack sampling ----------------------------------------------------------
+
+def _label(frame):
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+def _collapse(root, frame):
+    labels = []
+    while frame is not None:
+        labels.append(_label(frame))
+        frame = frame.f_back
+    labels.append(root)
+    return ";".join(reversed(labels))
+
+
+def _greenlets():
+    return [obj for obj in gc.get_objects()
+            if isinstance(obj, greenlet.greenlet) and not obj.dead and obj.gr_frame is not None]
+
+
+def _sample_loop(deadline, interval, include_greenlets):
+    me = threading.get_ident()
+    suspended = []
+    scanned_at = 0.0
+    while not _stop.is_set() and time.monotonic() < deadline:
+        names = {t.ident: t.name for t in threading.enumerate()}
+        sample = [(_collapse(names.get(ident, str(ident)), frame))
+                  for ident, frame in sys._current_frames().items() if ident != me]
+        if include_greenlets:
+            if time.monotonic() - scanned_at > GREENLET_SCAN_INTERVAL:
+                suspended = _greenlets()
+                scanned_at = time.monotonic()
+            # gr_frame is None for a greenlet that is running or has finished
+            sample.extend(_collapse("greenlet", g.gr_frame) for g in suspended if g.gr_frame is not None)
+        with _lock:
+            _stacks.update(sample)
+            _session["samples"] += 1
+        _stop.wait(interval)
+    with _lock:
+        _session["running"] = False
+        _session["stopped_at"] = time.time()
+
+
+def start(seconds=30, interval=0.01, greenlets=False):
+    """Start sampling for `seconds`; replaces the previous profile. False if already running."""
+    global _thread
+    seconds = min(max(float(seconds), 0.1), MAX_SECONDS)
+    interval = max(float(interval), MIN_INTERVAL)
+    greenlets = bool(greenlets) and greenlet is not None
+    with _lock:
+        if _session["running"]:
+            return False
+        _stacks.clear()
+        _session.update(running=True, started_at=time.time(), stopped_at=None, seconds=seconds,
+                        interval=interval, greenlets=greenlets, samples=0)
+    _stop.clear()
+    # a real thread: it must keep sampling while a green thread blocks the hub
+    _thread = threading.Thread(target=_sample_loop, name="profiler",
+                               args=(time.monotonic() + seconds, interval, greenlets), daemon=True)
+    _thread.start()
+    return True
+
+
+def stop():
+    _stop.set()
+    if _thread is not None:
+        _thread.join(timeout=5)
+
+
+def status():
+    with _lock:
+        out = dict(_session, stacks=len(_stacks), timing=_timing)
+    if out["running"]:
+        out["remaining_s"] = round(max(0.0, out["started_at"] + out["seconds"] - time.time()), 1)
+    return out
+
+
+def collapsed():
+    """The current/last profile as collapsed stack lines, most frequent first."""
+    with _lock:
+        items = _stacks.most_common()
+    return "".join(f"{stack} {count}\n" for stack, count in items)
@@ -0,0 +1,165 @@
+"""Token-bucket rate limits and coalescing of identical concurrent requests.
+
+Every endpoint belongs to a rule ("read", "submit", ...) with a limit of
+`count` requests per `period` seconds. Each client gets one bucket per
+endpoint, sized by the endpoint's rule, so a dashboard polling the queue
+does not use up the budget for resource-fit checks. Clients are identified
+only by what the server can trust, their IP address: a username in the
+request is unauthenticated, and keying on it would let anyone drain
+another user's buckets. Buckets refill continuously, so bursts up to
+`count` are allowed and the sustained rate is count/period.
+
+Limits come from SLURM_GUI_RATE_LIMITS ("read=120/60,submit=10/60", merged
+over DEFAULT_LIMITS); "off" disables rate limiting.
+
+coalesce() lets concurrent callers with the same key share one execution
+of an expensive function instead of each forking its own Slurm command.
+"""
+import math
+import os
+import threading
+import time
+
+import scheduler
+
+DEFAULT_LIMITS = {
+    "read": (120, 60),     # polling endpoints
+    "control": (30, 60),   # cancel / hold / release / requeue
+    "submit": (10, 60),    # sbatch submissions and --test-only validations
+    "terminal": (10, 60),  # salloc / interactive sessions
+}
+IDLE_BUCKET_TTL = 600  # full buckets idle this long are forgotten
+
+
+def parse_limits(spec, defaults=DEFAULT_LIMITS):
+    """"read=120/60,submit=5/60" -> {rule: (count, period)} over `defaults`.
+
+    Returns None if rate limiting is turned off.
+    """
+    limits = dict(defaults)
+    spec = (spec or "").strip()
+    if spec.lower() in ("off", "0", "false", "none"):
+        return None
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        rule, _, value = item.partition("=")
+        count, _, period = value.partition("/")
+        try:
+            limits[rule.strip()] = (float(count), float(period or 1))
+        except ValueError:
+            print(f"Ignoring invalid rate limit '{item}'")
+    return limits
+
+
+LIMITS = parse_limits(os.environ.get("SLURM_GUI_RATE_LIMITS"))
+
+
+class TokenBucket:
+    """`capacity` tokens, refilled at `rate` tokens per second."""
+
+    def __init__(self, capacity, rate):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def available(self, now):
+        self._refill(now)
+        return self.tokens >= 1
+
+    def take(self):
+        self.tokens -= 1
+
+    def retry_after(self):
+        """Seconds until the next token."""
+        return max(0.0, (1 - self.tokens) / self.rate) if self.rate else float("inf")
+
+
+def retry_after_header(seconds):
+    """Retry-After value for a rejection: whole seconds, at least 1."""
+    return max(1, math.ceil(seconds))
+
+
+_buckets = {}  # (rule, endpoint, client) -> TokenBucket
+_buckets_lock = threading.Lock()
+_last_sweep = time.monotonic()
+
+
+def check(rule, clients, limits=None, endpoint=None):
+    """Take a token from every client key's bucket for `endpoint` under `rule`.
+
+    Returns (allowed, retry_after_seconds). Nothing is taken unless all
+    buckets have a token, so a rejected request costs the client nothing.
+    """
+    global _last_sweep
+    limits = LIMITS if limits is None else limits
+    if not limits or rule not in limits:
+        return True, 0
+    count, period = limits[rule]
+    now = time.monotonic()
+    with _buckets_lock:
+        buckets = []
+        for client in clients:
+            key = (rule, endpoint, client)
+            bucket = _buckets.get(key)
+            if bucket is None:
+                bucket = _buckets[key] = TokenBucket(count, count / period)
+            buckets.append(bucket)
+        empty = [b for b in buckets if not b.available(now)]
+        if empty:
+            return False, max(b.retry_after() for b in empty)
+        for bucket in buckets:
+            bucket.take()
+        if now - _last_sweep > IDLE_BUCKET_TTL:
+            _last_sweep = now
+            for key, bucket in list(_buckets.items()):
+                if now - bucket.updated > IDLE_BUCKET_TTL:
+                    bucket.available(now)  # refill
+                    if bucket.tokens >= bucket.capacity:
+                        del _buckets[key]
+    return True, 0
+
+
+class _Call:
+    def __init__(self):
+        self.done = scheduler.Event()
+        self.result = None
+        self.error = None
+
+
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+def coalesce(key, fn):
+    """Run `fn()` once for all concurrent callers passing the same `key`.
+
+    Returns (result, shared) where `shared` is True for callers that waited
+    on another caller's execution. Exceptions are re-raised in every caller.
+    """
+    with _inflight_lock:
+        call = _inflight.get(key)
+        leader = call is None
+        if leader:
+            call = _inflight[key] = _Call()
+    if not leader:
+        # the leader may be waiting on Slurm off the hub; don't block it
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.result, True
+    try:
+        call.result = fn()
+        return call.result, False
+    except Exception as e:
+        call.error = e
+        raise
+    finally:
+        with _inflight_lock:
+            del _inflight[key]
+        call.done.set()
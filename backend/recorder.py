@@ -0,0 +1,275 @@
+"""Terminal session recording and replay (asciicast v2, gzip, append-only).
+
+Enabled by setting SLURM_GUI_RECORD_DIR. Each terminal session is recorded
+to <dir>/<session_id>.cast.gz: an asciicast v2 header line followed by
+`[seconds, "o", text]` events (and "i" input events with
+SLURM_GUI_RECORD_INPUT=1), so `zcat` gives a file any asciicast player can
+play.
+
+The terminal reader only appends events to an in-memory queue; a background
+writer drains every queue each FLUSH_INTERVAL seconds and appends them to
+the file, sync-flushing the deflate stream so a crash loses at most one
+interval. Every KEYFRAME_INTERVAL seconds the writer ends the gzip member and
+starts a new one, recording its start time and byte offset in
+<session_id>.idx (one JSON line per member). gzip members concatenate into
+one valid stream, and the index lets replay() seek to any time by
+decompressing at most two members: the one containing the target time and
+the one before it, which supplies the screen context that is painted first.
+"""
+import bisect
+import collections
+import json
+import os
+import re
+import threading
+import time
+import zlib
+
+RECORD_DIR = os.environ.get("SLURM_GUI_RECORD_DIR")
+RECORD_INPUT = os.environ.get("SLURM_GUI_RECORD_INPUT", "0") == "1"
+FLUSH_INTERVAL = 1.0
+KEYFRAME_INTERVAL = float(os.environ.get("SLURM_GUI_RECORD_KEYFRAME_INTERVAL", "60"))
+RETENTION_DAYS = float(os.environ.get("SLURM_GUI_RECORD_RETENTION_DAYS", "30"))
+CONTEXT_BYTES = 8192  # output replayed before a seek target to repaint the screen
+READ_CHUNK = 64 * 1024
+
+SESSION_ID_RE = re.compile(r"^[0-9a-f]{8,64}$")
+CLEAR_SCREEN = "\x1b[2J\x1b[H"
+
+_active = {}  # session_id -> Recording
+_active_lock = threading.Lock()
+
+
+def enabled():
+    return bool(RECORD_DIR)
+
+
+def cast_path(session_id):
+    return os.path.join(RECORD_DIR, f"{session_id}.cast.gz")
+
+
+def index_path(session_id):
+    return os.path.join(RECORD_DIR, f"{session_id}.idx")
+
+
+class Recording:
+    """One session's pending events and open gzip member."""
+
+    def __init__(self, session_id, width=80, height=24, **meta):
+        self.session_id = session_id
+        self.header = {"version": 2, "width": width, "height": height,
+                       "timestamp": int(time.time()), "env": {"TERM": "xterm"}}
+        self.header.update(meta)
+        self.events = collections.deque()  # (t, code, text); appended by the reader
+        self.closed = False
+        self._t0 = time.monotonic()
+        self._compressor = None
+        self._member_t = None
+        self._header_written = False
+
+    def output(self, text):
+        if text:
+            self.events.append((time.monotonic() - self._t0, "o", text))
+
+    def input(self, text):
+        if text and RECORD_INPUT:
+            self.events.append((time.monotonic() - self._t0, "i", text))
+
+    def flush(self, final=False):
+        """Append pending events to disk (writer thread only)."""
+        lines = []
+        first_t = None
+        while self.events:
+            t, code, text = self.events.popleft()
+            first_t = t if first_t is None else first_t
+            lines.append(json.dumps([round(t, 6), code, text], ensure_ascii=False))
+        if not self._header_written:
+            lines.insert(0, json.dumps(self.header))
+            first_t = 0.0 if first_t is None else first_t
+        if not lines and not (final and self._compressor):
+            return
+        with open(cast_path(self.session_id), "ab") as f:
+            if lines:
+                if self._compressor is None or first_t - self._member_t >= KEYFRAME_INTERVAL:
+                    self._start_member(f, 0.0 if not self._header_written else first_t)
+                data = ("\n".join(lines) + "\n").encode()
+                f.write(self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH))
+                self._header_written = True
+            if final and self._compressor is not None:
+                f.write(self._compressor.flush())
+                self._compressor = None
+
+    def _start_member(self, f, t):
+        if self._compressor is not None:
+            f.write(self._compressor.flush())
+        offset = f.seek(0, os.SEEK_END)
+        with open(index_path(self.session_id), "a") as idx:
+            idx.write(json.dumps({"t": round(t, 6), "offset": offset}) + "\n")
+        self._compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        self._member_t = t
+
+
+def start(session_id, **meta):
+    """Begin recording `session_id`; returns the Recording or None if disabled."""
+    if not enabled():
+        return None
+    os.makedirs(RECORD_DIR, exist_ok=True)
+    recording = Recording(session_id, **meta)
+    with _active_lock:
+        _active[session_id] = recording
+    return recording
+
+
+def get(session_id):
+    return _active.get(session_id)
+
+
+def stop(session_id):
+    """Mark a recording finished; the writer closes it on its next pass."""
+    recording = _active.get(session_id)
+    if recording is not None:
+        recording.closed = True
+
+
+def flush_all():
+    with _active_lock:
+        recordings = list(_active.items())
+    for session_id, recording in recordings:
+        try:
+            recording.flush(final=recording.closed)
+        except OSError as e:
+            print(f"recording {session_id} write error: {e}")
+        if recording.closed:
+            with _active_lock:
+                _active.pop(session_id, None)
+
+
+def prune(now=None):
+    """Delete recordings not written to in RETENTION_DAYS."""
+    now = time.time() if now is None else now
+    removed = 0
+    for name in os.listdir(RECORD_DIR):
+        path = os.path.join(RECORD_DIR, name)
+        if name.endswith((".cast.gz", ".idx")) and now - os.path.getmtime(path) > RETENTION_DAYS * 86400:
+            os.remove(path)
+            removed += 1
+    return removed
+
+
+def run_loop(socketio):
+    """Background writer: flush every recording each FLUSH_INTERVAL seconds."""
+    last_prune = 0
+    while True:
+        flush_all()
+        if time.time() - last_prune > 3600:
+            last_prune = time.time()
+            try:
+                prune()
+            except OSError as e:
+                print(f"recording prune error: {e}")
+        socketio.sleep(FLUSH_INTERVAL)
+
+
+# -- reading -----------------------------------------------------------------
+
+def load_index(session_id):
+    """[(t, offset), ...] in file order, one entry per gzip member."""
+    with open(index_path(session_id)) as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    return [(e["t"], e["offset"]) for e in entries]
+
+
+def iter_records(session_id, offset=0):
+    """Parsed JSON lines (header dict, then event lists) from `offset` on,
+    across gzip members; a member still being written is read up to its
+    last sync flush."""
+    with open(cast_path(session_id), "rb") as f:
+        f.seek(offset)
+        decompressor = zlib.decompressobj(31)
+        tail = b""
+        while True:
+            chunk = f.read(READ_CHUNK)
+            if not chunk:
+                break
+            while chunk:
+                data = decompressor.decompress(chunk)
+                chunk = b""
+                if decompressor.eof:
+                    chunk = decompressor.unused_data
+                    decompressor = zlib.decompressobj(31)
+                lines = (tail + data).split(b"\n")
+                tail = lines.pop()
+                for line in lines:
+                    if line:
+                        yield json.loads(line)
+
+
+def read_header(session_id):
+    for record in iter_records(session_id):
+        return record if isinstance(record, dict) else None
+    return None
+
+
+def list_recordings():
+    """Recorded sessions, newest first, with their headers and sizes."""
+    if not enabled() or not os.path.isdir(RECORD_DIR):
+        return []
+    out = []
+    for name in os.listdir(RECORD_DIR):
+        if not name.endswith(".cast.gz"):
+            continue
+        session_id = name[:-len(".cast.gz")]
+        try:
+            header = read_header(session_id) or {}
+            stat = os.stat(cast_path(session_id))
+        except (OSError, ValueError, zlib.error):
+            continue
+        out.append({
+            "session_id": session_id,
+            "started_at": header.get("timestamp"),
+            "user": header.get("user"),
+            "command": header.get("command"),
+            "size_bytes": stat.st_size,
+            "updated_at": stat.st_mtime,
+            "recording": session_id in _active,
+        })
+    out.sort(key=lambda r: r["started_at"] or 0, reverse=True)
+    return out
+
+
+def replay(session_id, start=0.0, duration=None):
+    """Yield asciicast v2 lines for [start, start + duration) of a session.
+
+    Times are rebased to `start`. When seeking, the output just before
+    `start` (at most CONTEXT_BYTES, from at most one earlier member) is
+    replayed at time 0 after a screen clear so the view starts in context.
+    """
+    index = load_index(session_id)
+    header = read_header(session_id) or {"version": 2, "width": 80, "height": 24}
+    header = dict(header, timestamp=int(header.get("timestamp", 0) + start))
+    yield json.dumps(header) + "\n"
+
+    pos = bisect.bisect_right([t for t, _ in index], start) - 1
+    offset = index[max(pos - 1, 0)][1] if index else 0
+    end = None if duration is None else start + duration
+    context = []
+    context_len = 0
+    started = start <= 0
+    for record in iter_records(session_id, offset):
+        if not isinstance(record, list):
+            continue
+        t, code, text = record
+        if t < start:
+            if code == "o":
+                context.append(text)
+                context_len += len(text)
+                while context_len - len(context[0]) > CONTEXT_BYTES:
+                    context_len -= len(context.pop(0))
+            continue
+        if end is not None and t >= end:
+            break
+        if not started:
+            started = True
+            yield json.dumps([0.0, "o", CLEAR_SCREEN + "".join(context)[-CONTEXT_BYTES:]],
+                             ensure_ascii=False) + "\n"
+        yield json.dumps([round(t - start, 6), code, text], ensure_ascii=False) + "\n"
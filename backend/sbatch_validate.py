@@ -0,0 +1,228 @@
+"""Static #SBATCH directive parsing, linting and a --test-only result cache.
+
+Every submission used to run `sbatch --test-only` before the real `sbatch`.
+Most scripts differ only in their commands, output paths or job names, none
+of which change whether Slurm accepts the resource request. Here the
+directives are parsed locally, obviously invalid requests are rejected
+without contacting Slurm, and --test-only results are cached for
+VALIDATION_TTL seconds keyed on the normalized resource directives plus the
+cluster snapshot version they were checked against.
+"""
+import os
+import re
+import threading
+import time
+
+VALIDATION_TTL = float(os.environ.get("SLURM_GUI_VALIDATION_TTL", "60"))
+MAX_CACHE_ENTRIES = 1024
+
+# Short option -> long option for the directives we understand
+SHORT_OPTIONS = {
+    "-p": "--partition",
+    "-N": "--nodes",
+    "-n": "--ntasks",
+    "-c": "--cpus-per-task",
+    "-t": "--time",
+    "-J": "--job-name",
+    "-o": "--output",
+    "-e": "--error",
+    "-G": "--gpus",
+    "-A": "--account",
+    "-q": "--qos",
+    "-C": "--constraint",
+    "-a": "--array",
+    "-d": "--dependency",
+    "-w": "--nodelist",
+    "-x": "--exclude",
+}
+# Options that never affect whether Slurm accepts the request
+COSMETIC_OPTIONS = {
+    "--job-name", "--output", "--error", "--comment", "--mail-type",
+    "--mail-user", "--chdir", "--open-mode", "--export",
+}
+VALUE_OPTIONS = ("--partition", "--time", "--mem", "--nodes", "--ntasks", "--cpus-per-task", "--gres")
+
+TIME_RE = re.compile(
+    r"^(?:(?P<days>\d+)-(?P<dh>\d+)(?::(?P<dm>\d+)(?::(?P<ds>\d+))?)?"
+    r"|(?P<h>\d+):(?P<m>\d+):(?P<s>\d+)"
+    r"|(?P<m2>\d+):(?P<s2>\d+)"
+    r"|(?P<min>\d+))$"
+)
+MEM_RE = re.compile(r"^(\d+(?:\.\d+)?)([KMGT]?)B?$", re.IGNORECASE)
+NODES_RE = re.compile(r"^(\d+)(?:-(\d+))?$")
+
+
+def parse_directives(content):
+    """Return {long_option: value} for the #SBATCH lines sbatch would read.
+
+    sbatch stops reading directives at the first line that is neither blank
+    nor a comment, so anything after that is ignored here too. Flags without
+    a value map to True.
+    """
+    directives = {}
+    for line in content.splitlines():
+        stripped = line.strip()
+        if not stripped:
+            continue
+        if not stripped.startswith("#"):
+            break
+        if not stripped.startswith("#SBATCH"):
+            continue
+        text = stripped[len("#SBATCH"):].strip()
+        # drop trailing comments ("#SBATCH --ntasks=1   # one task")
+        text = re.split(r"\s+#", text, maxsplit=1)[0].strip()
+        if not text.startswith("-"):
+            continue
+        if text.startswith("--"):
+            option, sep, value = text.partition("=")
+            if not sep:
+                option, _, value = text.partition(" ")
+        else:
+            option, value = text[:2], text[2:].strip()
+            if value.startswith("="):
+                value = value[1:]
+            option = SHORT_OPTIONS.get(option, option)
+        option = option.strip()
+        value = value.strip().strip('"').strip("'")
+        directives[option] = value if value else True
+    return directives
+
+
+def parse_time_minutes(value):
+    """Convert a Slurm time string to minutes (None if invalid)."""
+    if value in ("UNLIMITED", "INFINITE"):
+        return 0
+    m = TIME_RE.match(str(value))
+    if not m:
+        return None
+    g = {k: int(v) for k, v in m.groupdict().items() if v is not None}
+    if "days" in g:
+        return g["days"] * 1440 + g["dh"] * 60 + g.get("dm", 0) + (1 if g.get("ds") else 0)
+    if "h" in g:
+        return g["h"] * 60 + g["m"] + (1 if g["s"] else 0)
+    if "m2" in g:
+        return g["m2"] + (1 if g["s2"] else 0)
+    return g["min"]
+
+
+def parse_mem_mb(value):
+    """Convert a Slurm memory string (default unit MB) to MB (None if invalid)."""
+    m = MEM_RE.match(str(value).strip())
+    if not m:
+        return None
+    number, unit = float(m.group(1)), m.group(2).upper()
+    scale = {"K": 1 / 1024, "": 1, "M": 1, "G": 1024, "T": 1024 * 1024}[unit]
+    return int(number * scale)
+
+
+def normalize(directives):
+    """Canonical, hashable view of the directives that affect validation."""
+    out = {}
+    for option, value in directives.items():
+        if option in COSMETIC_OPTIONS:
+            continue
+        if option in ("--mem", "--mem-per-cpu", "--mem-per-gpu"):
+            mb = parse_mem_mb(value)
+            value = mb if mb is not None else value
+        elif option in ("--time", "--time-min"):
+            minutes = parse_time_minutes(value)
+            value = minutes if minutes is not None else value
+        out[option] = value
+    return tuple(sorted((k, str(v)) for k, v in out.items()))
+
+
+def _partition_limits(cluster):
+    """{partition: (node_count, max_cpus, max_mem_mb)} from a resources snapshot."""
+    limits = {}
+    for node in cluster.get("nodes", []):
+        name = node["partition"].rstrip("*")
+        count, cpus, mem = limits.get(name, (0, 0, 0))
+        limits[name] = (count + 1, max(cpus, node["cpus_total"]), max(mem, node["memory_total_mb"]))
+    return limits
+
+
+def lint(directives, cluster=None):
+    """Return a list of problems that make sbatch certain to reject the script.
+
+    `cluster` is the current resources snapshot data, if one is cached; it
+    enables partition and size checks without calling Slurm.
+    """
+    problems = []
+    for option in VALUE_OPTIONS:
+        if directives.get(option) is True:
+            problems.append(f"{option} requires a value")
+    directives = {k: v for k, v in directives.items() if v is not True}
+
+    for option in ("--time", "--time-min"):
+        if option in directives and parse_time_minutes(directives[option]) is None:
+            problems.append(f"invalid {option} value '{directives[option]}'")
+    for option in ("--mem", "--mem-per-cpu", "--mem-per-gpu"):
+        if option in directives and parse_mem_mb(directives[option]) is None:
+            problems.append(f"invalid {option} value '{directives[option]}'")
+    if "--mem" in directives and "--mem-per-cpu" in directives:
+        problems.append("--mem and --mem-per-cpu are mutually exclusive")
+
+    min_nodes = None
+    if "--nodes" in directives:
+        m = NODES_RE.match(str(directives["--nodes"]))
+        if not m or int(m.group(1)) < 1 or (m.group(2) and int(m.group(2)) < int(m.group(1))):
+            problems.append(f"invalid --nodes value '{directives['--nodes']}'")
+        else:
+            min_nodes = int(m.group(1))
+    for option in ("--ntasks", "--cpus-per-task", "--ntasks-per-node"):
+        if option in directives:
+            value = str(directives[option])
+            if not value.isdigit() or int(value) < 1:
+                problems.append(f"invalid {option} value '{value}'")
+
+    if cluster and cluster.get("nodes"):
+        limits = _partition_limits(cluster)
+        partitions = [p for p in str(directives.get("--partition", "")).split(",") if p]
+        unknown = [p for p in partitions if p not in limits]
+        if unknown:
+            problems.append(f"unknown partition(s): {', '.join(unknown)} "
+                            f"(available: {', '.join(sorted(limits))})")
+        candidates = [limits[p] for p in partitions if p in limits] or list(limits.values())
+        if candidates and not unknown:
+            if min_nodes and min_nodes > max(c[0] for c in candidates):
+                problems.append(f"requested {min_nodes} nodes but the partition has at most "
+                                f"{max(c[0] for c in candidates)}")
+            mem = parse_mem_mb(directives["--mem"]) if "--mem" in directives else None
+            if mem and mem > max(c[2] for c in candidates):
+                problems.append(f"requested {mem} MB per node but the largest node has "
+                                f"{max(c[2] for c in candidates)} MB")
+            cpt = str(directives.get("--cpus-per-task", ""))
+            if cpt.isdigit() and int(cpt) > max(c[1] for c in candidates):
+                problems.append(f"requested {cpt} CPUs per task but the largest node has "
+                                f"{max(c[1] for c in candidates)}")
+    return problems
+
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def cache_key(directives, snapshot_version):
+    return normalize(directives), snapshot_version
+
+
+def cached_result(key):
+    """Return a cached --test-only output for `key`, or None."""
+    entry = _cache.get(key)
+    if entry is None:
+        return None
+    stored_at, output = entry
+    if time.time() - stored_at > VALIDATION_TTL:
+        with _cache_lock:
+            _cache.pop(key, None)
+        return None
+    return output
+
+
+def store_result(key, output):
+    with _cache_lock:
+        if len(_cache) >= MAX_CACHE_ENTRIES:
+            # drop the oldest entries
+            for old in sorted(_cache, key=lambda k: _cache[k][0])[:MAX_CACHE_ENTRIES // 4]:
+                del _cache[old]
+        _cache[key] = (time.time(), output)
@@ -0,0 +1,265 @@
+"""Admission control for backend work that runs Slurm commands.
+
+Work is split into classes, highest priority first:
+
+    interactive  opening terminals (salloc / srun attach)
+    control      submissions, cancel, hold/release/requeue
+    refresh      dashboard polling refreshes and background collectors
+
+Each class has a concurrency budget and a bounded wait queue, and all
+classes share TOTAL_SLOTS. A class cannot start new work while a higher
+class is waiting for a shared slot, and refresh is capped below the total,
+so heavy polling leaves headroom for terminals and submissions. When a
+class's queue is full, or a waiter's deadline passes, the work is shed with
+Overloaded. Poll requests get a short deadline (POLL_DEADLINE) because
+their answer is stale by the time the next poll arrives; the server then
+serves the previous snapshot or answers 503.
+
+Waiting polls with the server's cooperative sleep (configure(sleep=...)),
+so under eventlet a queued request yields the hub instead of blocking it.
+
+Ordering work only helps if one Slurm call does not stall everything else.
+The server runs eventlet without monkey patching, so a blocking read from
+squeue freezes every green thread until it returns. With
+configure(offload=True) blocking() runs such calls in eventlet's OS thread
+pool and the calling green thread yields meanwhile. Locks and events held
+across those calls must be waited for the same way, since a plain acquire
+would block the hub with the holder unable to resume: locked() queues
+green threads on an eventlet semaphore paired with the lock (falling back
+to short sleeps only while a real OS thread holds it), and Event wakes
+green waiters through an eventlet event.
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import metrics
+
+try:
+    from eventlet import event as green_event, semaphore as green_semaphore, tpool
+except ImportError:  # threading mode: blocking calls only block their own thread
+    green_event = green_semaphore = tpool = None
+
+PRIORITY = ("interactive", "control", "refresh")
+DEFAULT_LIMITS = {
+    # class: (concurrent budget, max queued)
+    "interactive": (8, 16),
+    "control": (4, 32),
+    "refresh": (4, 16),
+}
+TOTAL_SLOTS = int(os.environ.get("SLURM_GUI_WORK_SLOTS", "10"))
+POLL_DEADLINE = float(os.environ.get("SLURM_GUI_POLL_DEADLINE", "2"))
+QUEUE_TIMEOUT = 30.0  # longest anything waits without its own deadline
+
+
+class Overloaded(Exception):
+    """Work was shed; retry after `retry_after` seconds."""
+
+    def __init__(self, work_class, reason, retry_after=1):
+        super().__init__(f"{work_class} work shed: {reason}")
+        self.work_class = work_class
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def parse_limits(spec, defaults=DEFAULT_LIMITS):
+    """"refresh=2/8,control=4/32" -> {class: (budget, queue)} over `defaults`."""
+    limits = dict(defaults)
+    for item in (spec or "").split(","):
+        if not item.strip():
+            continue
+        name, _, value = item.partition("=")
+        budget, _, queue = value.partition("/")
+        name = name.strip()
+        try:
+            limits[name] = (int(budget), int(queue) if queue else limits.get(name, (0, 16))[1])
+        except ValueError:
+            print(f"Ignoring invalid work limit '{item}'")
+    return limits
+
+
+LIMITS = parse_limits(os.environ.get("SLURM_GUI_WORK_LIMITS"))
+
+_lock = threading.Lock()
+_running = {name: 0 for name in PRIORITY}
+_waiting = {name: 0 for name in PRIORITY}
+_total = 0
+_sleep = time.sleep
+_offload = False
+_green_locks = {}  # threading lock -> eventlet semaphore queueing green threads for it
+CROSS_THREAD_POLL = 0.01  # wait step while a real OS thread holds a lock
+
+
+def configure(sleep=None, offload=None):
+    """Use `sleep` (e.g. socketio.sleep) while waiting; `offload` blocking
+    calls to eventlet's thread pool (only when serving with eventlet)."""
+    global _sleep, _offload
+    if sleep is not None:
+        _sleep = sleep
+    if offload is not None:
+        _offload = bool(offload) and tpool is not None
+
+
+def _cooperative():
+    # green threads only exist on the main thread; other threads block normally
+    return _offload and threading.current_thread() is threading.main_thread()
+
+
+def blocking(fn, *args, **kwargs):
+    """Call `fn` without stalling other green threads while it blocks."""
+    if _cooperative():
+        return tpool.execute(fn, *args, **kwargs)
+    return fn(*args, **kwargs)
+
+
+def _green_lock(lock):
+    green = _green_locks.get(lock)
+    if green is None:
+        with _lock:
+            green = _green_locks.setdefault(lock, green_semaphore.Semaphore(1))
+    return green
+
+
+@contextmanager
+def locked(lock):
+    """`with lock:` for locks held across blocking() calls."""
+    if not _cooperative():
+        with lock:
+            yield
+        return
+    green = _green_lock(lock)
+    green.acquire()  # green threads queue here and are woken on release
+    try:
+        while not lock.acquire(blocking=False):
+            _sleep(CROSS_THREAD_POLL)  # held by a real OS thread
+        try:
+            yield
+        finally:
+            lock.release()
+    finally:
+        green.release()
+
+
+class Event:
+    """threading.Event whose wait() yields to other green threads.
+
+    Under eventlet every request runs on the hub thread, so that is where
+    set() is called: it wakes green waiters through an eventlet event.
+    """
+
+    def __init__(self):
+        self._flag = threading.Event()
+        self._green = None  # created by the first cooperative waiter
+
+    def is_set(self):
+        return self._flag.is_set()
+
+    def set(self):
+        self._flag.set()
+        green = self._green
+        if green is not None and not green.ready():
+            green.send()
+
+    def wait(self):
+        if not _cooperative():
+            self._flag.wait()
+            return
+        if self._flag.is_set():
+            return
+        if self._green is None:
+            self._green = green_event.Event()
+        self._green.wait()
+
+
+def _has_room(name):
+    return _running[name] < LIMITS[name][0] and _total < TOTAL_SLOTS
+
+
+def _admissible(name):
+    """Called with _lock held."""
+    if not _has_room(name):
+        return False
+    # a higher class waiting only for a shared slot goes first
+    for other in PRIORITY[:PRIORITY.index(name)]:
+        if _waiting[other] and _running[other] < LIMITS[other][0]:
+            return False
+    return True
+
+
+def _take(name):
+    global _total
+    _running[name] += 1
+    _total += 1
+
+
+def acquire(name, deadline=None):
+    """Wait for a slot in work class `name`; raises Overloaded if shed.
+
+    `deadline` is a time.monotonic() value after which waiting is pointless.
+    """
+    started = time.monotonic()
+    deadline = min(deadline or started + QUEUE_TIMEOUT, started + QUEUE_TIMEOUT)
+    with _lock:
+        if _admissible(name):
+            _take(name)
+            metrics.incr("scheduler_admitted_total", work_class=name)
+            return
+        if _waiting[name] >= LIMITS[name][1]:
+            metrics.incr("scheduler_shed_total", work_class=name, reason="queue_full")
+            raise Overloaded(name, "queue full")
+        _waiting[name] += 1
+    delay = 0.001
+    try:
+        while True:
+            _sleep(delay)
+            delay = min(delay * 2, 0.02)
+            with _lock:
+                if _admissible(name):
+                    _take(name)
+                    metrics.incr("scheduler_admitted_total", work_class=name)
+                    metrics.incr("scheduler_wait_seconds_total", round(time.monotonic() - started, 6),
+                                 work_class=name)
+                    return
+            if time.monotonic() >= deadline:
+                metrics.incr("scheduler_shed_total", work_class=name, reason="deadline")
+                raise Overloaded(name, "deadline passed")
+    finally:
+        with _lock:
+            _waiting[name] -= 1
+
+
+def release(name):
+    global _total
+    with _lock:
+        _running[name] -= 1
+        _total -= 1
+
+
+@contextmanager
+def slot(name, deadline=None):
+    acquire(name, deadline)
+    try:
+        yield
+    finally:
+        release(name)
+
+
+def run(name, fn, *args, deadline=None, **kwargs):
+    with slot(name, deadline):
+        return fn(*args, **kwargs)
+
+
+def poll_deadline():
+    return time.monotonic() + POLL_DEADLINE
+
+
+def stats():
+    with _lock:
+        return {
+            "total_slots": TOTAL_SLOTS,
+            "in_use": _total,
+            "classes": {name: {"budget": LIMITS[name][0], "queue_limit": LIMITS[name][1],
+                               "running": _running[name], "waiting": _waiting[name]}
+                        for name in PRIORITY},
+        }
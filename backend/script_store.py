@@ -0,0 +1,147 @@
+"""Content-addressed store for submitted batch scripts.
+
+Scripts are stored once as blobs keyed by their SHA-256
+(<store>/.blobs/<aa>/<sha256>), no matter how many users or submissions
+share them. Each user has a manifest (<store>/<username>/.manifest.json)
+mapping their submissions to blobs and job ids, and <store>/<username>/<filename>
+is a symlink to the blob most recently submitted under that name. The store
+is files/store by default (SLURM_GUI_SCRIPT_STORE), apart from the sample
+scripts tracked in files/.
+
+Usernames become directory names, so they must match interactive.USER_RE
+and may not start with '.' (which would reach "..", "." or the blob store).
+
+Every write goes to a temp file in the destination directory followed by
+os.replace, so concurrent uploads never observe a partially written blob,
+manifest or link, and same-named uploads cannot overwrite each other's
+script before it reaches sbatch.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+
+import interactive
+
+FILES_DIR = os.environ.get("SLURM_GUI_SCRIPT_STORE") or os.path.normpath(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'files', 'store'))
+BLOB_DIR = os.path.join(FILES_DIR, '.blobs')
+MANIFEST_NAME = '.manifest.json'
+MAX_SUBMISSIONS = 1000  # per user; oldest manifest entries are dropped first
+
+_manifest_locks = {}
+_locks_lock = threading.Lock()
+
+
+def valid_user(username):
+    return interactive.valid_user(username) and not username.startswith('.')
+
+
+def user_dir(username):
+    if not valid_user(username):
+        raise ValueError(f"Invalid username: {username!r}")
+    path = os.path.join(FILES_DIR, username)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def atomic_write(path, data, mode=0o644):
+    """Write `data` (bytes) to `path` via a temp file and rename."""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp, mode)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def blob_path(sha256):
+    return os.path.join(BLOB_DIR, sha256[:2], sha256)
+
+
+def put_blob(content):
+    """Store script text; returns (sha256, path, created)."""
+    data = content.encode('utf-8')
+    sha256 = hashlib.sha256(data).hexdigest()
+    path = blob_path(sha256)
+    if os.path.exists(path):
+        return sha256, path, False
+    atomic_write(path, data, mode=0o755)
+    return sha256, path, True
+
+
+def link_script(username, filename, sha256):
+    """Point files/<username>/<filename> at a blob (atomic symlink swap)."""
+    link = os.path.join(user_dir(username), filename)
+    tmp = os.path.join(os.path.dirname(link), f'.tmp-{uuid.uuid4().hex}')
+    os.symlink(os.path.relpath(blob_path(sha256), os.path.dirname(link)), tmp)
+    try:
+        os.replace(tmp, link)
+    except OSError:
+        os.unlink(tmp)
+        raise
+    return link
+
+
+def _manifest_lock(username):
+    with _locks_lock:
+        return _manifest_locks.setdefault(username, threading.Lock())
+
+
+def _manifest_path(username):
+    return os.path.join(user_dir(username), MANIFEST_NAME)
+
+
+def load_manifest(username):
+    try:
+        with open(_manifest_path(username)) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {"submissions": []}
+
+
+def record_submission(username, filename, sha256, job_id, resubmit_of=None):
+    """Append a submission to the user's manifest; returns the new entry."""
+    entry = {
+        "id": uuid.uuid4().hex[:12],
+        "filename": filename,
+        "sha256": sha256,
+        "job_id": job_id,
+        "submitted_at": time.time(),
+    }
+    if resubmit_of:
+        entry["resubmit_of"] = resubmit_of
+    with _manifest_lock(username):
+        manifest = load_manifest(username)
+        manifest["submissions"].append(entry)
+        manifest["submissions"] = manifest["submissions"][-MAX_SUBMISSIONS:]
+        atomic_write(_manifest_path(username), json.dumps(manifest, indent=1).encode())
+    return entry
+
+
+def find_submission(username, submission_id=None, sha256=None):
+    """Return the latest manifest entry matching an id or script hash."""
+    for entry in reversed(load_manifest(username)["submissions"]):
+        if submission_id and entry["id"] == submission_id:
+            return entry
+        if sha256 and entry["sha256"] == sha256:
+            return entry
+    return None
+
+
+def read_blob(sha256):
+    with open(blob_path(sha256), encoding='utf-8') as f:
+        return f.read()
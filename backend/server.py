@@ -1,4 +1,7 @@
-from flask import Flask, request, jsonify
+import time
+_import_started = time.monotonic()
+
+from flask import Flask, Response, after_this_request, request, jsonify
 from flask_cors import CORS
 from flask_socketio import SocketIO, emit
 import subprocess
@@ -10,6 +13,35 @@ import tempfile
 import struct
 import fcntl
 import getpass
+import hashlib
+import hmac
+import functools
+import socket
+
+import bulk_control
+import capabilities
+import cluster_replay
+import efficiency
+import fairshare
+import fit
+import history
+import interactive
+import job_arrays
+import metrics
+import node_detail
+import profiling
+import ratelimit
+import recorder
+import scheduler
+import slurm_parse
+import sbatch_validate
+import script_store
+import snapshots
+import streaming
+import wait_predict
+import watch
+
+_imported_at = time.monotonic()
 
 app = Flask(__name__)
 CORS(app, resources={
@@ -21,6 +53,14 @@ CORS(app, resources={
 })
 socketio = SocketIO(app, cors_allowed_origins=["http://localhost:5173", "http://localhost:8080", "http://localhost:8001"])
 
+# Serve Slurm output from a capture file, or record it to one (SLURM_GUI_REPLAY /
+# SLURM_GUI_CAPTURE); a no-op otherwise
+cluster_replay.install()
+
+# Queued work waits with socketio.sleep so it yields instead of blocking the hub,
+# and under eventlet Slurm commands are waited on in its OS thread pool
+scheduler.configure(sleep=socketio.sleep, offload=socketio.async_mode == "eventlet")
+
 
 def run_command(cmd, shell=False):
     try:
@@ -48,12 +88,36 @@ def run_command(cmd, shell=False):
     except Exception as e:
         return str(e)
 
+def spawn_pty(argv, rows=24, cols=80):
+    """Run `argv` with a new PTY as its controlling terminal.
+
+    Returns (master_fd, {'pid': pid}); the master fd carries the terminal I/O.
+    """
+    # pty.fork() so the child has the PTY as its controlling terminal
+    pid, master_fd = pty.fork()
+    if pid == 0:
+        try:
+            os.environ['TERM'] = 'xterm'
+            os.execvp(argv[0], argv)
+        except Exception as e:
+            print(f"Failed to exec {argv[0]}: {e}")
+        os._exit(1)
+
+    try:
+        fcntl.ioctl(master_fd, termios.TIOCSWINSZ, struct.pack('HHHH', rows, cols, 0, 0))
+    except Exception as ex:
+        print(f"Warning: could not set window size on PTY: {ex}")
+    print(f"Started child {argv[0]} pid={pid} with master_fd={master_fd}")
+    return master_fd, {'pid': pid}
+
+
 def create_terminal_session(resource_params):
     """Create a new terminal session with salloc using simplest working approach"""
     print(f"Creating terminal session with params: {resource_params}")
     
-    # Build salloc command with minimal parameters and add bash directly
-    salloc_cmd = ["salloc"]
+    # Build salloc command with minimal parameters and add bash directly.
+    # The job name marks the allocation so more terminals can attach to it.
+    salloc_cmd = ["salloc", "--job-name", interactive.job_name(resource_params.get("username"))]
     if resource_params.get("nodes"):
         salloc_cmd.extend(["--nodes", str(resource_params["nodes"])])
     if resource_params.get("memory"):
@@ -65,127 +129,227 @@ def create_terminal_session(resource_params):
     salloc_cmd.append("/bin/bash")
 
     print(f"Running salloc command: {' '.join(salloc_cmd)}")
+    return spawn_pty(salloc_cmd)
 
-    # Create pseudo-terminal
-    master_fd, slave_fd = pty.openpty()
 
-    try:
-        # Set terminal size on the slave PTY (master_fd is for reading/writing)
-        rows, cols = 24, 80  # Default size
-        winsize = struct.pack('HHHH', rows, cols, 0, 0)
-        try:
-            fcntl.ioctl(slave_fd, termios.TIOCSWINSZ, winsize)
-        except Exception as ex:
-            print(f"Warning: could not set window size on slave PTY: {ex}")
-        
-        # Start salloc process with PTY
-        # Use pty.fork() so the child has the PTY as its controlling terminal.
-        pid, master_fd = pty.fork()
-        if pid == 0:
-            # Child: replace process with salloc + /bin/bash
-            try:
-                # set session env
-                os.environ['TERM'] = 'xterm'
-                # Execute salloc command
-                os.execvp(salloc_cmd[0], salloc_cmd)
-            except Exception as e:
-                print(f"Failed to exec salloc: {e}")
-                os._exit(1)
-
-        # Parent: pid is child pid, master_fd is file descriptor for IO
-        print(f"Started child salloc pid={pid} with master_fd={master_fd}")
-        return master_fd, {'pid': pid}
-
-        # Close slave fd, we'll use master to communicate
-        os.close(slave_fd)
-        print("Started salloc process with PTY")
-        
-        return master_fd, process
-        
-    except Exception as e:
-        print(f"Error in create_terminal_session: {str(e)}")
-        os.close(master_fd)
-        os.close(slave_fd)
-        if 'process' in locals():
-            process.terminate()
-        raise
-        print(f"salloc stdout: {stdout}")
-        print(f"salloc stderr: {stderr}")
-        
-        if salloc_process.returncode != 0:
-            raise Exception(f"salloc failed: {stderr}")
+def stream_snapshot(snapshot, list_key, data=None, variant=None):
+    """Send a snapshot as streamed JSON/NDJSON, honouring conditional GETs.
 
-        # Parse the job ID from salloc output
-        import re
-        job_id_match = re.search(r"Granted job allocation (\d+)", stdout)
-        if not job_id_match:
-            raise Exception(f"Could not find job ID in salloc output. Output was: {stdout}")
+    The snapshot's ETag is checked against If-None-Match first, so an
+    unchanged poll costs neither encoding nor transfer. Otherwise the body
+    for this (format, encoding) is taken from the snapshot's cache; the first
+    request for a version is streamed, compressed incrementally if the
+    client accepts it, while it is cached.
+    `data`/`variant` serve a derived view of the snapshot (e.g. collapsed
+    arrays) under its own cache key.
+    """
+    data = snapshot.data if data is None else data
+    headers = {
+        "ETag": snapshot.etag,
+        "Cache-Control": "no-cache",  # always revalidate, 304 when unchanged
+        "Vary": "Accept, Accept-Encoding",
+        "X-Snapshot-Version": str(snapshot.version),
+    }
+    if variant:
+        headers["ETag"] = snapshot.etag[:-1] + f'-{variant}"'
+    if snapshots.etag_matches(request.headers.get("If-None-Match"), headers["ETag"]):
+        return Response(status=304, headers=headers)
+
+    fmt = streaming.choose_format(request.args, request.headers.get("Accept"))
+    encoding = streaming.choose_encoding(request.headers.get("Accept-Encoding"))
+    mimetype = streaming.NDJSON_MIMETYPE if fmt == "ndjson" else streaming.JSON_MIMETYPE
+    iter_body = streaming.iter_ndjson if fmt == "ndjson" else streaming.iter_json
+
+    if encoding:
+        chunks = lambda: streaming.iter_compressed(iter_body(data, list_key), encoding)
+        headers["Content-Encoding"] = encoding
+    else:
+        chunks = lambda: iter_body(data, list_key)
+    body = snapshot.stream((variant, fmt, encoding), lambda: _serialize_timed(chunks()))
+    return Response(body, mimetype=mimetype, headers=headers)
 
-        job_id = job_id_match.group(1)
-        print(f"Got job ID: {job_id}")
 
-        # Now start an interactive shell using srun
-        srun_cmd = ["srun", "--jobid", job_id, "/bin/bash"]
-        print(f"Starting srun with command: {' '.join(srun_cmd)}")
-        
-        process = subprocess.Popen(
-            srun_cmd,
-            stdin=slave_fd,
-            stdout=slave_fd,
-            stderr=slave_fd,
-            preexec_fn=os.setsid
+def _serialize_timed(chunks):
+    # bodies are encoded while they stream, after Server-Timing has been
+    # sent, so this time only shows up in profile_phase_seconds_total
+    chunks = iter(chunks)
+    while True:
+        with profiling.phase("serialize"):
+            chunk = next(chunks, None)
+        if chunk is None:
+            return
+        yield chunk
+
+
+def _client_keys():
+    """Rate-limit buckets for this request: its IP.
+
+    The `username` parameter is not authenticated, so it is not used.
+    """
+    return [f"ip:{request.remote_addr or 'unknown'}"]
+
+
+def rate_limited(rule):
+    """Reject requests over the `rule` token-bucket limit with 429 + Retry-After."""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            allowed, retry_after = ratelimit.check(rule, _client_keys(), endpoint=request.endpoint)
+            if not allowed:
+                retry_after = ratelimit.retry_after_header(retry_after)
+                metrics.incr("ratelimit_rejected_total", rule=rule, endpoint=request.endpoint)
+                response = jsonify({"error": "Too many requests", "rule": rule, "retry_after": retry_after})
+                response.status_code = 429
+                response.headers["Retry-After"] = str(retry_after)
+                return response
+            metrics.incr("requests_total", rule=rule, endpoint=request.endpoint)
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def coalesced(view):
+    """Serve identical concurrent requests from one execution of `view`.
+
+    Requests match on method, path, query, body and the negotiation headers;
+    the first one runs the view and the others get a copy of its response.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        key = (
+            request.endpoint, request.method, request.full_path,
+            hashlib.sha1(request.get_data()).hexdigest(),
+            request.headers.get("Accept"), request.headers.get("Accept-Encoding"),
+            request.headers.get("If-None-Match"),
         )
 
-        # Close slave fd, we'll use master to communicate
-        os.close(slave_fd)
-        print("Interactive shell started successfully")
-        
-        return master_fd, process
+        def render():
+            response = app.make_response(view(*args, **kwargs))
+            return response.get_data(), response.status_code, list(response.headers.items())
+
+        (body, status, headers), shared = ratelimit.coalesce(key, render)
+        if shared:
+            metrics.incr("coalesced_requests_total", endpoint=request.endpoint)
+        return Response(body, status=status, headers=headers)
+    return wrapper
+
+
+def admin_required(view):
+    """Allow only requests carrying SLURM_GUI_ADMIN_TOKEN (Bearer or X-Admin-Token).
+
+    Admin endpoints are disabled when no token is configured.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        token = os.environ.get("SLURM_GUI_ADMIN_TOKEN")
+        if not token:
+            return jsonify({"error": "Admin endpoints are disabled (SLURM_GUI_ADMIN_TOKEN not set)"}), 403
+        auth = request.headers.get("Authorization", "")
+        given = auth[7:] if auth.startswith("Bearer ") else request.headers.get("X-Admin-Token", "")
+        if not hmac.compare_digest(given.encode(), token.encode()):
+            return jsonify({"error": "Admin token required"}), 401
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def scheduled(work_class, poll=False):
+    """Run the view as `work_class` work under admission control (see scheduler).
+
+    Poll requests give up after POLL_DEADLINE; shed work answers 503. Put it
+    outside @coalesced so a request never queues while others wait on it.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            with scheduler.slot(work_class, scheduler.poll_deadline() if poll else None):
+                return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@app.errorhandler(scheduler.Overloaded)
+def handle_overloaded(e):
+    response = jsonify({"error": "Server busy, try again shortly", "work_class": e.work_class,
+                        "reason": e.reason, "retry_after": e.retry_after})
+    response.status_code = 503
+    response.headers["Retry-After"] = str(e.retry_after)
+    return response
+
+
+@app.before_request
+def begin_request_timing():
+    profiling.begin_request()
+
+
+@app.after_request
+def add_server_timing(response):
+    # Per-phase breakdown (subprocess, parse) when timing is enabled
+    timing = profiling.end_request()
+    if timing:
+        response.headers["Server-Timing"] = timing
+    return response
 
-    except subprocess.TimeoutExpired:
-        print("salloc timed out after 10 seconds")
-        if 'salloc_process' in locals():
-            salloc_process.terminate()
-        os.close(master_fd)
-        os.close(slave_fd)
-        raise Exception("Resource allocation timed out. No resources may be immediately available.")
-        
-    except Exception as e:
-        print(f"Error in create_terminal_session: {str(e)}")
-        if 'salloc_process' in locals():
-            salloc_process.terminate()
-        os.close(master_fd)
-        os.close(slave_fd)
-        raise
+
+def polled_snapshot(name, loader, ttl=None):
+    """snapshots.get() for dashboard polls, refreshing as refresh-class work.
+
+    If the refresh is shed the previous snapshot is served, marked with
+    X-Snapshot-Stale; with no previous snapshot the 503 stands. A caller
+    that finds the snapshot fresh never queues for a slot.
+    """
+    snap = snapshots.peek(name)
+    if snap is not None and snap.age() < (snapshots.SNAPSHOT_TTL if ttl is None else ttl):
+        return snap
+    try:
+        with scheduler.slot("refresh", scheduler.poll_deadline()):
+            return snapshots.get(name, loader, ttl)
+    except scheduler.Overloaded:
+        if snap is None:
+            raise
+        metrics.incr("stale_snapshots_served_total", snapshot=name)
+
+        @after_this_request
+        def mark_stale(response):
+            response.headers["X-Snapshot-Stale"] = "1"
+            return response
+        return snap
+
+
+def collect_queue():
+    """Stream squeue's pipe-delimited output straight into the 'jobs' array."""
+    digest = hashlib.sha1()
+    try:
+        jobs = list(slurm_parse.iter_jobs(
+            slurm_parse.iter_command_lines(["squeue", "-o", slurm_parse.QUEUE_FORMAT]),
+            digest,
+        ))
+    except slurm_parse.SlurmCommandError as e:
+        print(f"get_queue error: {e}")
+        jobs = []
+        digest.update(str(e).encode())
+    return {"jobs": jobs}, digest.hexdigest()
+
+
+QUEUE_VIEWS = {
+    "collapsed": job_arrays.collapse,
+    "expanded": job_arrays.expand,
+}
 
 
 @app.route("/api/queue", methods=["GET"])
+@rate_limited("read")
 def get_queue():
-    # Use squeue with a pipe-delimited format and return a JSON object with a 'jobs' array
-    output = run_command(["squeue", "-o", "%i|%u|%j|%t|%M|%D|%R"])  # list: jobid|user|name|state|time|nodes|reason
-    jobs = [] 
-    if not output:
-        return jsonify({"jobs": jobs})
-
-    lines = output.strip().split("\n")
-    # skip header if present
-    if len(lines) > 0 and "JOBID" in lines[0].upper():
-        lines = lines[1:]
-
-    for line in lines:
-        parts = line.split("|")
-        if len(parts) < 7:
-            continue
-        jobs.append({
-            "job_id": parts[0].strip(),
-            "user": parts[1].strip(),
-            "name": parts[2].strip(),
-            "state": parts[3].strip(),
-            "time": parts[4].strip(),
-            "nodes": parts[5].strip(),
-            "reason": parts[6].strip()
-        })
-    return jsonify({"jobs": jobs})
+    # Served from the shared queue snapshot, refreshed at most every SNAPSHOT_TTL.
+    # ?view=collapsed folds array tasks into one entry per parent with per-state
+    # task ranges; ?view=expanded lists every array task; default is as squeue reports.
+    snapshot = polled_snapshot("queue", collect_queue)
+    view = request.args.get("view", "raw")
+    if view == "raw":
+        return stream_snapshot(snapshot, "jobs")
+    if view not in QUEUE_VIEWS:
+        return jsonify({"error": f"Unknown view '{view}'", "views": ["raw"] + sorted(QUEUE_VIEWS)}), 400
+    jobs = snapshot.derived(("queue_view", view), lambda: QUEUE_VIEWS[view](snapshot.data["jobs"]))
+    return stream_snapshot(snapshot, "jobs", data={"view": view, "jobs": jobs}, variant=view)
 
 
 def parse_memory_value(memory_str):
@@ -292,19 +456,26 @@ def run_command(command, cwd=None):
     Executes a shell command and returns its stdout or an error string.
     Accepts optional `cwd` to run the command in a specific working directory.
     """
+    replayed = cluster_replay.replayed_output(command)
+    if replayed is not None:
+        return replayed
     try:
-        result = subprocess.run(
-            command,
-            capture_output=True,
-            text=True,
-            check=True,
-            timeout=5,  # Short timeout for safety
-            cwd=cwd,
-        )
+        with profiling.phase("subprocess"):
+            result = scheduler.blocking(
+                subprocess.run,
+                command,
+                capture_output=True,
+                text=True,
+                check=True,
+                timeout=5,  # Short timeout for safety
+                cwd=cwd,
+            )
+        cluster_replay.captured(command, 0, result.stdout, "")
         return result.stdout.strip()
     except FileNotFoundError:
         return f"error: command not found: {command[0]}"
     except subprocess.CalledProcessError as e:
+        cluster_replay.captured(command, e.returncode, e.stdout, f"command failed: {e.stderr.strip()}")
         # Return stderr if command fails
         return f"error: command failed: {e.stderr.strip()}"
     except subprocess.TimeoutExpired:
@@ -327,58 +498,12 @@ def parse_memory_value(mem_str):
 def get_node_info():
     """Return a list of node dicts with cpu/memory/partition/state info.
 
-    Uses `sinfo -N -h -o "%N|%t|%C|%m|%e|%P"` and falls back to an empty list on error.
+    Streams `sinfo -N -h -o "%N|%t|%C|%m|%e|%P"` and falls back to an empty list on error.
     """
     try:
-        out = run_command(["sinfo", "-N", "-h", "-o", "%N|%t|%C|%m|%e|%P"])
-        if not out or "error" in out.lower():
-            return []
-
-        nodes = []
-        for line in [ln for ln in out.strip().splitlines() if ln.strip()]:
-            parts = line.split("|")
-            if len(parts) < 6:
-                continue
-            name, state, cpu_field, total_mem_str, free_mem_str, partition = [p.strip() for p in parts[:6]]
-            # CPU format allocated/idle/other/total
-            cpu_parts = cpu_field.split('/')
-            try:
-                if len(cpu_parts) == 4:
-                    cpus_allocated = int(cpu_parts[0])
-                    cpus_idle = int(cpu_parts[1])
-                    cpus_total = int(cpu_parts[3])
-                else:
-                    cpus_allocated = cpus_idle = cpus_total = 0
-            except Exception:
-                cpus_allocated = cpus_idle = cpus_total = 0
-
-            try:
-                total_mem_mb = parse_memory_value(total_mem_str)
-            except Exception:
-                total_mem_mb = 0
-            try:
-                free_mem_mb = parse_memory_value(free_mem_str)
-            except Exception:
-                free_mem_mb = 0
-
-            used_mem_mb = 0
-            if total_mem_mb > 0:
-                if not any(s in state for s in ("down", "drain", "fail")):
-                    used_mem_mb = max(0, total_mem_mb - free_mem_mb)
-
-            nodes.append({
-                'name': name,
-                'state': state,
-                'partition': partition,
-                'cpus_allocated': cpus_allocated,
-                'cpus_idle': cpus_idle,
-                'cpus_total': cpus_total,
-                'memory_total_mb': total_mem_mb,
-                'memory_free_mb': free_mem_mb,
-                'memory_used_mb': used_mem_mb
-            })
-
-        return nodes
+        return list(slurm_parse.iter_nodes(
+            slurm_parse.iter_command_lines(["sinfo", "-N", "-h", "-o", slurm_parse.NODE_FORMAT])
+        ))
     except Exception as e:
         print(f"get_node_info error: {e}")
         return []
@@ -418,17 +543,105 @@ def get_partition_info():
         print(f"get_partition_info error: {e}")
         return []
 
+
+def collect_resources():
+    """Build the cluster resource summary from sinfo (raises on failure).
+
+    Returns (cluster_stats, digest) for the snapshot cache.
+    """
+    debug_info = {}  # Store command diagnostics for debugging
+    digest = hashlib.sha1()
+
+    # Get node information with detailed CPU, memory, and state,
+    # parsed record by record as sinfo produces it (-h skips the header)
+    node_lines = slurm_parse.iter_command_lines([
+        "sinfo",
+        "-N",       # Node-oriented view
+        "-h",       # Skip header
+        "-o",       # Format
+        slurm_parse.NODE_FORMAT  # name|state|CPUs(A/I/O/T)|memory|free_mem|partition
+    ])
+
+    nodes = []
+    total_cpus = total_allocated_cpus = 0
+    total_memory_mb = total_allocated_memory_mb = 0
+    partitions = {}
+
+    for node in slurm_parse.iter_nodes(node_lines, digest):
+        state = node["state"]
+        partition = node["partition"]
+
+        # Update totals
+        total_cpus += node["cpus_total"]
+        total_allocated_cpus += node["cpus_allocated"]
+        total_memory_mb += node["memory_total_mb"]
+        total_allocated_memory_mb += node["memory_used_mb"]
+
+        # Track partition statistics
+        if partition not in partitions:
+            partitions[partition] = {
+                "name": partition,
+                "total_nodes": 0,
+                "allocated_nodes": 0,
+                "total_cpus": 0,
+                "allocated_cpus": 0,
+                "total_memory_mb": 0,
+                "allocated_memory_mb": 0
+            }
+
+        p_stats = partitions[partition]
+        p_stats["total_nodes"] += 1
+        if state.startswith(("alloc", "mix")):
+            p_stats["allocated_nodes"] += 1
+        p_stats["total_cpus"] += node["cpus_total"]
+        p_stats["allocated_cpus"] += node["cpus_allocated"]
+        p_stats["total_memory_mb"] += node["memory_total_mb"]
+        p_stats["allocated_memory_mb"] += node["memory_used_mb"]
+
+        nodes.append(node)
+
+    if not nodes:
+        raise Exception("Got empty node information from sinfo")
+    debug_info["node_lines"] = len(nodes)
+
+    # Get GPU information if available
+    try:
+        gpu_nodes = dict(slurm_parse.iter_gres(
+            slurm_parse.iter_command_lines(["sinfo", "-N", "-h", "-o", slurm_parse.GRES_FORMAT]),
+            digest,
+        ))
+    except slurm_parse.SlurmCommandError as e:
+        print(f"GPU information unavailable: {e}")
+        gpu_nodes = {}
+    debug_info["gpu_nodes"] = len(gpu_nodes)
+
+    # Combine all information
+    cluster_stats = {
+        "total_nodes": len(nodes),
+        "allocated_nodes": sum(1 for n in nodes if n["state"].startswith(("alloc", "mix"))),
+        "total_cpus": total_cpus,
+        "allocated_cpus": total_allocated_cpus,
+        "total_memory_mb": total_memory_mb,
+        "allocated_memory_mb": total_allocated_memory_mb,
+        "partitions": list(partitions.values()),
+        "nodes": nodes,
+        "gpu_nodes": gpu_nodes
+    }
+    
+    # Attach parse counts for debugging (raw output is no longer buffered)
+    cluster_stats["debug"] = debug_info
+
+    return cluster_stats, digest.hexdigest()
+
+
 @app.route("/api/resources", methods=["GET"])
+@rate_limited("read")
 def get_resources():
     """Get comprehensive cluster resource information using sinfo"""
-    raw_node_output = ""
-    raw_gpu_output = ""
+    debug_info = {}
     try:
-        debug_info = {}  # Store command outputs for debugging
-        
-        # Check if sinfo is available
-        sinfo_check = run_command(["which", "sinfo"])
-        if "error" in sinfo_check or not sinfo_check:
+        # Check if sinfo is available (cached probe, no fork)
+        if not capabilities.available("sinfo"):
             print("SLURM sinfo command not found in PATH")
             debug_info["error"] = "sinfo not found in PATH"
             debug_info["path"] = os.environ.get("PATH", "")
@@ -446,153 +659,15 @@ def get_resources():
                 "gpu_nodes": {}
             })
     
-        # Get node information with detailed CPU, memory, and state
-        # -h skips the header line
-        node_output = run_command([
-            "sinfo",
-            "-N",       # Node-oriented view
-            "-h",       # Skip header
-            "-o",       # Format
-            "%N|%t|%C|%m|%e|%P" # name|state|CPUs(A/I/O/T)|memory|free_mem|partition
-        ])
-
-        raw_node_output = node_output # Keep raw output for debugging
-
-        if "error" in node_output:
-            raise Exception(f"Failed to get node information: {node_output}")
-        if not node_output:
-            raise Exception("Got empty node information from sinfo")
-
-        nodes = []
-        total_cpus = total_allocated_cpus = 0
-        total_memory_mb = total_allocated_memory_mb = 0
-        partitions = {}
-
-        lines = [line for line in node_output.strip().split("\n") if line.strip()]
-        
-        # Loop is now correctly inside the try block
-        for line in lines:
-            parts = line.split("|")
-            if len(parts) < 6:
-                continue
-                
-            # Unpack just the first 6 parts, ignoring any extra
-            # (like the empty string from a trailing pipe)
-            name, state, cpu_field, total_mem_str, free_mem_str, partition = [p.strip() for p in parts[:6]]
-            
-            # Parse CPU information (format: allocated/idle/other/total)
-            cpu_parts = cpu_field.split("/")
-            if len(cpu_parts) == 4:
-                cpus_allocated = int(cpu_parts[0])
-                cpus_idle = int(cpu_parts[1])
-                cpus_total = int(cpu_parts[3])
-            else:
-                cpus_allocated = cpus_idle = cpus_total = 0
-                
-            # Parse memory values (sinfo reports in MB)
-            total_mem_mb = parse_memory_value(total_mem_str)
-            free_mem_mb = parse_memory_value(free_mem_str)
-            
-            # Calculate used memory
-            used_mem_mb = 0
-            if total_mem_mb > 0:
-                # If node is down, free_mem might be 'N/A' (parsed as 0)
-                # Only calculate used mem if state is not down/drained
-                if not any(s in state for s in ("down", "drain", "fail")):
-                    used_mem_mb = total_mem_mb - free_mem_mb
-                elif "alloc" in state or "mix" in state:
-                    # If it's allocated but free_mem is 0 (e.g., 'N/A'),
-                    # we can assume it's fully used.
-                    used_mem_mb = total_mem_mb
-
-            # Clamp used memory between 0 and total
-            used_mem_mb = max(0, min(used_mem_mb, total_mem_mb))
-            
-            # Update totals
-            total_cpus += cpus_total
-            total_allocated_cpus += cpus_allocated
-            total_memory_mb += total_mem_mb
-            total_allocated_memory_mb += used_mem_mb
-            
-            # Track partition statistics
-            if partition not in partitions:
-                partitions[partition] = {
-                    "name": partition,
-                    "total_nodes": 0,
-                    "allocated_nodes": 0,
-                    "total_cpus": 0,
-                    "allocated_cpus": 0,
-                    "total_memory_mb": 0,
-                    "allocated_memory_mb": 0
-                }
-            
-            p_stats = partitions[partition]
-            p_stats["total_nodes"] += 1
-            if state.startswith(("alloc", "mix")):
-                p_stats["allocated_nodes"] += 1
-            p_stats["total_cpus"] += cpus_total
-            p_stats["allocated_cpus"] += cpus_allocated
-            p_stats["total_memory_mb"] += total_mem_mb
-            p_stats["allocated_memory_mb"] += used_mem_mb
-            
-            nodes.append({
-                "name": name,
-                "state": state,
-                "partition": partition,
-                "cpus_allocated": cpus_allocated,
-                "cpus_idle": cpus_idle,
-                "cpus_total": cpus_total,
-                "memory_total_mb": total_mem_mb,
-                "memory_free_mb": free_mem_mb,
-                "memory_used_mb": used_mem_mb
-            })
-    
-        # Get GPU information if available
-        gpu_nodes = {}
-        gpu_output = run_command(["sinfo", "-N", "-h", "-o", "%N|%G"])
-        # Assign to raw_gpu_output AFTER the command is run
-        raw_gpu_output = gpu_output
-        
-        if "error" not in gpu_output and gpu_output:
-            lines = gpu_output.strip().split("\n")
-            if len(lines) > 0:
-                for line in lines:
-                    parts = line.split("|")
-                    if len(parts) == 2:
-                        node, gpu = parts[0].strip(), parts[1].strip()
-                        if gpu not in ('N/A', '(null)', ''):
-                            gpu_nodes[node] = gpu
-    
-        # Combine all information
-        cluster_stats = {
-            "total_nodes": len(nodes),
-            "allocated_nodes": sum(1 for n in nodes if n["state"].startswith(("alloc", "mix"))),
-            "total_cpus": total_cpus,
-            "allocated_cpus": total_allocated_cpus,
-            "total_memory_mb": total_memory_mb,
-            "allocated_memory_mb": total_allocated_memory_mb,
-            "partitions": list(partitions.values()),
-            "nodes": nodes,
-            "gpu_nodes": gpu_nodes
-        }
-        
-        # Attach raw outputs for debugging
-        cluster_stats["debug"] = {
-            "raw_node_output": raw_node_output,
-            "raw_gpu_output": raw_gpu_output
-        }
-        
-        return jsonify(cluster_stats)
+        snapshot = polled_snapshot("resources", collect_resources)
+        return stream_snapshot(snapshot, "nodes")
     
     # This is the corrected except block
     except Exception as e:
         print(f"Error in get_resources: {str(e)}")
         return jsonify({
             "error": str(e),
-            "debug": {
-                "raw_node_output": raw_node_output,
-                "raw_gpu_output": raw_gpu_output
-            },
+            "debug": debug_info,
             "total_nodes": 0,
             "allocated_nodes": 0,
             "total_cpus": 0,
@@ -769,7 +844,296 @@ def get_usage():
     return get_resources()
 
 
+def _start_history_loop():
+    """Start the background collectors (history database, fairshare cache) once."""
+    if app.history_started:
+        return
+    app.history_started = True
+    load_jobs = lambda: snapshots.get("queue", collect_queue).data.get("jobs", [])
+    tasks = [
+        (wait_predict.DEPTH_SAMPLE_INTERVAL, "queue depth", lambda: wait_predict.sample_depth(load_jobs())),
+        (wait_predict.INGEST_INTERVAL, "new job waits", wait_predict.ingest),
+        (wait_predict.INGEST_INTERVAL, "new job efficiency records", efficiency.ingest),
+        (fairshare.FAIRSHARE_INTERVAL, "fairshare refresh", _refresh_fairshare),
+        (86400, "prune", history.prune),
+        (86400, "prune efficiency records", efficiency.prune),
+    ]
+    # collectors are refresh work: they queue behind terminals and submissions
+    socketio.start_background_task(history.run_loop, socketio, [
+        (interval, name, functools.partial(scheduler.run, "refresh", fn)) for interval, name, fn in tasks
+    ])
+
+
+def _start_capabilities_probe():
+    """Probe Slurm tool paths/version in the background once serving starts."""
+    if app.capabilities_started:
+        return
+    app.capabilities_started = True
+
+    socketio.start_background_task(capabilities.run_loop, socketio)
+
+
+def _when_listening(port, then):
+    """Call `then()` in the background once the server accepts connections on `port`.
+
+    Background work started before socketio.run() would run its first
+    (blocking) pass before the listening socket exists; this also records
+    the real time to listening in startup_timing.
+    """
+    def wait():
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=1).close()
+                break
+            except OSError:
+                socketio.sleep(0.05)
+        app.startup_timing["listening_s"] = round(time.monotonic() - _import_started, 3)
+        print(f"Listening after {app.startup_timing['listening_s']:.3f}s")
+        then()
+
+    socketio.start_background_task(wait)
+
+
+def _start_background_work():
+    _start_capabilities_probe()
+    _start_history_loop()
+
+
+@app.route("/api/capabilities", methods=["GET"])
+def get_capabilities():
+    """Slurm tools found on PATH, the Slurm version and backend startup timings"""
+    _start_capabilities_probe()
+    caps = capabilities.get()
+    return jsonify({
+        "tools": caps["tools"],
+        "version": caps["version"],
+        "probed_at": caps["probed_at"],
+        "startup": app.startup_timing,
+    })
+
+
+def _default_partition():
+    resources = snapshots.peek("resources")
+    for node in (resources.data.get("nodes", []) if resources else []):
+        if node["partition"].endswith("*"):
+            return node["partition"].rstrip("*")
+    return None
+
+
+def _request_directives():
+    """sbatch-style directives describing the job shape in this request.
+
+    Either a batch script (JSON {"script": ...}) or partition/nodes/ntasks/
+    cpus/mem/gpus/time parameters in the query string or JSON body.
+    """
+    if request.method == "POST":
+        params = request.get_json(silent=True) or {}
+    else:
+        params = request.args
+    if params.get("script"):
+        return sbatch_validate.parse_directives(params["script"])
+    options = {"partition": "--partition", "nodes": "--nodes", "ntasks": "--ntasks",
+               "cpus": "--cpus-per-task", "mem": "--mem", "gpus": "--gpus-per-node",
+               "time": "--time"}
+    return {option: str(params[key]) for key, option in options.items()
+            if params.get(key) not in (None, "")}
+
+
+@app.route("/api/predict/wait", methods=["GET", "POST"])
+@rate_limited("read")
+@scheduled("refresh", poll=True)
+@coalesced
+def predict_wait():
+    """Expected queue wait for a job shape before it is submitted.
+
+    The shape comes from a script's #SBATCH directives or from parameters
+    (see _request_directives). `time` is a Slurm time string or minutes;
+    `mem` is per node (e.g. "16G", default MB).
+    """
+    _start_history_loop()
+    directives = _request_directives()
+    partition, cpus, mem_mb, time_limit = wait_predict.request_shape(directives, _default_partition())
+
+    snapshot = snapshots.get("queue", collect_queue)
+    depth = snapshot.derived(("pending_depth",), lambda: wait_predict.pending_depth(snapshot.data["jobs"]))
+    result = wait_predict.predict(partition, cpus, mem_mb, time_limit, depth.get(partition, 0))
+    result["shape"] = {"partition": partition, "cpus": cpus, "mem_mb": mem_mb, "time_limit_min": time_limit}
+    return jsonify(result)
+
+
+@app.route("/api/fit", methods=["GET", "POST"])
+@rate_limited("read")
+@scheduled("refresh", poll=True)
+@coalesced
+def fit_request():
+    """Partitions and node sets that can run a job shape right now.
+
+    Same shape parameters as /api/predict/wait; `partition` restricts the
+    check to one partition. Evaluated against the cached resources snapshot.
+    """
+    directives = _request_directives()
+    try:
+        snapshot = snapshots.get("resources", collect_resources)
+    except Exception as e:
+        return jsonify({"error": f"Cluster state unavailable: {e}"}), 503
+    index = snapshot.derived(("fit_index",), lambda: fit.build_index(snapshot.data))
+    partition = directives.pop("--partition", None)
+    partition = partition.split(",")[0] if partition else None
+    results = fit.fit(index, directives, partition)
+    return jsonify({
+        "version": snapshot.version,
+        "fits_now": any(r["fits_now"] for r in results),
+        "partitions": results,
+    })
+
+
+@app.route("/api/predict/jobs", methods=["GET"])
+@rate_limited("read")
+@scheduled("refresh", poll=True)
+@coalesced
+def predict_job_starts():
+    """Expected start times of pending jobs (?user= and/or ?job_ids=a,b)."""
+    _start_history_loop()
+    snapshot = snapshots.get("queue", collect_queue)
+    jobs = snapshot.data["jobs"]
+    user = request.args.get("user")
+    job_ids = {j for j in request.args.get("job_ids", "").split(",") if j}
+    if user:
+        jobs = [j for j in jobs if j["user"] == user]
+    if job_ids:
+        jobs = [j for j in jobs if j["job_id"] in job_ids or watch.array_parent(j["job_id"]) in job_ids]
+    depth = snapshot.derived(("pending_depth",), lambda: wait_predict.pending_depth(snapshot.data["jobs"]))
+    return jsonify({"version": snapshot.version, "jobs": wait_predict.job_starts(jobs, depth)})
+
+
+@app.route("/api/efficiency/jobs", methods=["GET"])
+@rate_limited("read")
+@scheduled("refresh", poll=True)
+@coalesced
+def efficiency_jobs():
+    """CPU/memory efficiency of finished jobs (and running ones with ?running=1).
+
+    Filters: user, account, since (epoch seconds), limit.
+    """
+    _start_history_loop()
+    user = request.args.get("user")
+    account = request.args.get("account")
+    try:
+        since = float(request.args.get("since", 0))
+        limit = min(int(request.args.get("limit", 100)), 5000)
+    except ValueError:
+        return jsonify({"error": "since and limit must be numbers"}), 400
+    result = {"jobs": efficiency.finished_jobs(user, account, since, limit)}
+    if request.args.get("running") in ("1", "true"):
+        jobs = snapshots.get("queue", collect_queue).data["jobs"]
+        if user:
+            jobs = [j for j in jobs if j["user"] == user]
+        result["running"] = efficiency.live(jobs)
+    return jsonify(result)
+
+
+@app.route("/api/efficiency/report", methods=["GET"])
+@rate_limited("read")
+@scheduled("refresh", poll=True)
+@coalesced
+def efficiency_report():
+    """Usage/efficiency rollups for chargeback.
+
+    ?group=user|account|user_account, ?since=/&until=YYYY-MM-DD, optional
+    user/account filters; ?format=csv returns a CSV download.
+    """
+    _start_history_loop()
+    group = request.args.get("group", "user")
+    if group not in efficiency.ROLLUP_GROUPS:
+        return jsonify({"error": f"Unknown group '{group}'", "groups": sorted(efficiency.ROLLUP_GROUPS)}), 400
+    rows = efficiency.rollups(group, request.args.get("since"), request.args.get("until"),
+                              request.args.get("user"), request.args.get("account"))
+    if request.args.get("format") == "csv":
+        columns = list(efficiency.ROLLUP_GROUPS[group]) + [
+            "jobs", "cpu_hours_allocated", "cpu_hours_used", "cpu_eff",
+            "mem_gb_hours_requested", "mem_gb_hours_used", "mem_eff"]
+        lines = [",".join(columns)]
+        lines += [",".join("" if r[c] is None else str(r[c]) for c in columns) for r in rows]
+        return Response("\n".join(lines) + "\n", mimetype="text/csv", headers={
+            "Content-Disposition": f"attachment; filename=efficiency-{group}.csv"})
+    return jsonify({"group": group, "rows": rows})
+
+
+def _fairshare_snapshot(ttl=None):
+    # Requests accept data twice as old as the refresh interval, so with the
+    # background loop running they never wait for sshare/sreport themselves.
+    ttl = fairshare.FAIRSHARE_INTERVAL * 2 if ttl is None else ttl
+    return polled_snapshot("fairshare", fairshare.collect, ttl=ttl)
+
+
+def _refresh_fairshare():
+    # runs in the history loop, which already holds a refresh slot
+    snapshots.get("fairshare", fairshare.collect, ttl=fairshare.FAIRSHARE_INTERVAL)
+
+
+@app.route("/api/fairshare", methods=["GET"])
+@rate_limited("read")
+def get_fairshare():
+    """Fairshare/usage from the cached sshare + sreport data.
+
+    ?user=<name> returns that user's associations (with their account path);
+    ?account=<name> the subtree below an account; otherwise the whole tree.
+    """
+    _start_history_loop()
+    try:
+        snapshot = _fairshare_snapshot()
+    except Exception as e:
+        return jsonify({"error": f"Fairshare data unavailable: {e}"}), 503
+    head = {"updated_at": snapshot.data["updated_at"], "period": snapshot.data["period"]}
+
+    user = (request.args.get("user") or "").strip()
+    account = (request.args.get("account") or "").strip()
+    if user:
+        if user not in snapshot.data["users"]:
+            return jsonify({"error": f"Unknown user '{user}'"}), 404
+        data = dict(head, user=user, associations=snapshot.data["users"][user])
+        return stream_snapshot(snapshot, "associations", data=data,
+                               variant="user-" + hashlib.sha1(user.encode()).hexdigest()[:12])
+    if account:
+        accounts = snapshot.derived(("fairshare_subtree", account),
+                                    lambda: fairshare.subtree(snapshot.data["accounts"], account))
+        if not accounts:
+            return jsonify({"error": f"Unknown account '{account}'"}), 404
+        return stream_snapshot(snapshot, "accounts", data=dict(head, accounts=accounts),
+                               variant="account-" + hashlib.sha1(account.encode()).hexdigest()[:12])
+    return stream_snapshot(snapshot, "accounts", data=dict(head, accounts=snapshot.data["accounts"]),
+                           variant="tree")
+
+
+@app.route("/api/nodes/detail", methods=["GET"])
+@rate_limited("read")
+@scheduled("refresh", poll=True)
+@coalesced
+def get_node_detail():
+    """Live telemetry (CPU load, allocated/real memory, GRES in use) for ?names=a,b,c.
+
+    All names are fetched with one batched `scontrol show node` call and
+    cached for a few seconds; subscribe with the `node_detail_subscribe`
+    socket event to have updates pushed instead of polling.
+    """
+    names = [n.strip() for n in request.args.get("names", "").split(",") if n.strip()]
+    if not names:
+        return jsonify({"error": "names is required"}), 400
+    if len(names) > node_detail.MAX_NODES or not node_detail.valid_names(names):
+        return jsonify({"error": f"Provide up to {node_detail.MAX_NODES} valid node names"}), 400
+    try:
+        details = node_detail.get(names)
+    except slurm_parse.SlurmCommandError as e:
+        return jsonify({"error": f"scontrol failed: {e}"}), 502
+    return jsonify({
+        "nodes": [details[n] for n in names if n in details],
+        "unknown": [n for n in names if n not in details],
+    })
+
+
 @app.route("/api/submit/sbatch", methods=["POST"])
+@rate_limited("submit")
+@scheduled("control")
 def submit_sbatch():
     """Handle sbatch script submission"""
     print("Received sbatch submission request")
@@ -789,7 +1153,7 @@ def submit_sbatch():
         return jsonify({"error": "Username is required in form data."}), 400
 
     username = username.strip()
-    if '/' in username or '\\' in username:
+    if not script_store.valid_user(username):
         print(f"Invalid username: {username}")
         return jsonify({"error": "Invalid username."}), 400
 
@@ -805,17 +1169,11 @@ def submit_sbatch():
 
     print(f"Received file: {file.filename} from user: {username}")
 
-    # Create user directory in files/<username>/
-    base_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'files')
-    user_dir = os.path.join(base_dir, username)
-    try:
-        os.makedirs(user_dir, exist_ok=True)
-    except Exception as e:
-        print(f"Failed to create user directory {user_dir}: {e}")
-        return jsonify({"error": f"Failed to create user directory: {e}"}), 500
-
-    # Save uploaded file in user directory
-    script_path = os.path.join(user_dir, file.filename)
+    # Scripts are stored content-addressed; files/<username>/<filename>
+    # becomes a link to the stored blob
+    filename = os.path.basename(file.filename.replace('\\', '/'))
+    if not filename or filename.startswith('.'):
+        return jsonify({"error": "Invalid filename."}), 400
     try:
         content = file.read().decode('utf-8')
     except Exception as e:
@@ -835,8 +1193,8 @@ def submit_sbatch():
     if not any(line.strip().startswith('#SBATCH') for line in content.splitlines()):
         slurm_directives.extend([
             '#SBATCH --job-name=default_job',
-            f'#SBATCH --output={file.filename}-%j.out',  # output in user dir
-            f'#SBATCH --error={file.filename}-%j.err',
+            f'#SBATCH --output={filename}-%j.out',  # output in user dir
+            f'#SBATCH --error={filename}-%j.err',
             '#SBATCH --time=01:00:00',
             '#SBATCH --ntasks=1'
         ])
@@ -845,25 +1203,61 @@ def submit_sbatch():
 
     print(f"Processed script content:\n{content}")
 
-    with open(script_path, 'w') as f:
-        f.write(content)
+    try:
+        sha256, script_path, created = script_store.put_blob(content)
+        script_store.link_script(username, filename, sha256)
+    except Exception as e:
+        print(f"Failed to store script for {username}: {e}")
+        return jsonify({"error": f"Failed to store script: {e}"}), 500
+    print(f"Stored script {filename} as {sha256} ({'new' if created else 'deduplicated'})")
+
+    return run_sbatch(username, filename, sha256, content)
 
-    # Make script executable
-    os.chmod(script_path, 0o755)
 
-    # First check if sbatch is available
-    sbatch_check = run_command(["which", "sbatch"])
-    print(f"sbatch location: {sbatch_check}")
+def _has_job_name(content):
+    """True if the script sets its own job name via #SBATCH."""
+    for line in content.splitlines():
+        line = line.strip()
+        if line.startswith('#SBATCH') and ('--job-name' in line or ' -J' in line):
+            return True
+    return False
 
-    # Check available resources first
-    sinfo_cmd = ["sinfo", "-h", "-o", "%C"]  # Get cluster resource info
-    sinfo_output = run_command(sinfo_cmd)
-    print(f"Current cluster resources: {sinfo_output}")
 
-    # Verify script is valid and check resource availability
-    verify_cmd = ["sbatch", "--test-only", script_path]
-    print(f"Verifying script: {' '.join(verify_cmd)} (cwd={user_dir})")
-    verify_output = run_command(verify_cmd, cwd=user_dir)
+def run_sbatch(username, filename, sha256, content, resubmit_of=None):
+    """Verify and submit a stored script blob, recording it in the user's manifest."""
+    user_dir = script_store.user_dir(username)
+    script_path = script_store.blob_path(sha256)
+
+    print(f"sbatch location: {capabilities.tool_path('sbatch')}")
+
+    # Reject obviously invalid directives locally, without touching Slurm
+    directives = sbatch_validate.parse_directives(content)
+    resources = snapshots.peek("resources")
+    problems = sbatch_validate.lint(directives, resources.data if resources else None)
+    if problems:
+        print(f"Script rejected by local lint: {problems}")
+        return jsonify({
+            "error": f"Invalid script: {'; '.join(problems)}",
+            "details": {"lint": problems}
+        }), 400
+
+    # Verify script is valid and check resource availability; results are
+    # cached per normalized directives and cluster snapshot version
+    validation_key = sbatch_validate.cache_key(directives, resources.version if resources else 0)
+    verify_output = sbatch_validate.cached_result(validation_key)
+    if verify_output is None:
+        verify_cmd = ["sbatch", "--test-only", script_path]
+        print(f"Verifying script: {' '.join(verify_cmd)} (cwd={user_dir})")
+        # identical scripts validated concurrently share one sbatch call
+        verify_output, shared = ratelimit.coalesce(
+            ("sbatch --test-only", validation_key),
+            lambda: run_command(verify_cmd, cwd=user_dir))
+        if shared:
+            metrics.incr("coalesced_commands_total", command="sbatch --test-only")
+        if not verify_output.startswith(("error: command timed out", "error: unknown")):
+            sbatch_validate.store_result(validation_key, verify_output)
+    else:
+        print("Using cached verification result")
     print(f"Verification output: {verify_output}")
 
     if "error" in verify_output.lower():
@@ -886,11 +1280,15 @@ def submit_sbatch():
             "details": {"verification_output": verify_output}
         }), 400
 
-    # Submit the job from user directory
+    # Submit the job from user directory. The blob's file name is its hash,
+    # so name the job after the uploaded file unless the script names it.
     cmd = ["sbatch", script_path]
+    if not _has_job_name(content):
+        cmd[1:1] = ["--job-name", filename]
     print(f"Running command: {' '.join(cmd)} in {user_dir}")
     output = run_command(cmd, cwd=user_dir)
     print(f"sbatch output: {output}")
+    snapshots.invalidate("queue")
 
     # Try to parse job ID from output
     job_id = None
@@ -901,7 +1299,7 @@ def submit_sbatch():
             print(f"Parsed job ID: {job_id}")
 
             # Output file path (as set above)
-            output_file = os.path.join(user_dir, f"{file.filename}-{job_id}.out")
+            output_file = os.path.join(user_dir, f"{filename}-{job_id}.out")
             print(f"Expected output file: {output_file}")
 
         except Exception as e:
@@ -910,40 +1308,70 @@ def submit_sbatch():
     else:
         print("No job ID found in output")
 
-    # If output file exists, send it as download, else return job info
-    import time
-    wait_time = 0
-    job_output = None
-    # Wait up to 10 seconds for output file (for short jobs)
-    while output_file and wait_time < 10:
-        if os.path.exists(output_file):
-            with open(output_file, 'rb') as f:
-                from flask import send_file
-                return send_file(
-                    output_file,
-                    as_attachment=True,
-                    download_name=os.path.basename(output_file),
-                    mimetype='text/plain'
-                )
-        time.sleep(1)
-        wait_time += 1
-
-    # If not ready, return job info and let frontend poll for download
+    submission = None
+    if job_id:
+        try:
+            submission = script_store.record_submission(username, filename, sha256, job_id, resubmit_of)
+        except Exception as e:
+            print(f"Failed to record submission for {username}: {e}")
+
+    # Don't wait for the output file here: this runs in a control slot on the
+    # hub. The frontend polls for the job and its output instead.
     return jsonify({
         "message": "Job submitted",
         "output": output,
         "job_id": job_id,
         "output_file": os.path.basename(output_file) if output_file else None,
-        "user": username
+        "user": username,
+        "submission_id": submission["id"] if submission else None,
+        "sha256": sha256
     })
 
+
+@app.route("/api/submit/sbatch/resubmit", methods=["POST"])
+@rate_limited("submit")
+@scheduled("control")
+def resubmit_sbatch():
+    """Resubmit a previously stored script by submission id or script hash"""
+    params = request.get_json(silent=True) or {}
+    username = (params.get('username') or '').strip()
+    if not script_store.valid_user(username):
+        return jsonify({"error": "Valid username is required."}), 400
+
+    entry = script_store.find_submission(
+        username, submission_id=params.get('submission_id'), sha256=params.get('sha256'))
+    if entry is None:
+        return jsonify({"error": "Unknown submission"}), 404
+    try:
+        content = script_store.read_blob(entry["sha256"])
+    except FileNotFoundError:
+        return jsonify({"error": "Stored script is missing"}), 410
+
+    print(f"Resubmitting {entry['filename']} ({entry['sha256']}) for {username}")
+    return run_sbatch(username, entry["filename"], entry["sha256"], content, resubmit_of=entry["id"])
+
+
+@app.route("/api/scripts", methods=["GET"])
+@rate_limited("read")
+def list_scripts():
+    """List a user's stored script submissions (newest first)"""
+    username = (request.args.get('username') or '').strip()
+    if not script_store.valid_user(username):
+        return jsonify({"error": "Valid username is required."}), 400
+    submissions = script_store.load_manifest(username)["submissions"]
+    return jsonify({"submissions": list(reversed(submissions))})
+
 @app.route("/api/submit/salloc", methods=["POST"])
+@rate_limited("terminal")
+@scheduled("interactive")
 def submit_salloc():
     """Start an interactive salloc session"""
     try:
         params = request.get_json()
         if not params:
             return jsonify({"error": "No parameters provided"}), 400
+        if not interactive.valid_user(params.get("username")):
+            return jsonify({"error": "Valid username is required."}), 400
             
         # Create terminal session
         master_fd, process = create_terminal_session(params)
@@ -952,8 +1380,11 @@ def submit_salloc():
         session_id = os.urandom(16).hex()
         app.terminal_sessions[session_id] = {
             "fd": master_fd,
-            "process": process
+            "process": process,
+            # job id filled in from salloc's "Granted job allocation" line
+            "allocation": {"user": params.get("username"), "job_id": None, "scan": ""},
         }
+        recorder.start(session_id, user=params.get("username"), command="salloc")
         # process may be a Popen or a dict {'pid': pid}
         try:
             pid_info = process.pid
@@ -969,12 +1400,210 @@ def submit_salloc():
         return jsonify({"error": str(e)}), 500
 
 
+@app.route("/api/interactive/allocations", methods=["GET"])
+@rate_limited("read")
+def list_interactive_allocations():
+    """A user's running interactive allocations that new terminals can attach to"""
+    username = (request.args.get('username') or '').strip()
+    if not interactive.valid_user(username):
+        return jsonify({"error": "Valid username is required."}), 400
+    jobs = polled_snapshot("queue", collect_queue).data["jobs"]
+    return jsonify({"allocations": interactive.for_user(username, jobs)})
+
+
+@app.route("/api/interactive/attach", methods=["POST"])
+@rate_limited("terminal")
+@scheduled("interactive")
+def attach_interactive():
+    """Open another terminal as an srun step inside an existing allocation"""
+    params = request.get_json(silent=True) or {}
+    username = (params.get('username') or '').strip()
+    job_id = str(params.get('job_id') or '')
+    if not interactive.valid_user(username) or not interactive.JOB_ID_RE.match(job_id):
+        return jsonify({"error": "username and a numeric job_id are required"}), 400
+    jobs = snapshots.get("queue", collect_queue).data["jobs"]
+    if interactive.find(username, job_id, jobs) is None:
+        return jsonify({"error": f"No running interactive allocation {job_id} for {username}"}), 404
+
+    try:
+        cmd = interactive.attach_command(job_id, capabilities.get()["version"])
+        print(f"Attaching terminal: {' '.join(cmd)}")
+        master_fd, process = spawn_pty(cmd)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    session_id = os.urandom(16).hex()
+    app.terminal_sessions[session_id] = {
+        "fd": master_fd,
+        "process": process,
+        "allocation": {"user": username, "job_id": job_id},
+    }
+    interactive.register(job_id, username, session_id)
+    recorder.start(session_id, user=username, command=" ".join(cmd))
+    print(f"Session created: {session_id}, fd={master_fd}, pid={process['pid']} in job {job_id}")
+    return jsonify({"message": "Session created", "session_id": session_id, "job_id": job_id})
+
+
 @app.route("/api/cancel/<job_id>", methods=["DELETE"])
+@rate_limited("control")
+@scheduled("control")
 def cancel_job(job_id):
     output = run_command(["scancel", str(job_id)])
+    snapshots.invalidate("queue")
     return jsonify({"result": output})
 
 
+@app.route("/api/jobs/bulk", methods=["POST"])
+@rate_limited("control")
+@scheduled("control")
+def bulk_job_action():
+    """Cancel, hold, release or requeue many jobs with as few Slurm calls as possible.
+
+    Body: {"action": "cancel|hold|release|requeue", "job_ids": [...],
+    "arrays": [parent ids], "filter": {"user", "name", "state", "partition"},
+    "dry_run": bool}. Filters match the current queue snapshot.
+    """
+    params = request.get_json(silent=True) or {}
+    action = params.get("action")
+    if action not in bulk_control.ACTIONS:
+        return jsonify({"error": f"Unknown action '{action}'", "actions": sorted(bulk_control.ACTIONS)}), 400
+    filters = params.get("filter")
+    if filters is not None and not isinstance(filters, dict):
+        return jsonify({"error": "filter must be an object"}), 400
+    try:
+        jobs = snapshots.get("queue", collect_queue).data["jobs"] if filters else None
+        specs = bulk_control.resolve(params.get("job_ids") or [], params.get("arrays") or [], filters, jobs)
+        if not specs:
+            return jsonify({"action": action, "results": [], "commands": 0})
+        if params.get("dry_run"):
+            planned = bulk_control.plan(action, specs)
+            return jsonify({"action": action, "dry_run": True,
+                            "commands": [argv for argv, _ in planned],
+                            "job_ids": [spec for _, batch in planned for spec in batch]})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    print(f"Bulk {action}: {len(specs)} targets")
+    results, commands = bulk_control.execute(action, specs)
+    snapshots.invalidate("queue")
+    failed = sum(1 for r in results if not r["ok"])
+    metrics.incr("bulk_jobs_total", action=action, outcome="ok", value=len(results) - failed)
+    if failed:
+        metrics.incr("bulk_jobs_total", action=action, outcome="failed", value=failed)
+    return jsonify({"action": action, "results": results, "commands": commands,
+                    "succeeded": len(results) - failed, "failed": failed})
+
+
+@app.route("/api/metrics", methods=["GET"])
+def get_metrics():
+    """Request, rate-limit and coalescing counters; Prometheus text with
+    ?format=prometheus or Accept: text/plain."""
+    if request.args.get("format") == "prometheus" or \
+            request.accept_mimetypes.best_match(["application/json", "text/plain"]) == "text/plain":
+        return Response(metrics.prometheus(), mimetype="text/plain; version=0.0.4")
+    return jsonify({
+        "uptime_s": round(time.time() - metrics.STARTED_AT),
+        "rate_limits": {rule: {"count": count, "period_s": period}
+                        for rule, (count, period) in (ratelimit.LIMITS or {}).items()},
+        "counters": metrics.snapshot(),
+        "scheduler": scheduler.stats(),
+    })
+
+
+def _start_recorder():
+    """Start the background writer for terminal recordings once."""
+    if app.recorder_started:
+        return
+    app.recorder_started = True
+    socketio.start_background_task(recorder.run_loop, socketio)
+
+
+@app.route("/api/recordings", methods=["GET"])
+@admin_required
+def list_recordings():
+    """Recorded terminal sessions (requires SLURM_GUI_RECORD_DIR)"""
+    return jsonify({"enabled": recorder.enabled(), "recordings": recorder.list_recordings()})
+
+
+@app.route("/api/recordings/<session_id>", methods=["GET"])
+@admin_required
+def replay_recording(session_id):
+    """Replay a recording as asciicast v2, optionally from ?from=<s> for ?duration=<s>.
+
+    ?index=1 returns the keyframe times instead, for building a seek bar.
+    """
+    if not recorder.enabled() or not recorder.SESSION_ID_RE.match(session_id):
+        return jsonify({"error": "Unknown recording"}), 404
+    try:
+        index = recorder.load_index(session_id)
+    except FileNotFoundError:
+        return jsonify({"error": "Unknown recording"}), 404
+    if request.args.get("index"):
+        return jsonify({"session_id": session_id, "keyframes": [t for t, _ in index]})
+    try:
+        start = max(0.0, float(request.args.get("from", 0)))
+        duration = request.args.get("duration")
+        duration = float(duration) if duration else None
+    except ValueError:
+        return jsonify({"error": "from and duration must be numbers of seconds"}), 400
+
+    body = (line.encode() for line in recorder.replay(session_id, start, duration))
+    headers = {"Content-Disposition": f'inline; filename="{session_id}.cast"'}
+    encoding = streaming.choose_encoding(request.headers.get("Accept-Encoding"))
+    if encoding:
+        body = streaming.iter_compressed(body, encoding)
+        headers["Content-Encoding"] = encoding
+    return Response(body, mimetype="application/x-asciicast", headers=headers)
+
+
+@app.route("/api/profile", methods=["GET"])
+@admin_required
+def profile_status():
+    """State of the sampling profiler and of Server-Timing headers"""
+    return jsonify(profiling.status())
+
+
+@app.route("/api/profile", methods=["POST"])
+@admin_required
+def profile_start():
+    """Sample all stacks for a while.
+
+    Body: {"seconds": 30, "interval_ms": 10, "greenlets": false,
+    "timing": bool}. `timing` turns Server-Timing headers on or off, alone
+    or together with a sampling run ("seconds").
+    """
+    params = request.get_json(silent=True) or {}
+    if "timing" in params:
+        profiling.set_timing(params["timing"])
+        if "seconds" not in params:
+            return jsonify(profiling.status())
+    try:
+        seconds = float(params.get("seconds", 30))
+        interval = float(params.get("interval_ms", 10)) / 1000
+    except (TypeError, ValueError):
+        return jsonify({"error": "seconds and interval_ms must be numbers"}), 400
+    if not profiling.start(seconds, interval, params.get("greenlets", False)):
+        return jsonify({"error": "A profile is already running", **profiling.status()}), 409
+    print(f"Profiling for {seconds}s")
+    return jsonify(profiling.status())
+
+
+@app.route("/api/profile", methods=["DELETE"])
+@admin_required
+def profile_stop():
+    profiling.stop()
+    return jsonify(profiling.status())
+
+
+@app.route("/api/profile/stacks", methods=["GET"])
+@admin_required
+def profile_stacks():
+    """The running or last profile as collapsed stacks (flamegraph.pl, speedscope)"""
+    started_at = profiling.status()["started_at"]
+    name = time.strftime("%Y%m%d-%H%M%S", time.localtime(started_at)) if started_at else "empty"
+    return Response(profiling.collapsed(), mimetype="text/plain",
+                    headers={"Content-Disposition": f'attachment; filename="profile-{name}.folded"'})
+
+
 @app.route('/debug/sessions', methods=['GET'])
 def debug_sessions():
     # Return a lightweight view of current sessions and session->sid mapping
@@ -1006,9 +1635,88 @@ def connect():
 def disconnect():
     """Handle WebSocket disconnections"""
     print("Client disconnected")
+    watch.drop(request.sid)
+    node_detail.unsubscribe(request.sid)
     # Cleanup any associated terminal session
 
 
+def _watch_keys(data):
+    """Extract (users, job_ids, arrays) lists from a watch event payload."""
+    def as_list(*keys):
+        values = []
+        for key in keys:
+            value = data.get(key)
+            if isinstance(value, (list, tuple)):
+                values.extend(str(v) for v in value)
+            elif value not in (None, ""):
+                values.append(str(value))
+        return values
+    return as_list('user', 'users'), as_list('job_id', 'job_ids'), as_list('array_parent', 'array_parents')
+
+
+@socketio.on('watch_subscribe')
+def handle_watch_subscribe(data):
+    """Subscribe this client to state transitions of a user, job ids or array parents."""
+    users, job_ids, arrays = _watch_keys(data or {})
+    if not (users or job_ids or arrays):
+        emit('watch_error', {'error': 'Provide user, job_ids or array_parents'})
+        return
+    sid = request.sid
+    subscription = watch.subscribe(sid, users, job_ids, arrays)
+
+    # Start the shared diff loop on first use
+    if not app.watch_started:
+        app.watch_started = True
+        socketio.start_background_task(
+            watch.run_loop, socketio, lambda: snapshots.get("queue", collect_queue))
+
+    # Send the current state of matching jobs so the client has a baseline
+    snapshot = snapshots.get("queue", collect_queue)
+    current = [
+        {"job_id": j["job_id"], "user": j["user"], "name": j["name"],
+         "state": watch.STATE_NAMES.get(j["state"], j["state"])}
+        for j in snapshot.data.get("jobs", [])
+        if watch.matches(j["job_id"], j["user"], sid)
+    ]
+    emit('watch_subscribed', {
+        'subscription': subscription,
+        'version': snapshot.version,
+        'jobs': current,
+    })
+
+
+@socketio.on('watch_unsubscribe')
+def handle_watch_unsubscribe(data):
+    """Remove watch interests; an empty payload removes all of them."""
+    users, job_ids, arrays = _watch_keys(data or {})
+    emit('watch_subscribed', {'subscription': watch.unsubscribe(request.sid, users, job_ids, arrays)})
+
+
+@socketio.on('node_detail_subscribe')
+def handle_node_detail_subscribe(data):
+    """Stream telemetry updates for the given nodes to this client."""
+    names = [str(n).strip() for n in (data or {}).get('names', []) if str(n).strip()]
+    if not names or not node_detail.valid_names(names):
+        emit('node_detail_error', {'error': 'Provide a list of valid node names'})
+        return
+    try:
+        subscribed = node_detail.subscribe(request.sid, names)
+    except ValueError as e:
+        emit('node_detail_error', {'error': str(e)})
+        return
+    if not app.node_detail_started:
+        app.node_detail_started = True
+        socketio.start_background_task(node_detail.run_loop, socketio)
+    emit('node_detail_subscribed', {'names': subscribed})
+
+
+@socketio.on('node_detail_unsubscribe')
+def handle_node_detail_unsubscribe(data):
+    """Stop streaming the given nodes (all of them if none are given)."""
+    names = [str(n).strip() for n in (data or {}).get('names', [])]
+    emit('node_detail_subscribed', {'names': node_detail.unsubscribe(request.sid, names)})
+
+
 @socketio.on('terminal_connect')
 def handle_terminal_connect(data):
     """Associate a Socket.IO connection with a terminal session_id and start output reader."""
@@ -1051,6 +1759,9 @@ def handle_terminal_input(data):
     try:
         print(f"Received terminal input for session {session_id}: {repr(input_data)}")
         os.write(session['fd'], input_data.encode())
+        recording = recorder.get(session_id)
+        if recording:
+            recording.input(input_data)
     except Exception as e:
         sid = request.sid
         if sid:
@@ -1067,6 +1778,9 @@ def read_terminal_output(session_id):
     # emit only to the connected websocket client for this session, if known
     sid = app.session_sids.get(session_id)
     proc = session.get('process')
+    recording = recorder.get(session_id)
+    if recording:
+        _start_recorder()
     while True:
         # If the process has exited, notify client and stop
         try:
@@ -1114,46 +1828,59 @@ def read_terminal_output(session_id):
                     print(f"Decode error for session {session_id}: {e}")
                     text = repr(data)
 
+                allocation = session.get('allocation')
+                if allocation and allocation['job_id'] is None:
+                    # the line may arrive split across reads
+                    allocation['scan'] = (allocation['scan'] + text)[-256:]
+                    job_id = interactive.granted_job(allocation['scan'])
+                    if job_id:
+                        allocation['job_id'] = job_id
+                        interactive.register(job_id, allocation['user'], session_id, owner=True)
+
+                if recording:
+                    recording.output(text)
+
                 payload = {
                     'session_id': session_id,
                     'output': text
                 }
                 print(f"Emitting terminal output for session {session_id}: {repr(payload['output'])}")
-                if sid:
-                    socketio.emit('terminal_output', payload, to=sid)
-                else:
-                    socketio.emit('terminal_output', payload)
+                with profiling.phase("emit"):
+                    if sid:
+                        socketio.emit('terminal_output', payload, to=sid)
+                    else:
+                        socketio.emit('terminal_output', payload)
         except Exception as e:
             print(f"Unexpected error in read_terminal_output for {session_id}: {e}")
             break
+    interactive.session_closed(session_id)
+    recorder.stop(session_id)
 
 # Initialize terminal sessions storage
 app.terminal_sessions = {}
 app.session_sids = {}
+app.watch_started = False
+app.history_started = False
+app.node_detail_started = False
+app.capabilities_started = False
+app.recorder_started = False
+app.startup_timing = {"import_s": round(_imported_at - _import_started, 3)}
 
 if __name__ == '__main__':
     try:
-        # Test SLURM commands availability
-        print("Testing SLURM commands...")
-        sbatch_path = run_command(["which", "sbatch"])
-        if not sbatch_path:
-            print("WARNING: sbatch not found in PATH")
-        else:
-            print(f"sbatch found at: {sbatch_path}")
-            
-        salloc_path = run_command(["which", "salloc"])
-        if not salloc_path:
-            print("WARNING: salloc not found in PATH")
-        else:
-            print(f"salloc found at: {salloc_path}")
-            
-        sinfo_test = run_command(["sinfo", "--version"])
-        print(f"sinfo version check: {sinfo_test}")
-        
-        print("\nStarting server on http://0.0.0.0:8001")
-        socketio.run(app, host='0.0.0.0', port=8001, debug=True)
+        # Slurm tools are probed and the history collectors (sacct backfill,
+        # sshare/sreport) start only once the socket is listening (see
+        # /api/capabilities), so restarts come back quickly
+        port = 8001
+        _when_listening(port, _start_background_work)
+
+        debug = os.environ.get("SLURM_GUI_DEBUG", "1") == "1"
+        # the reloader re-imports everything in a child process; opt in
+        use_reloader = os.environ.get("SLURM_GUI_RELOAD", "0") == "1"
+        print(f"Imports took {app.startup_timing['import_s']:.3f}s")
+        print(f"\nStarting server on http://0.0.0.0:{port}")
+        socketio.run(app, host='0.0.0.0', port=port, debug=debug, use_reloader=use_reloader)
     except Exception as e:
         print(f"Error starting server: {e}")
         import traceback
         traceback.print_exc()
-
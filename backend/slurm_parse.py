@@ -0,0 +1,323 @@
+"""Streaming parsers for squeue/sinfo output.
+
+Slurm commands are read incrementally from the child's stdout instead of
+being captured into one big string: each chunk is decoded, split at the last
+newline and its lines parsed straight into record dicts, so the full output,
+the list of all its lines and the per-line field lists never exist at the
+same time. Low-cardinality fields (users, states, partitions) are interned
+so a 100k-job queue shares one string per distinct value.
+"""
+import codecs
+import os
+import select
+import subprocess
+import tempfile
+import time
+
+import profiling
+import scheduler
+
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+CHUNK_SIZE = 64 * 1024
+COMMAND_TIMEOUT = 30  # seconds; large clusters take a while to list
+
+# jobid|user|name|state|time|nodes|partition|submit|cpus|min_memory|time_limit|reason
+# (reason stays last: it is free text)
+QUEUE_FORMAT = "%i|%u|%j|%t|%M|%D|%P|%V|%C|%m|%l|%R"
+QUEUE_FIELDS = ("job_id", "user", "name", "state", "time", "nodes", "partition",
+                "submit_time", "cpus", "min_memory", "time_limit", "reason")
+START_FORMAT = "%i|%P|%V|%S"  # jobid|partition|submit|expected start (squeue --start)
+
+NODE_FORMAT = "%N|%t|%C|%m|%e|%P"  # name|state|CPUs(A/I/O/T)|memory|free_mem|partition
+GRES_FORMAT = "%N|%G"
+
+
+class SlurmCommandError(Exception):
+    """Raised when a Slurm command is missing, fails or times out."""
+
+
+# Capture/replay hooks (see cluster_replay). A replayer(cmd) -> (returncode,
+# stdout, stderr) answers commands instead of running them; a recorder(cmd,
+# returncode, stdout, stderr) is handed the result of every command run.
+_replayer = None
+_recorder = None
+
+
+def set_command_hooks(replayer=None, recorder=None):
+    global _replayer, _recorder
+    _replayer, _recorder = replayer, recorder
+
+
+def iter_command_lines(cmd, cwd=None, timeout=COMMAND_TIMEOUT, chunk_size=CHUNK_SIZE):
+    """Run `cmd` and yield its stdout line by line as it is produced.
+
+    Lines are yielded without their trailing newline; empty lines are
+    skipped. Raises SlurmCommandError if the command cannot be started,
+    exits non-zero or runs longer than `timeout` seconds.
+    """
+    if _replayer is not None:
+        returncode, stdout, stderr = _replayer(cmd)
+        if returncode != 0:
+            raise SlurmCommandError(stderr)
+        for line in stdout.split("\n"):
+            if line:
+                yield line
+        return
+    if _recorder is None:
+        yield from _iter_process_lines(cmd, cwd, timeout, chunk_size)
+        return
+    lines = []
+    try:
+        for line in _iter_process_lines(cmd, cwd, timeout, chunk_size):
+            lines.append(line)
+            yield line
+    except SlurmCommandError as e:
+        _recorder(cmd, 1, "\n".join(lines), str(e))
+        raise
+    _recorder(cmd, 0, "\n".join(lines), "")
+
+
+def _read_chunk(fd, chunk_size, deadline):
+    """Wait for the child's next output (b"" at EOF) until `deadline`."""
+    while deadline is not None:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise SlurmCommandError("command timed out")
+        if select.select([fd], [], [], remaining)[0]:
+            break
+    return os.read(fd, chunk_size)
+
+
+def _iter_process_lines(cmd, cwd, timeout, chunk_size):
+    # stderr goes to a temp file so a chatty command can't fill the pipe and
+    # deadlock while we are only draining stdout
+    with tempfile.TemporaryFile() as err:
+        try:
+            proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=err, cwd=cwd)
+        except FileNotFoundError:
+            raise SlurmCommandError(f"command not found: {cmd[0]}")
+        except Exception as e:
+            raise SlurmCommandError(f"unknown: {e}")
+
+        fd = proc.stdout.fileno()
+        decoder = codecs.getincrementaldecoder("utf-8")("replace")
+        deadline = time.monotonic() + timeout if timeout else None
+        tail = ""
+        try:
+            while True:
+                # time blocked on the child counts as subprocess, the rest as the
+                # caller's; the wait itself runs off the hub (scheduler.blocking)
+                with profiling.phase("subprocess"):
+                    chunk = scheduler.blocking(_read_chunk, fd, chunk_size, deadline)
+                if not chunk:
+                    break
+                text = tail + decoder.decode(chunk)
+                cut = text.rfind("\n")
+                if cut < 0:
+                    tail = text
+                    continue
+                tail = text[cut + 1:]
+                for line in text[:cut].split("\n"):
+                    if line:
+                        yield line
+            tail += decoder.decode(b"", final=True)
+            if tail:
+                yield tail
+            with profiling.phase("subprocess"):
+                returncode = scheduler.blocking(proc.wait)
+        finally:
+            if proc.poll() is None:
+                proc.kill()
+                proc.wait()
+            proc.stdout.close()
+
+        if returncode != 0:
+            err.seek(0)
+            stderr = err.read().decode(errors="replace").strip()
+            raise SlurmCommandError(f"command failed: {stderr}")
+
+
+def _interner():
+    """Return a function mapping equal strings to one shared instance."""
+    seen = {}
+    return lambda s: seen.setdefault(s, s)
+
+
+def iter_jobs(lines, digest=None):
+    """Parse `squeue -o QUEUE_FORMAT` lines into job dicts.
+
+    If `digest` (a hashlib object) is given it is fed every field except the
+    constantly ticking elapsed time, so it only changes when the queue does.
+    """
+    intern = _interner()
+    for line in lines:
+        parts = line.split("|", 11)
+        if len(parts) < 12:
+            continue
+        (job_id, user, name, state, elapsed, nodes, partition,
+         submit, cpus, min_memory, time_limit, reason) = parts
+        if job_id == "JOBID":
+            continue  # header line
+        if digest is not None:
+            digest.update(f"{job_id}|{user}|{name}|{state}|{nodes}|{partition}|{submit}|"
+                          f"{cpus}|{min_memory}|{time_limit}|{reason}\n".encode())
+        yield {
+            "job_id": job_id.strip(),
+            "user": intern(user.strip()),
+            "name": intern(name.strip()),
+            "state": intern(state.strip()),
+            "time": elapsed.strip(),
+            "nodes": intern(nodes.strip()),
+            "partition": intern(partition.strip()),
+            "submit_time": submit.strip(),
+            "cpus": intern(cpus.strip()),
+            "min_memory": intern(min_memory.strip()),
+            "time_limit": intern(time_limit.strip()),
+            "reason": reason.strip(),
+        }
+
+
+SIZE_UNITS = {"K": 1 / 1024, "M": 1, "G": 1024, "T": 1024 * 1024, "P": 1024 ** 3}
+
+
+def parse_size_mb(value, default_unit="M"):
+    """Slurm size ("4000M", "16G", "123456K", "0") -> MB as a float (0 if unknown)."""
+    value = value.strip()
+    if not value:
+        return 0.0
+    unit = value[-1].upper()
+    if unit in SIZE_UNITS:
+        value = value[:-1]
+    else:
+        unit = default_unit
+    try:
+        return float(value) * SIZE_UNITS[unit]
+    except ValueError:
+        return 0.0
+
+
+def parse_tres(value):
+    """"cpu=4,mem=16000M,gres/gpu=1" -> {"cpu": "4", "mem": "16000M", "gres/gpu": "1"}."""
+    out = {}
+    for item in (value or "").split(","):
+        key, sep, val = item.partition("=")
+        if sep:
+            out[key] = val
+    return out
+
+
+def parse_req_mem_mb(value, cpus, nodes):
+    """sacct ReqMem ("4000M", "4Gn" per node, "2Gc" per CPU) -> total MB."""
+    value = value.strip()
+    per = value[-1:] if value[-1:] in ("n", "c") else ""
+    mb = parse_size_mb(value[:-1] if per else value)
+    if per == "c":
+        return mb * max(cpus, 1)
+    return mb * max(nodes, 1) if per == "n" else mb
+
+
+def parse_duration_s(value):
+    """Slurm duration ("1-02:03:04", "02:03:04", "03:04.500") -> seconds (0 if unknown)."""
+    value = value.strip()
+    days, _, rest = value.rpartition("-")
+    try:
+        seconds = 0.0
+        for part in rest.split(":"):
+            seconds = seconds * 60 + float(part)
+        return seconds + (int(days) * 86400 if days else 0)
+    except ValueError:
+        return 0.0
+
+
+def parse_timestamp(value):
+    """Slurm timestamp ("2024-05-01T12:00:00", local time) -> epoch, or None."""
+    try:
+        return time.mktime(time.strptime(value.strip(), TIMESTAMP_FORMAT))
+    except (ValueError, OverflowError):
+        return None  # "N/A", "Unknown", "None"
+
+
+def iter_start_estimates(lines):
+    """Parse `squeue --start -h -o START_FORMAT` lines into
+    (job_id, partition, submit_ts, start_ts) tuples; unknown times are None."""
+    for line in lines:
+        parts = line.split("|")
+        if len(parts) != 4 or parts[0] == "JOBID":
+            continue
+        job_id, partition, submit, start = parts
+        yield job_id.strip(), partition.strip(), parse_timestamp(submit), parse_timestamp(start)
+
+
+def parse_memory_mb(mem_str):
+    """sinfo reports memory in MB; non-numeric values (e.g. 'N/A') map to 0."""
+    try:
+        return int(mem_str)
+    except ValueError:
+        return 0
+
+
+def iter_nodes(lines, digest=None):
+    """Parse `sinfo -N -h -o NODE_FORMAT` lines into node dicts.
+
+    If `digest` is given it is fed every field except the OS free memory,
+    which fluctuates on every call.
+    """
+    intern = _interner()
+    for line in lines:
+        parts = line.split("|", 6)
+        if len(parts) < 6:
+            continue
+        name, state, cpu_field, total_mem_str, free_mem_str, partition = parts[:6]
+        if name == "NODELIST":
+            continue  # header line
+        if digest is not None:
+            digest.update(f"{name}|{state}|{cpu_field}|{total_mem_str}|{partition}\n".encode())
+        state = intern(state.strip())
+
+        # CPU format allocated/idle/other/total
+        cpu_parts = cpu_field.split("/")
+        try:
+            cpus_allocated = int(cpu_parts[0])
+            cpus_idle = int(cpu_parts[1])
+            cpus_total = int(cpu_parts[3])
+        except (IndexError, ValueError):
+            cpus_allocated = cpus_idle = cpus_total = 0
+
+        total_mem_mb = parse_memory_mb(total_mem_str.strip())
+        free_mem_mb = parse_memory_mb(free_mem_str.strip())
+
+        used_mem_mb = 0
+        if total_mem_mb > 0:
+            # If node is down, free_mem might be 'N/A' (parsed as 0), so only
+            # calculate used mem if state is not down/drained
+            if not any(s in state for s in ("down", "drain", "fail")):
+                used_mem_mb = total_mem_mb - free_mem_mb
+            elif "alloc" in state or "mix" in state:
+                used_mem_mb = total_mem_mb
+        used_mem_mb = max(0, min(used_mem_mb, total_mem_mb))
+
+        yield {
+            "name": name.strip(),
+            "state": state,
+            "partition": intern(partition.strip()),
+            "cpus_allocated": cpus_allocated,
+            "cpus_idle": cpus_idle,
+            "cpus_total": cpus_total,
+            "memory_total_mb": total_mem_mb,
+            "memory_free_mb": free_mem_mb,
+            "memory_used_mb": used_mem_mb,
+        }
+
+
+def iter_gres(lines, digest=None):
+    """Parse `sinfo -N -h -o GRES_FORMAT` lines into (node, gres) pairs."""
+    for line in lines:
+        if digest is not None:
+            digest.update(line.encode() + b"\n")
+        parts = line.split("|")
+        if len(parts) != 2:
+            continue
+        node, gres = parts[0].strip(), parts[1].strip()
+        if gres not in ("N/A", "(null)", ""):
+            yield node, gres
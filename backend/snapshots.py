@@ -0,0 +1,150 @@
+"""Cached cluster-state snapshots shared by every client.
+
+Polling endpoints used to fork squeue/sinfo and build a fresh response for
+every request. A snapshot holds the parsed result of one refresh for
+SNAPSHOT_TTL seconds together with a content digest, a version number and a
+cache of serialized/compressed bodies for that version, so N clients polling
+the same data cost one Slurm call and one encoding.
+
+A refresh whose digest matches the current snapshot keeps the existing
+snapshot (and its bodies and ETag). Loaders leave constantly ticking fields
+(elapsed time, OS free memory) out of the digest, so to keep those from
+going stale forever the digest is combined with a time bucket of
+ETAG_GRANULARITY seconds.
+"""
+import hashlib
+import os
+import threading
+import time
+
+import profiling
+import scheduler
+
+SNAPSHOT_TTL = float(os.environ.get("SLURM_GUI_SNAPSHOT_TTL", "5"))
+ETAG_GRANULARITY = float(os.environ.get("SLURM_GUI_ETAG_GRANULARITY", "60"))
+
+
+class Snapshot:
+    """The parsed output of one refresh plus its serialized bodies."""
+
+    def __init__(self, name, data, version, content_key):
+        self.name = name
+        self.data = data
+        self.version = version
+        self.content_key = content_key
+        self.etag = 'W/"%s-%d-%s"' % (
+            name, version, hashlib.sha1(content_key.encode()).hexdigest()[:16])
+        self.taken_at = time.time()
+        self._bodies = {}
+        self._bodies_lock = threading.Lock()
+
+    def age(self):
+        return time.time() - self.taken_at
+
+    def body(self, key, build):
+        """Return the cached body for `key`, building it once with `build()`."""
+        body = self._bodies.get(key)
+        if body is None:
+            with self._bodies_lock:
+                body = self._bodies.get(key)
+                if body is None:
+                    body = build()
+                    self._bodies[key] = body
+        return body
+
+    def derived(self, key, build):
+        """Return a value computed once per version from this snapshot's data."""
+        return self.body(("derived",) + tuple(key), build)
+
+    def stream(self, key, chunks):
+        """Return the cached body for `key`, or stream `chunks()` and cache it.
+
+        The first request for a version is streamed as it is generated; its
+        chunks are kept and joined once the stream completes, so later
+        requests for the same version are served from memory.
+        """
+        body = self._bodies.get(key)
+        if body is not None:
+            return body
+        return self._tee(key, chunks())
+
+    def _tee(self, key, chunks):
+        parts = []
+        for chunk in chunks:
+            parts.append(chunk)
+            yield chunk
+        self._bodies.setdefault(key, b"".join(parts))
+
+
+_snapshots = {}
+_versions = {}
+_locks = {}
+_registry_lock = threading.Lock()
+
+
+def _lock_for(name):
+    with _registry_lock:
+        return _locks.setdefault(name, threading.Lock())
+
+
+def _content_key(digest):
+    return f"{digest}:{int(time.time() // ETAG_GRANULARITY)}"
+
+
+def get(name, loader, ttl=None):
+    """Return the current snapshot `name`, refreshing it with `loader()` if stale.
+
+    `loader` returns a (data, digest) pair. Only one caller refreshes a given
+    snapshot at a time; concurrent callers wait for that refresh and share its
+    result. Exceptions from `loader` propagate and leave the previous
+    snapshot in place.
+    """
+    ttl = SNAPSHOT_TTL if ttl is None else ttl
+    snap = _snapshots.get(name)
+    if snap is not None and snap.age() < ttl:
+        return snap
+    with scheduler.locked(_lock_for(name)):  # held while the loader runs Slurm commands
+        snap = _snapshots.get(name)
+        if snap is not None and snap.age() < ttl:
+            return snap  # refreshed while we waited
+        with profiling.phase("parse"):  # loader's subprocess reads are charged separately
+            data, digest = loader()
+        content_key = _content_key(digest)
+        if snap is not None and snap.content_key == content_key:
+            # Nothing changed: keep the version, its ETag and cached bodies
+            snap.taken_at = time.time()
+            return snap
+        version = _versions.get(name, 0) + 1
+        _versions[name] = version
+        snap = Snapshot(name, data, version, content_key)
+        _snapshots[name] = snap
+        return snap
+
+
+def peek(name):
+    """Return the last snapshot `name` without refreshing it (or None)."""
+    return _snapshots.get(name)
+
+
+def invalidate(name):
+    """Force the next get() of `name` to refresh (e.g. after submitting a job)."""
+    snap = _snapshots.get(name)
+    if snap is not None:
+        snap.taken_at = 0
+        snap.content_key = ""  # a job action must not be answered with 304
+
+
+def etag_matches(if_none_match, etag):
+    """Weak comparison of an If-None-Match header against `etag`."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    wanted = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == wanted:
+            return True
+    return False
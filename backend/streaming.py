@@ -0,0 +1,102 @@
+"""Streamed JSON / NDJSON response bodies for large listings.
+
+A full-cluster queue dump can be tens of megabytes of JSON. Instead of
+building it with jsonify, the body is generated in batches of records so the
+first bytes leave immediately and per-request memory stays flat. Compressed
+variants go through an incremental compressor flushed after every batch, so
+they stream the same way, and are cached on the snapshot, so each (version,
+format, encoding) is compressed once.
+"""
+import json
+import zlib
+
+try:
+    import brotli  # optional, enables Content-Encoding: br
+except ImportError:
+    brotli = None
+
+BATCH_SIZE = 500  # records per yielded chunk
+FLUSH_BYTES = 64 * 1024  # compressor input between flushes
+
+JSON_MIMETYPE = "application/json"
+NDJSON_MIMETYPE = "application/x-ndjson"
+
+_dumps = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
+
+def iter_json(data, list_key):
+    """Yield `data` as a JSON object, streaming the big list under `list_key`."""
+    head = {k: v for k, v in data.items() if k != list_key}
+    prefix = _dumps(head)[:-1]
+    yield (prefix + ("," if head else "") + json.dumps(list_key) + ":[").encode()
+    records = data.get(list_key) or []
+    for start in range(0, len(records), BATCH_SIZE):
+        chunk = ",".join(map(_dumps, records[start:start + BATCH_SIZE]))
+        yield (("," if start else "") + chunk).encode()
+    yield b"]}"
+
+
+def iter_ndjson(data, list_key):
+    """Yield one JSON document per line: the summary first, then each record."""
+    head = {k: v for k, v in data.items() if k != list_key}
+    if head:
+        yield (_dumps(head) + "\n").encode()
+    records = data.get(list_key) or []
+    for start in range(0, len(records), BATCH_SIZE):
+        batch = records[start:start + BATCH_SIZE]
+        yield ("\n".join(map(_dumps, batch)) + "\n").encode()
+
+
+def choose_format(args, accept):
+    """Return 'ndjson' if requested via ?format=ndjson or the Accept header."""
+    if args.get("format") == "ndjson" or NDJSON_MIMETYPE in (accept or ""):
+        return "ndjson"
+    return "json"
+
+
+def choose_encoding(accept_encoding):
+    """Pick the best supported content-encoding from an Accept-Encoding header."""
+    offered = {}
+    for item in (accept_encoding or "").split(","):
+        name, _, params = item.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            offered[name.lower()] = q
+    if brotli is not None and offered.get("br", 0) > 0:
+        return "br"
+    if offered.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+def iter_compressed(chunks, encoding):
+    """Compress an iterable of byte chunks, yielding output as it is produced.
+
+    The compressor is flushed (a sync flush for gzip) once FLUSH_BYTES of
+    input have gone in since the last flush, so the client can decode what
+    it has received so far while small chunks still compress well together.
+    """
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=5)
+        process, flush, finish = compressor.process, compressor.flush, compressor.finish
+    else:
+        # wbits=31 -> gzip container
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        process, finish = compressor.compress, compressor.flush
+        flush = lambda: compressor.flush(zlib.Z_SYNC_FLUSH)
+    pending = 0
+    for chunk in chunks:
+        out = process(chunk)
+        pending += len(chunk)
+        if pending >= FLUSH_BYTES:
+            out += flush()
+            pending = 0
+        if out:
+            yield out
+    yield finish()
@@ -0,0 +1,22 @@
+import pytest
+
+import bulk_control
+
+
+QUEUE = [
+    {"job_id": "10", "state": "PD", "user": "alice", "name": "a", "partition": "gpu"},
+    {"job_id": "11", "state": "R", "user": "alice", "name": "b", "partition": "gpu"},
+    {"job_id": "12", "state": "PD", "user": "bob", "name": "c", "partition": "cpu"},
+]
+
+
+@pytest.mark.parametrize("state", ["PENDING", "pending", "PD"])
+def test_state_filter_accepts_names_and_codes(state):
+    specs = bulk_control.resolve(filters={"user": "alice", "state": state}, jobs=QUEUE)
+
+    assert specs == ["10"]
+
+
+def test_unknown_state_is_rejected():
+    with pytest.raises(ValueError):
+        bulk_control.resolve(filters={"state": "WAITING"}, jobs=QUEUE)
@@ -0,0 +1,21 @@
+import capabilities
+import cluster_replay
+
+
+def test_capture_does_not_probe_and_records_the_version_later(tmp_path, monkeypatch):
+    def fail():
+        raise AssertionError("probed during Capture()")
+
+    monkeypatch.setattr(capabilities, "probe", fail)
+    monkeypatch.setattr(capabilities, "_override", {"tools": {}, "version": None, "probed_at": None})
+    path = str(tmp_path / "capture.jsonl.gz")
+
+    capture = cluster_replay.Capture(path)
+    capture.record(["squeue"], 0, "JOBID\n", "")
+    # the background probe finishes
+    capabilities.override({"tools": {}, "version": "23.02.1", "probed_at": 1.0})
+    capture.record(["squeue"], 0, "JOBID\n", "")
+
+    replay = cluster_replay.Replay(path)
+    assert replay.header["slurm_version"] == "23.02.1"
+    assert replay.run(["squeue"]) == (0, "JOBID\n", "")
@@ -0,0 +1,59 @@
+import efficiency
+
+
+def sacct_line(job_id, nnodes="", req_mem="", max_rss="", ntasks="", tres_usage_tot=""):
+    # JobID|JobName|User|Account|Partition|State|End|ElapsedRaw|AllocCPUS|TotalCPU|ReqMem|NNodes|
+    # MaxRSS|NTasks|TRESUsageInTot
+    return "|".join([job_id, "train", "alice", "lab", "gpu", "COMPLETED", "2024-05-01T12:00:00",
+                     "3600", "8", "04:00:00", req_mem, nnodes, max_rss, ntasks, tres_usage_tot])
+
+
+def test_multi_task_memory_is_summed_over_tasks():
+    # 2 nodes x 4 tasks: the largest task peaked at 1.5G, all eight at 8G together
+    lines = [
+        sacct_line("42", nnodes="2", req_mem="8Gn"),
+        sacct_line("42.batch", max_rss="100M", ntasks="1", tres_usage_tot="cpu=00:00:01,mem=100M"),
+        sacct_line("42.0", max_rss="1.5G", ntasks="8", tres_usage_tot="cpu=04:00:00,mem=8G,vmem=9G"),
+    ]
+
+    (record,) = efficiency.iter_sacct_efficiency(lines)
+
+    assert record["req_mem_mb"] == 2 * 8 * 1024
+    assert record["max_rss_mb"] == 8 * 1024
+    assert record["mem_eff"] == 0.5
+
+
+def test_memory_falls_back_to_max_rss_times_tasks():
+    lines = [
+        sacct_line("43", nnodes="2", req_mem="8Gn"),
+        sacct_line("43.0", max_rss="1G", ntasks="8"),  # no TRES usage recorded
+    ]
+
+    (record,) = efficiency.iter_sacct_efficiency(lines)
+
+    assert record["mem_eff"] == 0.5
+
+
+def test_single_task_memory_efficiency():
+    lines = [sacct_line("7", nnodes="1", req_mem="4000M", max_rss="1000M", ntasks="1")]
+
+    (record,) = efficiency.iter_sacct_efficiency(lines)
+
+    assert record["mem_eff"] == 0.25
+
+
+def test_rollups_accumulate_jobs_of_the_same_day(tmp_path, monkeypatch):
+    monkeypatch.setattr(efficiency.history, "DB_PATH", str(tmp_path / "history.db"))
+    monkeypatch.setattr(efficiency.history, "_conn", None)
+    monkeypatch.setattr(efficiency, "_schema_ready", False)
+    lines = [sacct_line("1", nnodes="1", req_mem="4000M", max_rss="1000M"),
+             sacct_line("2", nnodes="1", req_mem="4000M", max_rss="3000M")]
+
+    assert efficiency._store(efficiency.iter_sacct_efficiency(lines)) == 2
+    assert efficiency._store(efficiency.iter_sacct_efficiency(lines)) == 0  # already stored
+
+    (rollup,) = efficiency.rollups(group="user")
+    assert rollup["user"] == "alice"
+    assert rollup["jobs"] == 2
+    assert rollup["cpu_eff"] == 0.5
+    assert rollup["mem_eff"] == 0.5
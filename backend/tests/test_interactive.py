@@ -0,0 +1,23 @@
+import pytest
+
+import interactive
+
+
+def shell_job(job_id, user, name):
+    return {"job_id": job_id, "state": "R", "user": user, "name": name, "reason": "node1"}
+
+
+def test_only_the_backend_accounts_jobs_are_offered():
+    jobs = [
+        shell_job("101", "svc-gui", "gui-shell-alice"),
+        shell_job("102", "mallory", "gui-shell-alice"),
+    ]
+    interactive.reconcile(jobs, account="svc-gui")
+
+    assert [a["job_id"] for a in interactive.for_user("alice")] == ["101"]
+
+
+def test_names_that_would_collide_are_rejected():
+    assert interactive.job_name("a_b") == "gui-shell-a_b"
+    with pytest.raises(ValueError):
+        interactive.job_name("a b")
@@ -0,0 +1,65 @@
+import job_arrays
+
+
+def job(job_id, state, user="alice"):
+    return {"job_id": job_id, "state": state, "user": user}
+
+
+def test_parse_job_id():
+    assert job_arrays.parse_job_id("77") == (None, [], None)
+    assert job_arrays.parse_job_id("123_4") == ("123", [(4, 4)], None)
+    assert job_arrays.parse_job_id("123_[1-5,9%2]") == ("123", [(1, 5), (9, 9)], 2)
+    assert job_arrays.parse_job_id("123_[1-7:3]") == ("123", [(1, 1), (4, 4), (7, 7)], None)
+    assert job_arrays.parse_job_id("123_[]") == ("123", [], None)
+
+
+def test_merge_ranges():
+    assert job_arrays.merge_ranges([(5, 6), (1, 2), (3, 3), (8, 9), (9, 12)]) == [(1, 3), (5, 6), (8, 12)]
+    assert job_arrays.merge_ranges([]) == []
+
+
+def test_collapse_keeps_throttle_and_mixed_states():
+    jobs = [
+        job("123_[4-9%2]", "PD"),
+        job("77", "R", user="bob"),
+        job("123_1", "R"),
+        job("123_2", "R"),
+        job("123_3", "CG"),
+    ]
+
+    collapsed = job_arrays.collapse(jobs)
+
+    assert [j["job_id"] for j in collapsed] == ["123", "77"]
+    parent = collapsed[0]
+    assert parent["array"] is True
+    assert parent["throttle"] == 2
+    assert parent["tasks"] == {"PD": "4-9", "R": "1-2", "CG": "3"}
+    assert parent["task_counts"] == {"PD": 6, "R": 2, "CG": 1}
+    assert parent["total_tasks"] == 9
+    assert parent["state"] == "PD"
+    assert collapsed[1] == job("77", "R", user="bob")
+
+
+def test_empty_task_range():
+    (parent,) = job_arrays.collapse([job("123_[]", "PD")])
+
+    assert parent["tasks"] == {}
+    assert parent["total_tasks"] == 0
+    assert parent["state"] == "PD"
+    assert job_arrays.expand([job("123_[]", "PD")]) == []
+
+
+def test_expand_and_collapse_round_trip():
+    jobs = [job("123_[3-5,8]", "PD"), job("123_1", "R"), job("123_2", "CG"), job("77", "R")]
+
+    expanded = job_arrays.expand(jobs)
+
+    assert [j["job_id"] for j in expanded] == [
+        "123_3", "123_4", "123_5", "123_8", "123_1", "123_2", "77"]
+    assert job_arrays.collapse(expanded) == job_arrays.collapse(jobs)
+    # each collapsed state range names exactly the expanded tasks in that state
+    (parent, _) = job_arrays.collapse(jobs)
+    for state, spec in parent["tasks"].items():
+        _, ranges, _ = job_arrays.parse_job_id(f"123_[{spec}]")
+        tasks = {j["job_id"] for j in expanded if j["state"] == state and j["job_id"].startswith("123_")}
+        assert {f"123_{t}" for lo, hi in ranges for t in range(lo, hi + 1)} == tasks
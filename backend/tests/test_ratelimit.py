@@ -0,0 +1,89 @@
+import threading
+import time
+
+import pytest
+
+import ratelimit
+
+LIMITS = {"read": (3, 60)}  # bursts of 3, one token every 20 s
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ratelimit.time, "monotonic", lambda: now[0])
+    monkeypatch.setattr(ratelimit, "_buckets", {})
+    return now
+
+
+def test_burst_limit_then_429_with_retry_after(clock):
+    for _ in range(3):
+        assert ratelimit.check("read", ["10.0.0.1"], LIMITS, endpoint="queue") == (True, 0)
+
+    allowed, retry_after = ratelimit.check("read", ["10.0.0.1"], LIMITS, endpoint="queue")
+
+    assert not allowed
+    assert retry_after == pytest.approx(20)
+    assert ratelimit.retry_after_header(retry_after) == 20
+    assert ratelimit.retry_after_header(0.2) == 1
+
+
+def test_buckets_refill(clock):
+    for _ in range(3):
+        ratelimit.check("read", ["10.0.0.1"], LIMITS, endpoint="queue")
+    clock[0] += 19
+    assert not ratelimit.check("read", ["10.0.0.1"], LIMITS, endpoint="queue")[0]
+    clock[0] += 1
+    assert ratelimit.check("read", ["10.0.0.1"], LIMITS, endpoint="queue")[0]
+    assert not ratelimit.check("read", ["10.0.0.1"], LIMITS, endpoint="queue")[0]
+    clock[0] += 3600  # never more than the burst
+    assert [ratelimit.check("read", ["10.0.0.1"], LIMITS, endpoint="queue")[0]
+            for _ in range(4)] == [True, True, True, False]
+
+
+def test_buckets_are_per_client_and_endpoint(clock):
+    for _ in range(3):
+        ratelimit.check("read", ["10.0.0.1"], LIMITS, endpoint="queue")
+
+    assert not ratelimit.check("read", ["10.0.0.1"], LIMITS, endpoint="queue")[0]
+    assert ratelimit.check("read", ["10.0.0.1"], LIMITS, endpoint="nodes")[0]
+    assert ratelimit.check("read", ["10.0.0.2"], LIMITS, endpoint="queue")[0]
+
+
+def test_limits_off():
+    assert ratelimit.check("read", ["10.0.0.1"], {}) == (True, 0)
+    assert ratelimit.parse_limits("off") is None
+    assert ratelimit.parse_limits("read=5/10")["read"] == (5.0, 10.0)
+
+
+def test_concurrent_callers_share_one_coalesced_result():
+    calls = []
+    release = threading.Event()
+
+    def slow():
+        calls.append(1)
+        release.wait(5)
+        return {"jobs": []}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(ratelimit.coalesce("queue", slow)))
+               for _ in range(4)]
+    for t in threads:
+        t.start()
+    time.sleep(0.2)  # all four are inside coalesce by now
+    release.set()
+    for t in threads:
+        t.join(5)
+
+    assert len(calls) == 1
+    assert sorted(shared for _, shared in results) == [False, True, True, True]
+    assert all(result is results[0][0] for result, _ in results)
+
+
+def test_coalesced_errors_are_raised_and_not_kept():
+    def fail():
+        raise RuntimeError("squeue failed")
+
+    with pytest.raises(RuntimeError):
+        ratelimit.coalesce("queue", fail)
+    assert ratelimit.coalesce("queue", lambda: 1) == (1, False)  # not cached
@@ -0,0 +1,67 @@
+import gzip
+import json
+
+import pytest
+
+import recorder
+
+SESSION = "abcdef0123"
+
+
+@pytest.fixture
+def recording(tmp_path, monkeypatch):
+    """A session with events at fixed times spread over three gzip members."""
+    monkeypatch.setattr(recorder, "RECORD_DIR", str(tmp_path))
+    monkeypatch.setattr(recorder, "KEYFRAME_INTERVAL", 1.0)
+    rec = recorder.start(SESSION, user="alice")
+    for batch in ([(0.1, "o", "hello\r\n"), (0.5, "o", "one\r\n")],
+                  [(1.6, "o", "two\r\n"), (1.9, "o", "three\r\n")],
+                  [(3.2, "o", "four\r\n")]):
+        rec.events.extend(batch)
+        rec.flush()
+    recorder.stop(SESSION)
+    recorder.flush_all()
+    return tmp_path
+
+
+def lines_of(session_id, **kwargs):
+    return [json.loads(line) for line in recorder.replay(session_id, **kwargs)]
+
+
+def test_members_roll_over_and_are_indexed(recording):
+    assert [t for t, _ in recorder.load_index(SESSION)] == [0.0, 1.6, 3.2]
+    assert recorder.get(SESSION) is None  # closed by the writer
+    # concatenated members are one valid gzip stream
+    with gzip.open(recording / f"{SESSION}.cast.gz", "rt") as f:
+        records = [json.loads(line) for line in f]
+    assert records[0]["user"] == "alice"
+    assert [r[2] for r in records[1:]] == ["hello\r\n", "one\r\n", "two\r\n", "three\r\n", "four\r\n"]
+
+
+def test_seek_replays_context_then_rebased_events(recording):
+    header, context, *events = lines_of(SESSION, start=2.0)
+
+    assert header["version"] == 2
+    assert context == [0.0, "o", recorder.CLEAR_SCREEN + "hello\r\none\r\ntwo\r\nthree\r\n"]
+    assert events == [[1.2, "o", "four\r\n"]]
+
+
+def test_replay_window(recording):
+    _, context, *events = lines_of(SESSION, start=0.3, duration=1.4)
+
+    assert context == [0.0, "o", recorder.CLEAR_SCREEN + "hello\r\n"]
+    assert events == [[0.2, "o", "one\r\n"], [1.3, "o", "two\r\n"]]
+
+
+def test_replay_from_the_start_has_no_context(recording):
+    _, first, *_ = lines_of(SESSION)
+
+    assert first == [0.1, "o", "hello\r\n"]
+
+
+def test_context_is_capped(recording, monkeypatch):
+    monkeypatch.setattr(recorder, "CONTEXT_BYTES", 8)
+
+    _, context, *_ = lines_of(SESSION, start=2.0)
+
+    assert context[2] == recorder.CLEAR_SCREEN + "two\r\nthree\r\n"[-8:]
@@ -0,0 +1,138 @@
+import threading
+import time
+
+import pytest
+
+import scheduler
+
+
+@pytest.fixture
+def limits(monkeypatch):
+    monkeypatch.setattr(scheduler, "LIMITS", {
+        "interactive": (2, 4),
+        "control": (1, 4),
+        "refresh": (1, 1),
+    })
+    monkeypatch.setattr(scheduler, "TOTAL_SLOTS", 3)
+    monkeypatch.setattr(scheduler, "POLL_DEADLINE", 0.05)
+    monkeypatch.setattr(scheduler, "_running", {name: 0 for name in scheduler.PRIORITY})
+    monkeypatch.setattr(scheduler, "_waiting", {name: 0 for name in scheduler.PRIORITY})
+    monkeypatch.setattr(scheduler, "_total", 0)
+
+
+def test_polls_are_shed_after_the_deadline_while_interactive_keeps_its_budget(limits):
+    scheduler.acquire("refresh")
+    started = time.monotonic()
+
+    with pytest.raises(scheduler.Overloaded) as shed:
+        scheduler.acquire("refresh", deadline=scheduler.poll_deadline())
+
+    assert shed.value.reason == "deadline passed"
+    assert 0.05 <= time.monotonic() - started < 1
+    scheduler.acquire("interactive")
+    scheduler.acquire("interactive")
+    assert scheduler.stats()["classes"]["interactive"]["running"] == 2
+    assert scheduler.stats()["in_use"] == 3
+
+
+def test_full_queue_is_shed_at_once(limits):
+    scheduler.acquire("refresh")
+    waiter = threading.Thread(target=lambda: pytest.raises(
+        scheduler.Overloaded, scheduler.acquire, "refresh", deadline=time.monotonic() + 0.5))
+    waiter.start()
+    while not scheduler.stats()["classes"]["refresh"]["waiting"]:
+        time.sleep(0.001)
+
+    with pytest.raises(scheduler.Overloaded) as shed:
+        scheduler.acquire("refresh")
+
+    assert shed.value.reason == "queue full"
+    waiter.join()
+
+
+def test_waiting_interactive_work_goes_before_refresh(limits, monkeypatch):
+    monkeypatch.setitem(scheduler.LIMITS, "refresh", (3, 4))
+    for _ in range(3):
+        scheduler.acquire("refresh")
+    admitted = []
+    waiter = threading.Thread(target=lambda: admitted.append(scheduler.acquire("interactive") or "interactive"))
+    waiter.start()
+    while not scheduler.stats()["classes"]["interactive"]["waiting"]:
+        time.sleep(0.001)
+
+    scheduler.release("refresh")
+    with pytest.raises(scheduler.Overloaded):
+        scheduler.acquire("refresh", deadline=scheduler.poll_deadline())
+    waiter.join(1)
+
+    assert admitted == ["interactive"]
+
+
+def test_parse_limits():
+    limits = scheduler.parse_limits("refresh=2/8,control=6,bogus=x")
+
+    assert limits["refresh"] == (2, 8)
+    assert limits["control"] == (6, scheduler.DEFAULT_LIMITS["control"][1])
+    assert "bogus" not in limits
+
+
+@pytest.fixture
+def cooperative(monkeypatch):
+    eventlet = pytest.importorskip("eventlet")
+    monkeypatch.setattr(scheduler, "_offload", True)
+    monkeypatch.setattr(scheduler, "_sleep", eventlet.sleep)
+    return eventlet
+
+
+def _ticker(eventlet, stop, gaps):
+    last = time.monotonic()
+    while not stop.is_set():
+        eventlet.sleep(0.005)
+        now = time.monotonic()
+        gaps.append(now - last)
+        last = now
+
+
+def test_locked_queues_green_threads_without_blocking_the_hub(cooperative):
+    eventlet = cooperative
+    lock = threading.Lock()
+    order = []
+    stop = threading.Event()
+    gaps = []
+
+    def holder(name):
+        with scheduler.locked(lock):
+            order.append(name)
+            scheduler.blocking(time.sleep, 0.1)  # e.g. squeue running off the hub
+            order.append(name)
+
+    ticker = eventlet.spawn(_ticker, eventlet, stop, gaps)
+    workers = [eventlet.spawn(holder, name) for name in ("a", "b")]
+    for worker in workers:
+        worker.wait()
+    stop.set()
+    ticker.wait()
+
+    assert order == ["a", "a", "b", "b"]
+    assert max(gaps) < 0.05
+
+
+def test_event_wakes_green_waiters(cooperative):
+    eventlet = cooperative
+    event = scheduler.Event()
+    woken = []
+
+    def waiter(name):
+        event.wait()
+        woken.append(name)
+
+    waiters = [eventlet.spawn(waiter, name) for name in ("a", "b")]
+    eventlet.sleep(0)
+    assert woken == []
+    scheduler.blocking(time.sleep, 0.01)
+    event.set()
+    for w in waiters:
+        w.wait()
+
+    assert sorted(woken) == ["a", "b"]
+    event.wait()  # already set: returns at once
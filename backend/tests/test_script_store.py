@@ -0,0 +1,53 @@
+import os
+
+import pytest
+
+import script_store
+
+
+@pytest.fixture(autouse=True)
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(script_store, "FILES_DIR", str(tmp_path))
+    monkeypatch.setattr(script_store, "BLOB_DIR", str(tmp_path / ".blobs"))
+    return tmp_path
+
+
+@pytest.mark.parametrize("name", ["..", ".", ".blobs", ".hidden", "a/b", "a\\b", "", None])
+def test_names_that_leave_the_user_dir_are_rejected(name, store):
+    assert not script_store.valid_user(name)
+    with pytest.raises(ValueError):
+        script_store.user_dir(name)
+    assert os.listdir(store) == []
+
+
+def test_identical_scripts_share_one_blob():
+    sha_a, path_a, created_a = script_store.put_blob("#!/bin/bash\necho hi\n")
+    sha_b, path_b, created_b = script_store.put_blob("#!/bin/bash\necho hi\n")
+
+    assert sha_a == sha_b
+    assert created_a and not created_b
+    assert path_a == path_b
+
+
+def test_link_points_at_the_latest_blob(store):
+    old, _, _ = script_store.put_blob("echo old\n")
+    new, _, _ = script_store.put_blob("echo new\n")
+
+    script_store.link_script("alice", "job.sh", old)
+    link = script_store.link_script("alice", "job.sh", new)
+
+    assert os.path.islink(link)
+    assert os.path.dirname(link) == str(store / "alice")
+    with open(link) as f:
+        assert f.read() == "echo new\n"
+
+
+def test_find_submission_returns_the_latest_match():
+    sha, _, _ = script_store.put_blob("echo hi\n")
+    first = script_store.record_submission("alice", "job.sh", sha, "1")
+    second = script_store.record_submission("alice", "job.sh", sha, "2", resubmit_of=first["id"])
+
+    assert script_store.find_submission("alice", submission_id=first["id"]) == first
+    assert script_store.find_submission("alice", sha256=sha) == second
+    assert script_store.find_submission("alice", submission_id="missing") is None
+    assert script_store.find_submission("bob", sha256=sha) is None
@@ -0,0 +1,85 @@
+import hashlib
+import sys
+
+import pytest
+
+import slurm_parse
+
+JOB = "123|alice|train|R|1:02|1|gpu|2024-05-01T12:00:00|8|4G|1-00:00:00|node01"
+
+
+def test_iter_jobs_skips_the_header_line():
+    header = "JOBID|USER|NAME|ST|TIME|NODES|PARTITION|SUBMIT_TIME|CPUS|MIN_MEMORY|TIME_LIMIT|NODELIST(REASON)"
+
+    jobs = list(slurm_parse.iter_jobs([header, JOB]))
+
+    assert [j["job_id"] for j in jobs] == ["123"]
+    assert jobs[0]["user"] == "alice"
+    assert jobs[0]["reason"] == "node01"
+
+
+def test_iter_jobs_keeps_pipes_in_the_reason():
+    line = "124|bob|prep|PD|0:00|1|cpu|2024-05-01T12:00:00|1|1G|10:00|(Reason|with|pipes)"
+
+    (job,) = slurm_parse.iter_jobs([line])
+
+    assert job["reason"] == "(Reason|with|pipes)"
+    assert job["time_limit"] == "10:00"
+
+
+def test_iter_jobs_of_empty_output():
+    assert list(slurm_parse.iter_jobs([])) == []
+    assert list(slurm_parse.iter_jobs(["", "short|line"])) == []
+
+
+def test_job_digest_ignores_elapsed_time():
+    def digest_of(line):
+        digest = hashlib.sha256()
+        list(slurm_parse.iter_jobs([line], digest=digest))
+        return digest.hexdigest()
+
+    assert digest_of(JOB) == digest_of(JOB.replace("|1:02|", "|1:03|"))
+    assert digest_of(JOB) != digest_of(JOB.replace("|R|", "|CG|"))
+
+
+def test_iter_nodes():
+    lines = [
+        "NODELIST|STATE|CPUS(A/I/O/T)|MEMORY|FREE_MEM|PARTITION",
+        "node01|mixed|4/12/0/16|64000|48000|gpu",
+        "node02|down*|0/0/16/16|64000|N/A|gpu",
+    ]
+
+    nodes = list(slurm_parse.iter_nodes(lines))
+
+    assert [n["name"] for n in nodes] == ["node01", "node02"]
+    assert nodes[0]["cpus_allocated"] == 4
+    assert nodes[0]["cpus_total"] == 16
+    assert nodes[0]["memory_used_mb"] == 16000
+    assert nodes[1]["memory_free_mb"] == 0
+    assert nodes[1]["memory_used_mb"] == 0
+    assert list(slurm_parse.iter_nodes([])) == []
+
+
+def test_command_lines_are_streamed():
+    cmd = [sys.executable, "-c", "print('a'); print(); print('b|c', end='')"]
+
+    assert list(slurm_parse.iter_command_lines(cmd)) == ["a", "b|c"]
+
+
+def test_missing_command():
+    with pytest.raises(slurm_parse.SlurmCommandError, match="command not found"):
+        list(slurm_parse.iter_command_lines(["slurm-gui-no-such-command"]))
+
+
+def test_failing_command():
+    cmd = [sys.executable, "-c", "import sys; sys.stderr.write('bad partition'); sys.exit(1)"]
+
+    with pytest.raises(slurm_parse.SlurmCommandError, match="command failed: bad partition"):
+        list(slurm_parse.iter_command_lines(cmd))
+
+
+def test_command_timeout():
+    cmd = [sys.executable, "-c", "import time; time.sleep(5)"]
+
+    with pytest.raises(slurm_parse.SlurmCommandError, match="timed out"):
+        list(slurm_parse.iter_command_lines(cmd, timeout=0.2))
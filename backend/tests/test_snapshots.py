@@ -0,0 +1,90 @@
+import pytest
+
+import snapshots
+
+
+@pytest.fixture
+def queue():
+    """A loader for snapshot "queue" whose digest the test controls."""
+    state = {"digest": "a", "calls": 0}
+
+    def loader():
+        state["calls"] += 1
+        return {"jobs": [], "call": state["calls"]}, state["digest"]
+
+    snapshots._snapshots.pop("queue", None)
+    yield state, loader
+    snapshots._snapshots.pop("queue", None)
+
+
+def test_unchanged_content_keeps_version_and_etag(queue):
+    state, loader = queue
+    first = snapshots.get("queue", loader, ttl=0)
+    again = snapshots.get("queue", loader, ttl=0)
+
+    assert state["calls"] == 2
+    assert again is first
+    assert snapshots.etag_matches(first.etag, again.etag)  # the poll would get a 304
+
+
+def test_changed_content_gets_a_new_etag(queue):
+    state, loader = queue
+    first = snapshots.get("queue", loader, ttl=0)
+    state["digest"] = "b"
+    second = snapshots.get("queue", loader, ttl=0)
+
+    assert second.version == first.version + 1
+    assert not snapshots.etag_matches(first.etag, second.etag)
+
+
+def test_invalidate_forces_a_refresh_and_a_new_etag(queue):
+    state, loader = queue
+    first = snapshots.get("queue", loader)
+    assert snapshots.get("queue", loader) is first  # within the TTL
+    snapshots.invalidate("queue")
+    second = snapshots.get("queue", loader)
+
+    assert state["calls"] == 2
+    assert second is not first
+    assert not snapshots.etag_matches(first.etag, second.etag)
+
+
+def test_derived_values_are_built_once_per_version(queue):
+    state, loader = queue
+    snap = snapshots.get("queue", loader)
+    builds = []
+
+    def build():
+        builds.append(1)
+        return len(builds)
+
+    assert snap.derived(("count",), build) == 1
+    assert snap.derived(("count",), build) == 1
+    assert snap.derived(("other",), build) == 2
+
+
+def test_streamed_bodies_are_cached_once_complete(queue):
+    state, loader = queue
+    snap = snapshots.get("queue", loader)
+
+    assert b"".join(snap.stream(("json",), lambda: iter([b"[", b"]"]))) == b"[]"
+    assert snap.stream(("json",), lambda: pytest.fail("rebuilt")) == b"[]"
+
+
+@pytest.mark.parametrize("header, matches", [
+    ('W/"queue-1-abc"', True),
+    ('"queue-1-abc"', True),            # weak comparison: W/ is ignored on either side
+    ('"other", W/"queue-1-abc"', True),
+    ('*', True),
+    ('W/"queue-2-abc"', False),
+    ('"queue-1-abc-compact"', False),
+    ('', False),
+    (None, False),
+])
+def test_etag_matches_uses_weak_comparison(header, matches):
+    assert snapshots.etag_matches(header, 'W/"queue-1-abc"') is matches
+
+
+def test_strong_etags_match_weak_validators():
+    assert snapshots.etag_matches('W/"x"', '"x"')
+    assert not snapshots.etag_matches('"y"', '"x"')
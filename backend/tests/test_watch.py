@@ -0,0 +1,65 @@
+import watch
+
+
+def job(job_id, state, user="alice", name="sweep"):
+    return {"job_id": job_id, "state": state, "user": user, "name": name}
+
+
+def test_array_task_start_is_a_pending_to_running_transition():
+    before = watch.states_of([job("123_[8-20%5]", "PD")])
+    after = watch.states_of([job("123_[9-20%5]", "PD"), job("123_8", "R")])
+
+    transitions = watch.diff(before, after)
+
+    assert transitions == [{
+        "job_id": "123_8",
+        "array_parent": "123",
+        "user": "alice",
+        "name": "sweep",
+        "old_state": "PENDING",
+        "new_state": "RUNNING",
+    }]
+
+
+def test_array_task_leaving_the_queue():
+    before = watch.states_of([job("123_[9-10]", "PD"), job("123_8", "R")])
+    after = watch.states_of([job("123_[9-10]", "PD")])
+
+    transitions = watch.diff(before, after)
+
+    assert [(t["job_id"], t["old_state"], t["new_state"]) for t in transitions] == [
+        ("123_8", "RUNNING", None),
+    ]
+
+
+def test_plain_jobs_are_not_expanded():
+    plain, arrays = watch.states_of([job("77", "R")])
+
+    assert plain == {"77": ("R", "alice", "sweep")}
+    assert arrays == {}
+
+
+def test_huge_ranges_stay_ranges():
+    before = watch.states_of([job("123_[1-1000000]", "PD")])
+    after = watch.states_of([job("123_[3-1000000]", "PD"), job("123_1", "R"), job("123_2", "R")])
+
+    assert before[1] == {"123": {("PD", "alice", "sweep"): [(1, 1000000)]}}
+    assert [(t["job_id"], t["old_state"], t["new_state"]) for t in watch.diff(before, after)] == [
+        ("123_[1-2]", "PENDING", "RUNNING"),
+    ]
+
+
+def test_range_transitions_reach_single_task_subscribers():
+    before = watch.states_of([job("123_[1-10]", "PD")])
+    after = watch.states_of([])
+    watch.subscribe("task-sub", job_ids=["123_4"])
+    watch.subscribe("other-sub", job_ids=["123_40"])
+    try:
+        routed = watch.route(watch.diff(before, after))
+    finally:
+        watch.drop("task-sub")
+        watch.drop("other-sub")
+
+    assert list(routed) == ["task-sub"]
+    assert routed["task-sub"][0]["job_id"] == "123_[1-10]"
+    assert routed["task-sub"][0]["new_state"] is None
@@ -0,0 +1,383 @@
+"""Queue wait-time prediction.
+
+Two sources are combined:
+
+* Slurm's own estimate (`squeue --start`) for jobs already pending. It is
+  exact when the backfill scheduler has planned the job and "N/A" otherwise.
+* An online model trained on the job history: finished jobs' actual waits
+  are ingested from sacct in batches, labelled with the pending-queue depth
+  sampled at their submit time, and folded into exponentially weighted
+  mean/variance statistics of log(wait) per resource shape (partition, CPUs,
+  memory, time limit, queue depth, each bucketed). Coarser shapes are kept
+  alongside, so a rare shape falls back to its partition's statistics.
+
+The model is updated incrementally as new history arrives and persisted in
+the history database; predictions are cached per shape until it changes.
+"""
+import math
+import os
+import threading
+import time
+
+import history
+import job_arrays
+import sbatch_validate
+import scheduler
+import slurm_parse
+
+DEPTH_SAMPLE_INTERVAL = float(os.environ.get("SLURM_GUI_DEPTH_SAMPLE_INTERVAL", "60"))
+INGEST_INTERVAL = float(os.environ.get("SLURM_GUI_HISTORY_INGEST_INTERVAL", "300"))
+BACKFILL_DAYS = float(os.environ.get("SLURM_GUI_HISTORY_BACKFILL_DAYS", "7"))
+START_TTL = 60  # seconds between `squeue --start` calls
+
+ALPHA = 0.05        # EWMA weight of a new observation once a shape has history
+MIN_SAMPLES = 5     # observations before a shape's statistics are trusted
+QUARTILE_Z = 0.674  # z-score of the 25th/75th percentile
+
+SACCT_FIELDS = "JobIDRaw,Partition,ReqCPUS,ReqMem,NNodes,Timelimit,Submit,Start,State"
+TIME_BUCKETS = (60, 240, 1440, 4320)  # minutes: <=1h, <=4h, <=1d, <=3d, longer
+ANY = "*"
+
+MODEL_SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS wait_model (
+        key TEXT PRIMARY KEY,
+        n INTEGER,
+        mean REAL,
+        var REAL,
+        updated REAL
+    )""",
+)
+
+# shape key -> [n, mean, var] of log1p(wait seconds)
+_model = {}
+_generation = 0
+_loaded = False
+_model_lock = threading.Lock()
+# (shape key, generation) -> prediction
+_predictions = {}
+
+
+# -- shapes ------------------------------------------------------------------
+
+def _pow2(n):
+    """Round up to a power of two (0 stays 0)."""
+    n = int(n or 0)
+    return 0 if n <= 0 else 1 << (n - 1).bit_length()
+
+
+def _time_bucket(minutes):
+    if not minutes:
+        return len(TIME_BUCKETS)  # unknown/unlimited: longest bucket
+    for i, edge in enumerate(TIME_BUCKETS):
+        if minutes <= edge:
+            return i
+    return len(TIME_BUCKETS)
+
+
+def _depth_bucket(depth):
+    if depth is None:
+        return None
+    return 0 if depth <= 0 else len(str(int(depth)))  # 0, 1-9, 10-99, ...
+
+
+def shape_keys(partition, cpus, mem_mb, time_limit_min, queue_depth):
+    """Keys for a request, most specific first.
+
+    Levels: full shape, shape without queue depth, partition+CPUs, partition,
+    whole cluster. The first level is skipped when the depth is unknown.
+    """
+    p = partition or ANY
+    c = str(_pow2(cpus))
+    m = str(_pow2(math.ceil((mem_mb or 0) / 1024)))
+    t = str(_time_bucket(time_limit_min))
+    d = _depth_bucket(queue_depth)
+    keys = [] if d is None else ["|".join((p, c, m, t, str(d)))]
+    keys += ["|".join((p, c, m, t, ANY)), "|".join((p, c, ANY, ANY, ANY)),
+             "|".join((p, ANY, ANY, ANY, ANY)), "|".join((ANY,) * 5)]
+    return keys
+
+
+# -- model -------------------------------------------------------------------
+
+def _load():
+    """Load persisted statistics; rebuild them from history if there are none."""
+    global _loaded, _generation
+    if _loaded:
+        return
+    history.ensure_schema(MODEL_SCHEMA)
+    with history.connect() as conn:
+        rows = conn.execute("SELECT key, n, mean, var FROM wait_model").fetchall()
+    for key, n, mean, var in rows:
+        _model[key] = [n, mean, var]
+    _loaded = True
+    if not _model:
+        changed = set()
+        for row in history.iter_waits():
+            changed.update(_observe(row))
+        _save(changed)
+    _generation += 1
+
+
+def _observe(row):
+    """Fold one wait observation into every level of its shape; returns the keys."""
+    x = math.log1p(max(0.0, row["wait_s"]))
+    keys = shape_keys(row["partition"], row["cpus"], row["mem_mb"],
+                      row["time_limit_min"], row["queue_depth"])
+    for key in keys:
+        stats = _model.get(key)
+        if stats is None:
+            _model[key] = [1, x, 0.0]
+            continue
+        n, mean, var = stats
+        # behaves like a plain mean for the first 1/ALPHA samples, then forgets
+        a = max(ALPHA, 1.0 / (n + 1))
+        delta = x - mean
+        mean += a * delta
+        var = (1 - a) * (var + a * delta * delta)
+        stats[:] = [n + 1, mean, var]
+    return keys
+
+
+def _save(keys):
+    if not keys:
+        return
+    now = time.time()
+    with history.connect() as conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO wait_model (key, n, mean, var, updated) VALUES (?, ?, ?, ?, ?)",
+            [(key, *_model[key], now) for key in keys])
+
+
+def update(rows):
+    """Train on new wait rows (online) and persist the touched statistics."""
+    global _generation
+    with _model_lock:
+        _load()
+        changed = set()
+        for row in rows:
+            changed.update(_observe(row))
+        _save(changed)
+        if changed:
+            _generation += 1
+            _predictions.clear()
+
+
+def predict_model(partition, cpus, mem_mb, time_limit_min, queue_depth):
+    """Model estimate for a shape: dict with estimate/low/high seconds, or None."""
+    keys = shape_keys(partition, cpus, mem_mb, time_limit_min, queue_depth)
+    cache_key = (keys[0], _generation)
+    if cache_key in _predictions:
+        return _predictions[cache_key]
+    with _model_lock:
+        _load()
+        result = None
+        for level, key in enumerate(keys):
+            stats = _model.get(key)
+            if stats is None:
+                continue
+            n, mean, var = stats
+            if n < MIN_SAMPLES and key != keys[-1]:
+                continue
+            sd = math.sqrt(max(var, 0.0))
+            result = {
+                "estimate_s": round(math.expm1(mean)),
+                "low_s": round(math.expm1(max(0.0, mean - QUARTILE_Z * sd))),
+                "high_s": round(math.expm1(mean + QUARTILE_Z * sd)),
+                "samples": n,
+                "basis": key,
+                "specific": level < len(keys) - 2,  # not just partition/cluster-wide
+            }
+            break
+        _predictions[(keys[0], _generation)] = result
+    return result
+
+
+# -- data collection ---------------------------------------------------------
+
+def pending_depth(jobs):
+    """{partition: pending tasks} from queue snapshot jobs (array ranges expanded)."""
+    depth = {}
+    for job in jobs:
+        if job["state"] != "PD":
+            continue
+        _, ranges, _ = job_arrays.parse_job_id(job["job_id"])
+        count = job_arrays.count_ranges(ranges) if ranges else 1
+        for partition in job.get("partition", "").split(","):
+            if partition:
+                depth[partition] = depth.get(partition, 0) + count
+    return depth
+
+
+def sample_depth(jobs):
+    history.record_queue_depth(pending_depth(jobs))
+
+
+def _int(value):
+    try:
+        return int(value)
+    except ValueError:
+        return 0
+
+
+def iter_sacct_waits(lines):
+    """Parse `sacct -P -o SACCT_FIELDS` lines into wait rows (started jobs only)."""
+    for line in lines:
+        parts = line.split("|")
+        if len(parts) != 9:
+            continue
+        job_id, partition, cpus, req_mem, nodes, time_limit, submit, start, state = parts
+        submit_ts = slurm_parse.parse_timestamp(submit)
+        start_ts = slurm_parse.parse_timestamp(start)
+        if submit_ts is None or start_ts is None or state.startswith("PENDING"):
+            continue
+        cpus, nodes = _int(cpus), _int(nodes)
+        yield {
+            "job_id": job_id,
+            "partition": partition.split(",")[0],
+            "cpus": cpus,
+            "mem_mb": round(slurm_parse.parse_req_mem_mb(req_mem, cpus, nodes)),
+            "nodes": nodes,
+            "time_limit_min": sbatch_validate.parse_time_minutes(time_limit) or 0,
+            "submit_ts": submit_ts,
+            "start_ts": start_ts,
+            "wait_s": max(0.0, start_ts - submit_ts),
+            "queue_depth": None,
+        }
+
+
+def ingest(now=None):
+    """Pull jobs started since the last ingest from sacct and train on them.
+
+    Returns the number of new jobs. The window overlaps the previous one by
+    an hour; already stored jobs are ignored.
+    """
+    now = time.time() if now is None else now
+    with _model_lock:
+        _load()  # an empty model is rebuilt from history before new rows land there
+    since = float(history.get_meta("wait_ingested_until", now - BACKFILL_DAYS * 86400)) - 3600
+    cmd = ["sacct", "-a", "-X", "-n", "-P", "-o", SACCT_FIELDS,
+           "-S", time.strftime(slurm_parse.TIMESTAMP_FORMAT, time.localtime(since)),
+           "-E", time.strftime(slurm_parse.TIMESTAMP_FORMAT, time.localtime(now))]
+    rows = []
+    for row in iter_sacct_waits(slurm_parse.iter_command_lines(cmd, timeout=120)):
+        row["queue_depth"] = history.queue_depth_at(row["partition"], row["submit_ts"])
+        rows.append(row)
+    new = history.insert_waits(rows)
+    update(new)
+    history.set_meta("wait_ingested_until", now)
+    return len(new)
+
+
+_start_estimates = {"at": 0, "jobs": {}}
+_start_lock = threading.Lock()
+
+
+def start_estimates():
+    """{job_id: (partition, submit_ts, start_ts)} from `squeue --start`, cached START_TTL."""
+    if time.time() - _start_estimates["at"] < START_TTL:
+        return _start_estimates["jobs"]
+    with scheduler.locked(_start_lock):
+        if time.time() - _start_estimates["at"] < START_TTL:
+            return _start_estimates["jobs"]
+        jobs = {}
+        try:
+            cmd = ["squeue", "--start", "-h", "-t", "PD", "-o", slurm_parse.START_FORMAT]
+            for job_id, partition, submit_ts, start_ts in slurm_parse.iter_start_estimates(
+                    slurm_parse.iter_command_lines(cmd)):
+                jobs[job_id] = (partition, submit_ts, start_ts)
+        except slurm_parse.SlurmCommandError as e:
+            print(f"squeue --start error: {e}")
+        _start_estimates.update(at=time.time(), jobs=jobs)
+        return jobs
+
+
+def scheduler_wait(partition, now=None):
+    """Median wait from now Slurm expects for jobs pending in `partition` (None if unplanned)."""
+    now = time.time() if now is None else now
+    waits = sorted(max(0.0, start - now) for p, _, start in start_estimates().values()
+                   if start is not None and partition in p.split(","))
+    return round(waits[len(waits) // 2]) if waits else None
+
+
+# -- requests ----------------------------------------------------------------
+
+def predict(partition, cpus, mem_mb, time_limit_min, queue_depth):
+    """Expected wait for a new job of this shape.
+
+    A model estimate from a specific shape wins; otherwise Slurm's plan for
+    the partition's pending jobs is used when it has one, falling back to
+    the partition/cluster-wide model statistics.
+    """
+    model = predict_model(partition, cpus, mem_mb, time_limit_min, queue_depth)
+    scheduler_s = scheduler_wait(partition) if partition else None
+    result = {
+        "model": model,
+        "scheduler_estimate_s": scheduler_s,
+        "queue_depth": queue_depth,
+        "source": None,
+        "estimate_s": None,
+    }
+    if model and model["specific"]:
+        result.update(source="model", estimate_s=model["estimate_s"])
+    elif scheduler_s is not None:
+        result.update(source="scheduler", estimate_s=scheduler_s)
+    elif model:
+        result.update(source="model", estimate_s=model["estimate_s"])
+    return result
+
+
+def request_shape(directives, default_partition=None):
+    """(partition, cpus, mem_mb, time_limit_min) requested by sbatch-style directives."""
+    def number(option, default=1):
+        value = str(directives.get(option, default))
+        m = sbatch_validate.NODES_RE.match(value)
+        return int(m.group(1)) if m else default
+    nodes = number("--nodes")
+    cpus_per_task = number("--cpus-per-task")
+    cpus = max(number("--ntasks", nodes) * cpus_per_task, nodes)
+    mem_mb = 0
+    if "--mem" in directives:
+        mem_mb = (sbatch_validate.parse_mem_mb(directives["--mem"]) or 0) * nodes
+    elif "--mem-per-cpu" in directives:
+        mem_mb = (sbatch_validate.parse_mem_mb(directives["--mem-per-cpu"]) or 0) * cpus
+    time_limit = sbatch_validate.parse_time_minutes(directives.get("--time", "")) or 0
+    partition = str(directives.get("--partition") or default_partition or "").split(",")[0]
+    return partition, cpus, mem_mb, time_limit
+
+
+def job_shape(job):
+    """(partition, cpus, mem_mb, time_limit_min) of a queue snapshot job."""
+    cpus = _int(job.get("cpus", "0"))
+    nodes = _int(job.get("nodes", "1"))
+    mem = job.get("min_memory", "")
+    mem_mb = (sbatch_validate.parse_mem_mb(mem) or 0) * max(nodes, 1)
+    time_limit = sbatch_validate.parse_time_minutes(job.get("time_limit", "")) or 0
+    return job.get("partition", "").split(",")[0], cpus, mem_mb, time_limit
+
+
+def job_starts(jobs, depth, now=None):
+    """Expected start of each pending job: Slurm's plan if any, else submit + model wait."""
+    now = time.time() if now is None else now
+    planned = start_estimates()
+    out = []
+    for job in jobs:
+        if job["state"] != "PD":
+            continue
+        entry = {"job_id": job["job_id"], "user": job["user"], "partition": job.get("partition")}
+        plan = planned.get(job["job_id"])
+        if plan and plan[2] is not None:
+            entry.update(expected_start=max(now, plan[2]), source="scheduler")
+        else:
+            partition, cpus, mem_mb, time_limit = job_shape(job)
+            model = predict_model(partition, cpus, mem_mb, time_limit, depth.get(partition))
+            submit_ts = slurm_parse.parse_timestamp(job.get("submit_time", "")) or now
+            if model:
+                entry.update(expected_start=max(now, submit_ts + model["estimate_s"]),
+                             low=max(now, submit_ts + model["low_s"]),
+                             high=max(now, submit_ts + model["high_s"]),
+                             source="model")
+            else:
+                entry.update(expected_start=None, source=None)
+        out.append(entry)
+    return out
+
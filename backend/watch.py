@@ -0,0 +1,275 @@
+"""Per-client job-state watch subscriptions.
+
+Clients register interest in users, job ids or array parents over Socket.IO.
+A single background loop diffs consecutive queue snapshots into state
+transitions (PD -> R -> CG -> gone) and routes each transition through
+subscription indexes keyed by user, job id and array parent, so the cost of
+fan-out is proportional to the number of matching subscribers rather than
+to the number of connected clients.
+"""
+import os
+import threading
+
+import job_arrays
+
+WATCH_INTERVAL = float(os.environ.get("SLURM_GUI_WATCH_INTERVAL", "10"))
+
+STATE_NAMES = {
+    "PD": "PENDING",
+    "R": "RUNNING",
+    "CG": "COMPLETING",
+    "CD": "COMPLETED",
+    "CF": "CONFIGURING",
+    "CA": "CANCELLED",
+    "F": "FAILED",
+    "TO": "TIMEOUT",
+    "NF": "NODE_FAIL",
+    "OOM": "OUT_OF_MEMORY",
+    "PR": "PREEMPTED",
+    "S": "SUSPENDED",
+    "ST": "STOPPED",
+    "RQ": "REQUEUED",
+    "RH": "REQUEUE_HOLD",
+    "RD": "RESV_DEL_HOLD",
+}
+
+# kind -> {key: set(sid)}
+_index = {"user": {}, "job": {}, "array": {}}
+# sid -> {kind: set(key)}
+_subs = {}
+_lock = threading.Lock()
+
+# states_of() of the last diffed snapshot
+_last_states = None
+_last_version = None
+
+
+def array_parent(job_id):
+    """Return the array parent id of `job_id` ("123_4" -> "123"), or None."""
+    head, sep, _ = job_id.partition("_")
+    return head if sep else None
+
+
+def subscribe(sid, users=(), job_ids=(), arrays=()):
+    """Add interests for `sid`; returns its full subscription."""
+    with _lock:
+        subs = _subs.setdefault(sid, {"user": set(), "job": set(), "array": set()})
+        for kind, keys in (("user", users), ("job", job_ids), ("array", arrays)):
+            for key in keys:
+                key = str(key).strip()
+                if not key:
+                    continue
+                subs[kind].add(key)
+                _index[kind].setdefault(key, set()).add(sid)
+        return {kind: sorted(keys) for kind, keys in subs.items()}
+
+
+def unsubscribe(sid, users=(), job_ids=(), arrays=()):
+    """Remove the given interests for `sid` (all of them if none are given)."""
+    with _lock:
+        subs = _subs.get(sid)
+        if subs is None:
+            return {"user": [], "job": [], "array": []}
+        requested = {"user": users, "job": job_ids, "array": arrays}
+        drop_all = not any(requested.values())
+        for kind in ("user", "job", "array"):
+            keys = list(subs[kind]) if drop_all else [str(k).strip() for k in requested[kind]]
+            for key in keys:
+                subs[kind].discard(key)
+                sids = _index[kind].get(key)
+                if sids is not None:
+                    sids.discard(sid)
+                    if not sids:
+                        del _index[kind][key]
+        if not any(subs.values()):
+            del _subs[sid]
+            return {"user": [], "job": [], "array": []}
+        return {kind: sorted(keys) for kind, keys in subs.items()}
+
+
+def drop(sid):
+    """Forget every subscription of a disconnected client."""
+    unsubscribe(sid)
+
+
+def has_subscribers():
+    return bool(_subs)
+
+
+def matches(job_id, user, sid):
+    """True if a single job is of interest to `sid` (used for initial state)."""
+    subs = _subs.get(sid)
+    if not subs:
+        return False
+    parent = array_parent(job_id)
+    return (user in subs["user"] or job_id in subs["job"]
+            or (parent is not None and (parent in subs["array"] or parent in subs["job"])))
+
+
+def _transition(job_id, old, new):
+    state, user, name = new if new is not None else old
+    return {
+        "job_id": job_id,
+        "array_parent": array_parent(job_id),
+        "user": user,
+        "name": name,
+        "old_state": STATE_NAMES.get(old[0], old[0]) if old else None,
+        # None means the job has left the queue (finished, failed or cancelled)
+        "new_state": STATE_NAMES.get(new[0], new[0]) if new else None,
+    }
+
+
+def _task_id(parent, ranges):
+    if len(ranges) == 1 and ranges[0][0] == ranges[0][1]:
+        return f"{parent}_{ranges[0][0]}"
+    return f"{parent}_[{job_arrays.format_ranges(ranges)}]"
+
+
+def _array_transitions(parent, old, new):
+    """Transitions of one array between two {(state, user, name): ranges} maps.
+
+    Tasks that changed state are grouped into one transition per
+    (old, new) pair, so a whole range moving at once is a single event.
+    """
+    transitions = []
+    for new_value, new_ranges in new.items():
+        for old_value, old_ranges in old.items():
+            if old_value[0] != new_value[0]:
+                moved = job_arrays.intersect_ranges(old_ranges, new_ranges)
+                if moved:
+                    transitions.append(_transition(_task_id(parent, moved), old_value, new_value))
+    old_all = job_arrays.merge_ranges(r for ranges in old.values() for r in ranges)
+    new_all = job_arrays.merge_ranges(r for ranges in new.values() for r in ranges)
+    for new_value, new_ranges in new.items():
+        added = job_arrays.subtract_ranges(new_ranges, old_all)
+        if added:
+            transitions.append(_transition(_task_id(parent, added), None, new_value))
+    for old_value, old_ranges in old.items():
+        gone = job_arrays.subtract_ranges(old_ranges, new_all)
+        if gone:
+            transitions.append(_transition(_task_id(parent, gone), old_value, None))
+    return transitions
+
+
+def diff(old_states, new_states):
+    """Return the transitions between two states_of() results."""
+    old_jobs, old_arrays = old_states
+    new_jobs, new_arrays = new_states
+    transitions = []
+    for job_id, new in new_jobs.items():
+        old = old_jobs.get(job_id)
+        if old is None or old[0] != new[0]:
+            transitions.append(_transition(job_id, old, new))
+    for job_id, old in old_jobs.items():
+        if job_id not in new_jobs:
+            transitions.append(_transition(job_id, old, None))
+    for parent in new_arrays.keys() | old_arrays.keys():
+        old, new = old_arrays.get(parent, {}), new_arrays.get(parent, {})
+        if old != new:
+            transitions.extend(_array_transitions(parent, old, new))
+    return transitions
+
+
+def _task_subscribers():
+    """{parent: [(task, sids)]} for job subscriptions on single array tasks."""
+    tasks = {}
+    for key, sids in _index["job"].items():
+        parent, ranges, _ = job_arrays.parse_job_id(key)
+        if parent is not None and len(ranges) == 1:
+            tasks.setdefault(parent, []).append((ranges[0][0], sids))
+    return tasks
+
+
+def route(transitions):
+    """Group transitions by the subscribers they match: {sid: [transition]}."""
+    out = {}
+    with _lock:
+        task_subs = None
+        for t in transitions:
+            sids = set(_index["user"].get(t["user"], ()))
+            sids.update(_index["job"].get(t["job_id"], ()))
+            parent = t["array_parent"]
+            if parent is not None:
+                sids.update(_index["array"].get(parent, ()))
+                sids.update(_index["job"].get(parent, ()))
+                if t["job_id"].endswith("]"):
+                    # a range of tasks: match subscriptions on single tasks in it
+                    if task_subs is None:
+                        task_subs = _task_subscribers()
+                    _, ranges, _ = job_arrays.parse_job_id(t["job_id"])
+                    for task, task_sids in task_subs.get(parent, ()):
+                        if any(lo <= task <= hi for lo, hi in ranges):
+                            sids.update(task_sids)
+            for sid in sids:
+                out.setdefault(sid, []).append(t)
+    return out
+
+
+def states_of(jobs):
+    """Split the queue into ({job_id: (state, user, name)}, arrays) for diff().
+
+    Array tasks are kept as range sets per parent,
+    {parent: {(state, user, name): [(lo, hi), ...]}}, never expanded:
+    squeue shows an array's pending tasks as one row ("123_[8-20%5]") whose
+    id changes whenever a task starts, so arrays are diffed task range by
+    task range. Task 8 starting is then 123_8 PENDING -> RUNNING, not a range
+    leaving the queue and a new one appearing, and a million-task range
+    costs no more than a short one.
+    """
+    plain = {}
+    arrays = {}
+    for j in jobs:
+        value = (j["state"], j["user"], j["name"])
+        parent, ranges, _ = job_arrays.parse_job_id(j["job_id"])
+        if parent is None:
+            plain[j["job_id"]] = value
+        else:
+            arrays.setdefault(parent, {}).setdefault(value, []).extend(ranges)
+    for values in arrays.values():
+        for value, ranges in values.items():
+            values[value] = job_arrays.merge_ranges(ranges)
+    return plain, arrays
+
+
+def process_snapshot(snapshot):
+    """Diff `snapshot` against the previous one; returns {sid: [transition]}.
+
+    The first snapshot only primes the baseline. Snapshots with an unchanged
+    version are skipped without touching the job list.
+    """
+    global _last_states, _last_version
+    if snapshot.version == _last_version:
+        return {}
+    new_states = states_of(snapshot.data.get("jobs", []))
+    old_states, _last_states, _last_version = _last_states, new_states, snapshot.version
+    if old_states is None:
+        return {}
+    transitions = diff(old_states, new_states)
+    if not transitions:
+        return {}
+    return route(transitions)
+
+
+def reset():
+    """Forget the diff baseline (stale once nobody is watching)."""
+    global _last_states, _last_version
+    _last_states = _last_version = None
+
+
+def run_loop(socketio, load_snapshot, interval=None):
+    """Background task: refresh the queue and push transitions to subscribers."""
+    interval = WATCH_INTERVAL if interval is None else interval
+    while True:
+        if not has_subscribers():
+            reset()
+        else:
+            try:
+                snapshot = load_snapshot()
+                for sid, transitions in process_snapshot(snapshot).items():
+                    socketio.emit("job_transitions", {
+                        "version": snapshot.version,
+                        "transitions": transitions,
+                    }, to=sid)
+            except Exception as e:
+                print(f"watch loop error: {e}")
+        socketio.sleep(interval)
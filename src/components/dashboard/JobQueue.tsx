@@ -12,6 +12,30 @@ type QueueJob = {
   time: string;
   nodes: string;
   reason: string;
+  partition?: string;
+  // Present on collapsed array parents (/api/queue?view=collapsed)
+  array?: boolean;
+  task_counts?: Record<string, number>;
+};
+
+const isRunningState = (state: string) => {
+  const s = (state || "").toUpperCase();
+  return s.startsWith("R") || s.includes("RUN");
+};
+
+// Number of tasks an entry stands for, split by running / not running. Totals
+// count array tasks, not squeue rows: a pending range [8-10000] adds 9,993.
+const countTasks = (job: QueueJob) => {
+  if (!job.task_counts) {
+    return isRunningState(job.state) ? { running: 1, other: 0 } : { running: 0, other: 1 };
+  }
+  let running = 0;
+  let other = 0;
+  Object.entries(job.task_counts).forEach(([state, n]) => {
+    if (isRunningState(state)) running += n;
+    else other += n;
+  });
+  return { running, other };
 };
 
 const JobQueue = () => {
@@ -26,7 +50,8 @@ const JobQueue = () => {
     const fetchData = async () => {
       setLoading(true);
       try {
-        const qRes = await fetch("/api/queue");
+        // Collapsed view: each job array arrives as one entry with per-state task counts
+        const qRes = await fetch("/api/queue?view=collapsed");
         const qJson = qRes.ok ? await qRes.json() : { jobs: [] };
         const rawJobs: QueueJob[] = Array.isArray(qJson.jobs) ? qJson.jobs : [];
 
@@ -56,9 +81,13 @@ const JobQueue = () => {
           const isPending = state.startsWith("P") || state.includes("PEND");
 
           // Try to extract partition from reason or nodes fields (best-effort)
-          const partition = (j.reason && j.reason.split(" ")[0]) || (j.nodes && j.nodes.split(":")[0]) || "unknown";
+          const partition = j.partition || (j.reason && j.reason.split(" ")[0]) || (j.nodes && j.nodes.split(":")[0]) || "unknown";
           if (!partitionMap[partition]) partitionMap[partition] = { running: 0, pending: 0 };
-          if (isRunning) partitionMap[partition].running += 1;
+          if (j.task_counts) {
+            const { running, other } = countTasks(j);
+            partitionMap[partition].running += running;
+            partitionMap[partition].pending += other;
+          } else if (isRunning) partitionMap[partition].running += 1;
           else if (isPending) partitionMap[partition].pending += 1;
           else partitionMap[partition].pending += 1;
         });
@@ -93,8 +122,15 @@ const JobQueue = () => {
     };
   }, []);
 
-  const runningCount = jobs.filter((j) => (j.state || "").toUpperCase().startsWith("R") || (j.state || "").toUpperCase().includes("RUN")).length;
-  const pendingCount = jobs.length - runningCount;
+  const taskTotals = jobs.reduce(
+    (acc, j) => {
+      const { running, other } = countTasks(j);
+      return { running: acc.running + running, other: acc.other + other };
+    },
+    { running: 0, other: 0 }
+  );
+  const runningCount = taskTotals.running;
+  const pendingCount = taskTotals.other;
 
   const queueOverview = [
     { status: "Running", count: runningCount, color: "hsl(var(--primary))" },
@@ -108,10 +144,10 @@ const JobQueue = () => {
         <Card>
           <CardHeader className="pb-3">
             <CardDescription>Total Jobs in Queue</CardDescription>
-            <CardTitle className="text-3xl">{jobs.length}</CardTitle>
+            <CardTitle className="text-3xl">{runningCount + pendingCount}</CardTitle>
           </CardHeader>
           <CardContent>
-            <p className="text-sm text-muted-foreground">Active and pending jobs</p>
+            <p className="text-sm text-muted-foreground">Active and pending jobs; array tasks count individually</p>
           </CardContent>
         </Card>
 
@@ -146,7 +182,7 @@ const JobQueue = () => {
       <Card>
         <CardHeader>
           <CardTitle>Queue Status Distribution</CardTitle>
-          <CardDescription>Running vs pending jobs</CardDescription>
+          <CardDescription>Running vs pending jobs (each array task counted)</CardDescription>
         </CardHeader>
         <CardContent>
           <ResponsiveContainer width="100%" height={250}>
@@ -174,7 +210,7 @@ const JobQueue = () => {
       <Card>
         <CardHeader>
           <CardTitle>Jobs per Partition</CardTitle>
-          <CardDescription>Distribution of jobs across cluster partitions</CardDescription>
+          <CardDescription>Distribution of jobs and array tasks across cluster partitions</CardDescription>
         </CardHeader>
         <CardContent>
           <div className="overflow-x-auto">
@@ -1,13 +1,85 @@
-import { useState } from "react";
+import { useEffect, useState } from "react";
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from "@/components/ui/card";
 import { Input } from "@/components/ui/input";
 import { Label } from "@/components/ui/label";
 import { Button } from "@/components/ui/button";
 import { toast } from "sonner";
-import { Send, Upload, Loader2 } from "lucide-react";
+import { Send, Upload, Loader2, Clock, TerminalSquare } from "lucide-react";
 import Terminal from "@/components/terminal/Terminal";
 
+type WaitEstimate = {
+  estimate_s: number | null;
+  source: "model" | "scheduler" | null;
+  queue_depth: number | null;
+  model: { low_s: number; high_s: number; samples: number } | null;
+};
+
+const formatWait = (seconds: number) => {
+  if (seconds < 60) return "under a minute";
+  if (seconds < 3600) return `${Math.round(seconds / 60)} min`;
+  if (seconds < 86400) return `${(seconds / 3600).toFixed(1)} h`;
+  return `${(seconds / 86400).toFixed(1)} days`;
+};
+
+const WaitHint = ({ estimate }: { estimate: WaitEstimate | null }) => {
+  if (!estimate || estimate.estimate_s === null) return null;
+  const range = estimate.source === "model" && estimate.model
+    ? ` (typically ${formatWait(estimate.model.low_s)} – ${formatWait(estimate.model.high_s)})`
+    : "";
+  return (
+    <p className="flex items-center gap-2 text-sm text-muted-foreground">
+      <Clock className="h-4 w-4" />
+      Expected wait: ~{formatWait(estimate.estimate_s)}{range}
+      {estimate.source === "scheduler" ? " based on the scheduler's plan" : ""}
+    </p>
+  );
+};
+
+type FitResult = {
+  fits_now: boolean;
+  partitions: {
+    partition: string;
+    fits_now: boolean;
+    node_set: string[];
+    suggestion?: { max_nodes?: number; max_cpus_per_node?: number | null; max_cpus?: number };
+  }[];
+};
+
+const FitHint = ({ fit }: { fit: FitResult | null }) => {
+  if (!fit || fit.partitions.length === 0) return null;
+  if (fit.fits_now) {
+    const names = fit.partitions.filter((p) => p.fits_now).map((p) => p.partition);
+    return (
+      <p className="text-sm text-green-600">
+        Can start now on: {names.join(", ")}
+      </p>
+    );
+  }
+  const best = fit.partitions.reduce((a, b) =>
+    (b.suggestion?.max_nodes ?? 0) > (a.suggestion?.max_nodes ?? 0) ? b : a
+  );
+  const maxNodes = best.suggestion?.max_nodes;
+  return (
+    <p className="text-sm text-amber-600">
+      No partition has these resources free right now
+      {maxNodes ? ` (up to ${maxNodes} node${maxNodes === 1 ? "" : "s"} available on ${best.partition})` : ""}.
+    </p>
+  );
+};
+
+type Allocation = {
+  job_id: string;
+  node_list: string | null;
+  time_limit: string | null;
+  terminals: number;
+};
+
+const fetchJson = (url: string, init?: RequestInit) =>
+  fetch(url, init).then((res) => (res.ok ? res.json() : null));
+
 const SubmitJob = () => {
+  // set at login, like the dashboard header (DashboardLayout)
+  const username = localStorage.getItem("username") || "";
   const [mode, setMode] = useState<"sbatch" | "alloc">("sbatch");
   const [loading, setLoading] = useState(false);
   const [showTerminal, setShowTerminal] = useState(false);
@@ -18,6 +90,43 @@ const SubmitJob = () => {
     memory: "",
     timeLimit: "",
   });
+  const [waitEstimate, setWaitEstimate] = useState<WaitEstimate | null>(null);
+  const [fitResult, setFitResult] = useState<FitResult | null>(null);
+  const [allocations, setAllocations] = useState<Allocation[]>([]);
+
+  // Running interactive allocations a new terminal can join without queueing
+  useEffect(() => {
+    if (mode !== "alloc" || showTerminal) return;
+    const params = new URLSearchParams({ username });
+    fetchJson(`/api/interactive/allocations?${params}`)
+      .then((data) => setAllocations(data?.allocations ?? []))
+      .catch(() => setAllocations([]));
+  }, [mode, showTerminal, username]);
+
+  // Expected wait and current fit for the interactive request, refreshed as the form changes
+  useEffect(() => {
+    if (mode !== "alloc" || !jobData.nodes) {
+      setWaitEstimate(null);
+      setFitResult(null);
+      return;
+    }
+    const params = new URLSearchParams({ nodes: jobData.nodes });
+    if (jobData.memory) params.set("mem", `${jobData.memory}G`);
+    if (jobData.timeLimit) params.set("time", String(parseInt(jobData.timeLimit) * 60));
+    const controller = new AbortController();
+    const timer = setTimeout(() => {
+      fetchJson(`/api/predict/wait?${params}`, { signal: controller.signal })
+        .then(setWaitEstimate)
+        .catch(() => {});
+      fetchJson(`/api/fit?${params}`, { signal: controller.signal })
+        .then(setFitResult)
+        .catch(() => {});
+    }, 400);
+    return () => {
+      clearTimeout(timer);
+      controller.abort();
+    };
+  }, [mode, jobData.nodes, jobData.memory, jobData.timeLimit]);
 
   const handleSbatchSubmit = async (e: React.FormEvent) => {
     e.preventDefault();
@@ -30,7 +139,7 @@ const SubmitJob = () => {
     setLoading(true);
     try {
       const formData = new FormData();
-      formData.append('username', 'testuser'); // TODO: Replace with actual username
+      formData.append('username', username);
       formData.append('file', selectedFile);
 
       const response = await fetch('/api/submit/sbatch', {
@@ -75,7 +184,7 @@ const SubmitJob = () => {
     try {
       // Build request body, omitting memory if blank
       const reqBody: any = {
-        username: 'testuser', // TODO: Replace with actual username
+        username,
         nodes: parseInt(jobData.nodes),
         time: parseInt(jobData.timeLimit),
         jobName: jobData.name
@@ -118,10 +227,45 @@ const SubmitJob = () => {
     }
   };
 
+  const handleAttach = async (jobId: string) => {
+    setLoading(true);
+    try {
+      const response = await fetch('/api/interactive/attach', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ username, job_id: jobId })
+      });
+      const data = await response.json();
+      if (!response.ok || !data.session_id) {
+        throw new Error(data.error || 'Failed to open terminal');
+      }
+      localStorage.setItem('currentTerminalSession', data.session_id);
+      setShowTerminal(true);
+    } catch (error) {
+      toast.error(error instanceof Error ? error.message : 'Failed to open terminal');
+    } finally {
+      setLoading(false);
+    }
+  };
+
   const handleFileChange = (e: React.ChangeEvent<HTMLInputElement>) => {
     const file = e.target.files?.[0];
     if (file) {
       setSelectedFile(file);
+      setWaitEstimate(null);
+      setFitResult(null);
+      // Expected wait and current fit for the script's #SBATCH resource request
+      file.text()
+        .then((script) => {
+          const init = {
+            method: "POST",
+            headers: { "Content-Type": "application/json" },
+            body: JSON.stringify({ script }),
+          };
+          fetchJson("/api/predict/wait", init).then(setWaitEstimate).catch(() => {});
+          fetchJson("/api/fit", init).then(setFitResult).catch(() => {});
+        })
+        .catch(() => {});
     }
   };
 
@@ -186,6 +330,8 @@ const SubmitJob = () => {
                   Selected: {selectedFile.name}
                 </p>
               )}
+              <WaitHint estimate={waitEstimate} />
+              <FitHint fit={fitResult} />
             </div>
 
             <Button type="submit" className="w-full md:w-auto" disabled={loading}>
@@ -204,6 +350,26 @@ const SubmitJob = () => {
           </form>
         ) : (
           <form onSubmit={handleAllocSubmit} className="space-y-6">
+            {allocations.length > 0 && (
+              <div className="space-y-2 rounded-md border p-4">
+                <p className="text-sm text-muted-foreground">
+                  You already have a running allocation. Open another terminal in it without waiting in the queue:
+                </p>
+                {allocations.map((a) => (
+                  <Button
+                    key={a.job_id}
+                    type="button"
+                    variant="outline"
+                    onClick={() => handleAttach(a.job_id)}
+                    disabled={loading}
+                  >
+                    <TerminalSquare className="h-4 w-4 mr-2" />
+                    Job {a.job_id}{a.node_list ? ` on ${a.node_list}` : ""}
+                    {a.terminals > 0 ? ` (${a.terminals} open)` : ""}
+                  </Button>
+                ))}
+              </div>
+            )}
             <div className="grid grid-cols-1 md:grid-cols-2 gap-6">
               <div className="space-y-2">
                 <Label htmlFor="jobName">Job Name</Label>
@@ -256,6 +422,11 @@ const SubmitJob = () => {
               </div>
             </div>
 
+            <div className="space-y-1">
+              <WaitHint estimate={waitEstimate} />
+              <FitHint fit={fitResult} />
+            </div>
+
             <Button type="submit" className="w-full md:w-auto" disabled={loading}>
               {loading ? (
                 <>
@@ -21,6 +21,22 @@ export interface Node {
   memory: string;
 }
 
+export type BulkAction = 'cancel' | 'hold' | 'release' | 'requeue';
+
+export interface BulkJobRequest {
+  action: BulkAction;
+  job_ids?: string[];
+  arrays?: string[];
+  filter?: { user?: string; name?: string; state?: string | string[]; partition?: string };
+  dry_run?: boolean;
+}
+
+export interface BulkJobResult {
+  job_id: string;
+  ok: boolean;
+  error: string | null;
+}
+
 export interface SubmitJobParams {
   name: string;
   nodes: string;
@@ -91,6 +107,26 @@ srun hostname
 
     return response.json();
   }
+
+  async bulkJobAction(request: BulkJobRequest): Promise<{
+    action: BulkAction;
+    results: BulkJobResult[];
+    commands: number;
+    succeeded: number;
+    failed: number;
+  }> {
+    const response = await fetch(`${this.baseUrl}/api/jobs/bulk`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(request)
+    });
+
+    if (!response.ok) {
+      throw new Error(`Failed to ${request.action} jobs`);
+    }
+
+    return response.json();
+  }
 }
 
 export const api = new ApiClient();
\ No newline at end of file